@@ -3,7 +3,7 @@ import csv
 import os
 import datetime
 
-from swap_comparator.utils.utils_1inch import run_1inch
+from swap_comparator.utils.utils_1inch import run_1inch, close_session
 
 
 def write_on_timestamp(path: str, data: list[dict], timestamp: datetime.datetime):
@@ -44,12 +44,14 @@ async def run_each_hour():
     await asyncio.gather(
         run_1inch(data, datetime_up_to_hour),
     )
+    await close_session()
 
-    write_on_timestamp(os.path.join("data", "timestamp.csv"), data)
+    write_on_timestamp(os.path.join("data", "timestamp.csv"), data, datetime_up_to_hour)
 
 
 async def main():
-    run_each_hour()
+    # One-shot run; the hourly daemon lives in swap_comparator/quotes_scheduler.py
+    await run_each_hour()
 
 
 if __name__ == "__main__":
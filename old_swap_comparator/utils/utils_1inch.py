@@ -4,9 +4,29 @@ import datetime
 
 from swap_comparator.utils.constant import ID1inch, ARBISCAN_MAINNET_ADDRESS, AmountCategory, MainnetAddress
 
+# One keep-alive session for every 1inch call made from the running event loop
+_session: aiohttp.ClientSession | None = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, limit_per_host=32, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+    return _session
+
+
+async def close_session():
+    if _session is not None:
+        await _session.close()
+
 
 async def run_1inch(data: list[dict], timestamp: datetime.datetime):
     tasks = []
+    # One gas price for the whole snapshot, shared by every quote
+    gas_price = await get_gas_price()
 
     for amount_stable_coin in AmountCategory.stable_coin:
         tasks.append(
@@ -16,14 +36,15 @@ async def run_1inch(data: list[dict], timestamp: datetime.datetime):
                 ARBISCAN_MAINNET_ADDRESS["USDC"],
                 ARBISCAN_MAINNET_ADDRESS["USDT"],
                 amount_stable_coin,
+                gas_price=gas_price,
             )
         )
 
     for amount_WETH in AmountCategory.WETH:
-        tasks.append(update_data(data, timestamp, amount_WETH))
+        tasks.append(update_data(data, timestamp, amount_WETH, gas_price=gas_price))
 
     for amount_WBTC in AmountCategory.WBTC:
-        tasks.append(update_data(data, timestamp, amount_WBTC))
+        tasks.append(update_data(data, timestamp, amount_WBTC, gas_price=gas_price))
 
     await asyncio.gather(*tasks)
 
@@ -34,6 +55,7 @@ async def update_data(
     token_in: MainnetAddress,
     token_out: MainnetAddress,
     amount_stable_coin: float,
+    gas_price: int | None = None,
 ):
     to_add = await get_1inch_price(
         token_in=token_in,
@@ -46,7 +68,8 @@ async def update_data(
         "fromToken": token_in,  # TODO: serialize
         "toToken": token_out,  # TODO: serialize
         "chainId": "",
-        "gasCost": "",
+        # Estimated gas of the swap, in ETH at the snapshot's gas price
+        "gasCost": int(to_add["gas"]) * gas_price / 1e18 if gas_price and to_add.get("gas") else "",
         "amountIn": amount_stable_coin,
         "amountOut": to_add["toTokenAmount"],
     }
@@ -66,11 +89,22 @@ async def get_1inch_price(
         "src": token_in,
         "dst": token_out,
         "amount": amount_in,
+        "includeGas": "true",
     }
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(api_url, headers=headers, params=params) as response:
-                return await response.json()
-        except asyncio.TimeoutError:
-            print(f"Timeout error occurred while fetching {api_url}")
+    try:
+        async with get_session().get(api_url, headers=headers, params=params) as response:
+            return await response.json()
+    except asyncio.TimeoutError:
+        print(f"Timeout error occurred while fetching {api_url}")
+
+
+async def get_gas_price(rpc_url: str = "https://ethereum-rpc.publicnode.com") -> int | None:
+    """Current gas price in wei (eth_gasPrice)"""
+    body = {"jsonrpc": "2.0", "id": 1, "method": "eth_gasPrice", "params": []}
+    try:
+        async with get_session().post(rpc_url, json=body) as response:
+            return int((await response.json())["result"], 16)
+    except (asyncio.TimeoutError, aiohttp.ClientError, KeyError, ValueError):
+        print(f"Could not fetch the gas price from {rpc_url}")
+        return None
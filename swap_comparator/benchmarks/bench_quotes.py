@@ -0,0 +1,139 @@
+# bench_quotes.py
+#
+# Offline micro-benchmarks for the parsing, normalization and ranking hot paths.
+# Runs on the provider responses in fixtures/, no network needed.
+#
+#   python benchmarks/bench_quotes.py                   # compare with baseline.json
+#   python benchmarks/bench_quotes.py --update-baseline # record new numbers
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from typing import Callable, Dict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import quote_agg_flask  # noqa: E402
+import quotes_utils  # noqa: E402
+
+FIXTURES_DIR = os.path.join(HERE, "fixtures")
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+
+USDC = "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
+WETH = "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2"
+AMOUNT = 1000 * 10 ** 6
+PRICE_FROM, PRICE_TO = "0.9998", "3201.45"
+
+
+def load_fixtures() -> Dict[str, Dict]:
+    fixtures = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith(".json"):
+            with open(os.path.join(FIXTURES_DIR, name)) as f:
+                fixtures[name[:-len(".json")]] = json.load(f)
+    return fixtures
+
+
+def build_cases(fx: Dict[str, Dict]) -> Dict[str, Callable[[], object]]:
+    aggregators = {protocol: fx[protocol] for protocol in quotes_utils.EXTRACTORS}
+    ranked = [
+        quote_agg_flask.parse_jumper_quote(fx["lifi"], PRICE_FROM, PRICE_TO),
+        quote_agg_flask.parse_relay_quote(fx["relay"]),
+        quote_agg_flask.parse_odos_quote(fx["odos"], 18),
+        quote_agg_flask.parse_zero_quote(fx["zero_x"], AMOUNT, PRICE_FROM, PRICE_TO, 6, 18),
+        quote_agg_flask.parse_inch_quote(fx["1inch"], AMOUNT, PRICE_FROM, PRICE_TO, 6, 18),
+        {"project": "Bungee", "status": "timed_out"},
+        {"project": "OKX", "status": "no_quote"},
+    ]
+
+    return {
+        "extract_quote_data": lambda: quotes_utils.extract_quote_data(aggregators, USDC, WETH, str(AMOUNT)),
+        "extract_quote_records": lambda: quotes_utils.extract_quote_records(aggregators, USDC, WETH, str(AMOUNT)),
+        "extract_quote_lifi": lambda: quotes_utils.extract_quote_lifi(fx["lifi"]),
+        "extract_quote_zerox": lambda: quotes_utils.extract_quote_zerox(fx["zero_x"]),
+        "extract_quote_oneinch": lambda: quotes_utils.extract_quote_oneinch(fx["1inch"]),
+        "extract_quote_odos": lambda: quotes_utils.extract_quote_odos(fx["odos"]),
+        "parse_jumper_quote": lambda: quote_agg_flask.parse_jumper_quote(fx["lifi"], PRICE_FROM, PRICE_TO),
+        "parse_relay_quote": lambda: quote_agg_flask.parse_relay_quote(fx["relay"]),
+        "parse_odos_quote": lambda: quote_agg_flask.parse_odos_quote(fx["odos"], 18),
+        "parse_zero_quote": lambda: quote_agg_flask.parse_zero_quote(fx["zero_x"], AMOUNT, PRICE_FROM, PRICE_TO, 6, 18),
+        "parse_inch_quote": lambda: quote_agg_flask.parse_inch_quote(fx["1inch"], AMOUNT, PRICE_FROM, PRICE_TO, 6, 18),
+        "parse_bungee_quote": lambda: quote_agg_flask.parse_bungee_quote(fx["bungee"], AMOUNT, PRICE_FROM, PRICE_TO),
+        "parse_okx_quote": lambda: quote_agg_flask.parse_okx_quote(fx["okx"], PRICE_FROM, PRICE_TO),
+        "rank_quotes": lambda: quote_agg_flask.rank_quotes(ranked),
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int = 7) -> Dict[str, float]:
+    """Best-of-`repeat` ops/sec, plus bytes and blocks allocated by a single call"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    fn()  # warm caches before tracing
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = fn()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    del result
+
+    return {
+        "ops_per_sec": 1 / best,
+        "alloc_bytes": sum(stat.size_diff for stat in stats if stat.size_diff > 0),
+        "alloc_blocks": sum(stat.count_diff for stat in stats if stat.count_diff > 0),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline quote parsing benchmarks")
+    parser.add_argument("--update-baseline", action="store_true", help="write the measured numbers to baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed ops/sec drop vs the baseline (0.5 = 50%%)")
+    parser.add_argument("cases", nargs="*", help="only run these cases")
+    args = parser.parse_args()
+
+    cases = build_cases(load_fixtures())
+    if args.cases:
+        cases = {name: cases[name] for name in args.cases}
+
+    baseline = {}
+    if os.path.isfile(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results, regressions = {}, []
+    print(f"{'case':<24}{'ops/sec':>14}{'baseline':>14}{'alloc B':>10}{'blocks':>8}")
+    for name, fn in cases.items():
+        result = results[name] = measure(fn)
+        expected = baseline.get(name, {}).get("ops_per_sec")
+        flag = ""
+        expected_blocks = baseline.get(name, {}).get("alloc_blocks")
+        # Timings are noisy, hence the tolerance; allocation counts only jitter a little (pandas caches)
+        if expected and result["ops_per_sec"] < expected * (1 - args.tolerance):
+            flag = "  SLOWER"
+        elif expected_blocks is not None and result["alloc_blocks"] > expected_blocks + max(2, expected_blocks // 10):
+            flag = "  MORE ALLOCATIONS"
+        if flag:
+            regressions.append(name)
+        print(f"{name:<24}{result['ops_per_sec']:>14,.0f}{expected or 0:>14,.0f}{result['alloc_bytes']:>10,}{result['alloc_blocks']:>8,}{flag}")
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
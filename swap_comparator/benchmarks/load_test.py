@@ -0,0 +1,210 @@
+# load_test.py
+#
+# End-to-end load test, offline: the service runs against the stand-in
+# aggregator servers of stub_server.py and is driven at each concurrency
+# level in turn. Reports requests/s and p50/p95/p99 latency per level.
+#
+#   python benchmarks/load_test.py get_quote --concurrency 1,8,32 --duration 15
+#   python benchmarks/load_test.py get_quote --amounts 20                 # mostly cache hits
+#   python benchmarks/load_test.py sweep --concurrency 4,16,64 --synchronized
+#   python benchmarks/load_test.py get_quote --latency 300 --error-rate 0.05 --provider 1inch:rate_limited_rate=0.3
+#
+# get_quote runs quote_agg_flask in-process on a threaded server; with
+# --target it drives an already running service instead, started with
+# QUOTES_UPSTREAM pointing at the stand-in servers (--stub-port):
+#
+#   QUOTES_UPSTREAM=http://127.0.0.1:8700 gunicorn -w 4 quote_agg_flask:app &
+#   python benchmarks/load_test.py get_quote --target http://127.0.0.1:8000 --stub-port 8700
+#
+# sweep runs the sweep of the CLI (quotes_main.py), with the sink dropping the
+# rows. Everything runs as in production, our own per-provider rate limits
+# (RATE_LIMITS) included, so the numbers are what the service delivers under
+# its quotas. --no-rate-limits turns those off to measure the service alone;
+# circuit breakers and retries stay on either way.
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+import quotes_config  # noqa: E402
+from stub_server import StubServer, add_behaviour_arguments, behaviours_from_args  # noqa: E402
+
+PAIRS = [
+    ("Mainnet", "USDC", "WETH"), ("Mainnet", "WETH", "USDT"), ("Arbitrum", "USDC", "WETH"),
+    ("Base", "WETH", "USDC"), ("Optimism", "USDC", "WETH"),
+]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(level: int, latencies: List[float], outcomes: Counter, elapsed: float) -> Dict:
+    count = len(latencies)
+    return {
+        "concurrency": level,
+        "requests": count,
+        "rps": count / elapsed if elapsed > 0 else 0.0,
+        **{f"p{q}_ms": (percentile(latencies, q) or 0.0) * 1000 for q in (50, 95, 99)},
+        "outcomes": dict(outcomes),
+    }
+
+
+def amount(index: int, distinct: int) -> int:
+    """Request amount `index`: with `distinct`, one of that many sizes; else a new cache key every request.
+
+    /get_quote buckets amounts to 3 significant digits, so sizes step through
+    the 900 mantissas of a decade and then move up a decade (repeating after 5400)
+    """
+    index = index % distinct if distinct else index
+    return (100 + index % 900) * 10 ** (index // 900 % 6)
+
+
+def load_get_quote(base_url: str, level: int, duration: float, distinct: int) -> Dict:
+    """`level` clients calling /get_quote back to back for `duration` seconds"""
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+    lock = threading.Lock()
+    counter = iter(range(10 ** 9))
+    deadline = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            with lock:
+                index = next(counter)
+            chain, origin, destination = PAIRS[index % len(PAIRS)]
+            params = {"origin_chain": chain, "destination_chain": chain, "origin_token": origin,
+                      "destination_token": destination, "amount": amount(index, distinct)}
+            start = time.monotonic()
+            try:
+                response = session.get(f"{base_url}/get_quote", params=params, timeout=60)
+                outcome = str(response.status_code)
+            except requests.exceptions.RequestException as e:
+                outcome = type(e).__name__
+            elapsed = time.monotonic() - start
+            with lock:
+                latencies.append(elapsed)
+                outcomes[outcome] += 1
+        session.close()
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=client) for _ in range(level)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(level, latencies, outcomes, time.monotonic() - start)
+
+
+def load_sweep(level: int, networks: List[str], synchronized: bool, timestamp: int) -> Dict:
+    """One sweep of the matrix with `level` requests in flight; latencies are the rows' provider round trips"""
+    import quotes_sweep
+
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+
+    def sink(row: Dict) -> None:
+        if row["requestSentAt"] is not None and row["responseReceivedAt"] is not None:
+            latencies.append(row["responseReceivedAt"] - row["requestSentAt"])
+        outcomes[row["status"]] += 1
+
+    units = quotes_sweep.build_work_units(networks)
+    start = time.monotonic()
+    if synchronized:
+        asyncio.run(quotes_sweep.run_synchronized_sweep(units, sink, timestamp, concurrency=level))
+    else:
+        providers = {unit.provider for unit in units}
+        asyncio.run(quotes_sweep.run_sweep(units, sink, timestamp, concurrency=level, provider_concurrency=dict.fromkeys(providers, level)))
+    return summarize(level, latencies, outcomes, time.monotonic() - start)
+
+
+def serve_app() -> str:
+    """quote_agg_flask on a threaded server in the background; returns its URL"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from quote_agg_flask import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def print_results(results: List[Dict], unit: str) -> None:
+    print(f"{'concurrency':>11} {unit:>9} {unit + '/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  outcomes")
+    for result in results:
+        outcomes = ", ".join(f"{name}: {count}" for name, count in sorted(result["outcomes"].items()))
+        print(f"{result['concurrency']:>11} {result['requests']:>9} {result['rps']:>10.1f} "
+              f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}  {outcomes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of /get_quote and the sweep against stand-in providers")
+    parser.add_argument("mode", choices=["get_quote", "sweep"])
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level (get_quote)")
+    parser.add_argument("--amounts", type=int, default=0, help="distinct request sizes (get_quote; 0: every request misses the quote cache)")
+    parser.add_argument("--target", help="URL of a running service to drive instead of an in-process one (get_quote)")
+    parser.add_argument("--stub-port", type=int, default=0, help="port of the stand-in servers (default: any free one)")
+    parser.add_argument("--networks", default="Mainnet,Arbitrum", help="comma-separated networks to sweep")
+    parser.add_argument("--synchronized", action="store_true", help="sweep in synchronized snapshot mode")
+    parser.add_argument("--no-rate-limits", action="store_true", help="turn off our own per-provider rate limits")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    add_behaviour_arguments(parser)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    default, behaviours = behaviours_from_args(args)
+    stub = StubServer(port=args.stub_port, default=default, behaviours=behaviours).start()
+    quotes_config.UPSTREAM_URLS.update({provider: f"{stub.url}/{provider}" for provider in set(quotes_config.PROVIDER_HOSTS.values())})
+    output = os.path.abspath(args.output) if args.output else None
+    # The service writes its caches, snapshots and logs under data/: keep them out of the checkout
+    os.chdir(tempfile.mkdtemp(prefix="load_test-"))
+    if args.no_rate_limits:
+        from quotes_ratelimit import rate_limiter
+        rate_limiter.limits = {}
+
+    results = []
+    try:
+        base_url = args.target.rstrip("/") if args.target else (serve_app() if args.mode == "get_quote" else None)
+        for index, level in enumerate(levels):
+            if args.mode == "get_quote":
+                results.append(load_get_quote(base_url, level, args.duration, args.amounts))
+            else:
+                # A new snapshot per level, so each one fetches its gas prices like a real run
+                timestamp = int(time.time()) // 3600 * 3600 + index
+                results.append(load_sweep(level, args.networks.split(","), args.synchronized, timestamp))
+    finally:
+        stub.stop()
+
+    print(f"Our rate limits: {'off' if args.no_rate_limits else 'on'}")
+    print_results(results, "requests" if args.mode == "get_quote" else "rows")
+    print(f"Stand-in answers: {json.dumps(stub.stats())}")
+    if output:
+        with open(output, "w") as f:
+            json.dump({"mode": args.mode, "rate_limits": not args.no_rate_limits, "results": results, "upstream": stub.stats()}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# stub_server.py
+#
+# Local stand-in for the aggregator APIs and chain RPCs the service calls. It
+# answers with the provider responses in fixtures/, after a configurable
+# latency, and can inject errors (500) and rate limiting (429 + Retry-After).
+# Every provider is served under /<provider key>/ followed by its real path;
+# point the service at it with QUOTES_UPSTREAM (see UPSTREAM_URLS in quotes_config).
+#
+#   python benchmarks/stub_server.py --port 8700 --latency 150 --error-rate 0.01
+#   python benchmarks/stub_server.py --provider 1inch:latency=600,rate_limited_rate=0.2
+#   QUOTES_UPSTREAM=http://127.0.0.1:8700 python quote_agg_flask.py
+#
+# GET /stats returns the requests served per provider and outcome.
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, fields, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from quotes_config import NETWORK_CONFIG, TOKEN_DECIMALS, NATIVE_TOKEN_ADDRESS  # noqa: E402
+
+FIXTURES_DIR = os.path.join(HERE, "fixtures")
+
+# Quote answer of each provider key (fixture file name)
+QUOTE_FIXTURES = {
+    "odos": "odos",
+    "zero_x": "zero_x",
+    "1inch": "1inch",
+    "lifi": "lifi",
+    "relay": "relay",
+    "bungee": "bungee",
+    "okx": "okx",
+}
+
+# LiFi's names for the chains of NETWORK_CONFIG
+CHAIN_NAMES = {1: "Ethereum", 10: "Optimism", 8453: "Base", 42161: "Arbitrum"}
+
+USD_PRICES = {
+    "USDC": "0.9998", "USDT": "1.0001", "DAI": "0.9999", "WETH": "3201.45", "WSTETH": "3780.12",
+    "WBTC": "64210.50", "MKR": "1532.80", "PEPE": "0.0000112", "ARB": "0.81",
+}
+NATIVE_PRICE = USD_PRICES["WETH"]
+GAS_PRICE_WEI = 12 * 10 ** 9
+
+
+@dataclass(frozen=True)
+class Behaviour:
+    """How one provider answers: lognormal latency around `latency` ms, then maybe an injected error"""
+    latency: float = 100.0  # median, ms
+    jitter: float = 0.5  # sigma of the lognormal; 0 for a fixed latency
+    error_rate: float = 0.0  # share of 500 answers
+    rate_limited_rate: float = 0.0  # share of 429 answers
+    retry_after: float = 1.0  # seconds, sent with the 429s
+
+    def delay(self) -> float:
+        seconds = self.latency / 1000
+        return seconds * random.lognormvariate(0, self.jitter) if self.jitter > 0 else seconds
+
+    def outcome(self) -> int:
+        draw = random.random()
+        if draw < self.rate_limited_rate:
+            return 429
+        if draw < self.rate_limited_rate + self.error_rate:
+            return 500
+        return 200
+
+
+def parse_behaviour(spec: str, default: Behaviour) -> Tuple[str, Behaviour]:
+    """`<provider>:<field>=<value>,...` (fields of Behaviour) to (provider, behaviour)"""
+    provider, _, settings = spec.partition(":")
+    names = {field.name for field in fields(Behaviour)}
+    changes = {}
+    for setting in filter(None, settings.split(",")):
+        name, _, value = setting.partition("=")
+        if name not in names:
+            raise ValueError(f"Unknown setting {name!r} (one of {', '.join(sorted(names))})")
+        changes[name] = float(value)
+    return provider, replace(default, **changes)
+
+
+def load_fixtures() -> Dict[str, bytes]:
+    answers = {}
+    for provider, name in QUOTE_FIXTURES.items():
+        with open(os.path.join(FIXTURES_DIR, f"{name}.json")) as f:
+            answers[provider] = json.dumps(json.load(f)).encode()
+    return answers
+
+
+def token_items(chain_id: int) -> list:
+    """LiFi token entries of a chain: the tokens of NETWORK_CONFIG plus the native token"""
+    network = next(config for config in NETWORK_CONFIG.values() if config["chain_id"] == chain_id)
+    items = [
+        {"chainId": chain_id, "symbol": symbol, "address": address, "decimals": TOKEN_DECIMALS[symbol], "priceUSD": USD_PRICES[symbol]}
+        for symbol, address in network.items() if symbol != "chain_id"
+    ]
+    items.append({"chainId": chain_id, "symbol": "ETH", "address": NATIVE_TOKEN_ADDRESS, "decimals": 18, "priceUSD": NATIVE_PRICE})
+    return items
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open many connections at once
+    request_queue_size = 1024
+
+
+class StubServer:
+    """The stand-in servers, in a background thread (or the foreground with serve_forever())"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, default: Behaviour = Behaviour(),
+                 behaviours: Optional[Dict[str, Behaviour]] = None):
+        self.default = default
+        self.behaviours = behaviours or {}
+        self.answers = load_fixtures()
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+        self.httpd = _HTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def behaviour(self, provider: str) -> Behaviour:
+        return self.behaviours.get(provider, self.default)
+
+    def count(self, provider: str, status: int) -> None:
+        with self._lock:
+            self.counters[(provider, status)] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            counters = dict(self.counters)
+        stats: Dict[str, Dict[str, int]] = {}
+        for (provider, status), count in sorted(counters.items(), key=str):
+            stats.setdefault(provider, {})[str(status)] = count
+        return stats
+
+    def answer(self, provider: str, path: str, query: Dict[str, list], body: bytes) -> Tuple[int, bytes]:
+        """Status and body of a successful call"""
+        if provider == "rpc":
+            request_id = json.loads(body or b"{}").get("id", 1)
+            return 200, json.dumps({"jsonrpc": "2.0", "id": request_id, "result": hex(GAS_PRICE_WEI)}).encode()
+        if provider == "lifi" and path.endswith("/v1/chains"):
+            chains = [{"id": chain_id, "key": name[:3].lower(), "name": name} for chain_id, name in CHAIN_NAMES.items()]
+            return 200, json.dumps({"chains": chains}).encode()
+        if provider == "lifi" and path.endswith("/v1/tokens"):
+            chain_ids = [int(chain) for chain in query.get("chains", [""])[0].split(",") if chain] or list(CHAIN_NAMES)
+            return 200, json.dumps({"tokens": {str(chain_id): token_items(chain_id) for chain_id in chain_ids if chain_id in CHAIN_NAMES}}).encode()
+        if provider == "lifi" and path.endswith("/v1/token"):
+            chain_id, token = int(query.get("chain", ["0"])[0]), query.get("token", [""])[0].lower()
+            for item in token_items(chain_id) if chain_id in CHAIN_NAMES else []:
+                if token in (item["address"].lower(), item["symbol"].lower()):
+                    return 200, json.dumps(item).encode()
+            return 404, b'{"message": "Token not found"}'
+        if provider in self.answers:
+            return 200, self.answers[provider]
+        return 404, b'{"message": "Unknown provider"}'
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real APIs
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.handle_call()
+
+            def do_POST(self):
+                self.handle_call()
+
+            def handle_call(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                parts = urlsplit(self.path)
+                provider, _, path = parts.path.lstrip("/").partition("/")
+                if provider == "stats":
+                    return self.reply(200, json.dumps(server.stats()).encode())
+
+                behaviour = server.behaviour(provider)
+                time.sleep(behaviour.delay())
+                status = behaviour.outcome()
+                if status == 429:
+                    payload, headers = b'{"message": "Too many requests"}', {"Retry-After": f"{behaviour.retry_after:g}"}
+                elif status == 500:
+                    payload, headers = b'{"message": "Internal server error"}', {}
+                else:
+                    status, payload = server.answer(provider, "/" + path, parse_qs(parts.query), body)
+                    headers = {}
+                server.count(provider, status)
+                self.reply(status, payload, headers)
+
+            def reply(self, status: int, payload: bytes, headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self.httpd.serve_forever()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def add_behaviour_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=Behaviour.latency, help="median answer latency, ms")
+    parser.add_argument("--jitter", type=float, default=Behaviour.jitter, help="lognormal sigma of the latency (0: fixed)")
+    parser.add_argument("--error-rate", type=float, default=Behaviour.error_rate, help="share of 500 answers")
+    parser.add_argument("--rate-limited-rate", type=float, default=Behaviour.rate_limited_rate, help="share of 429 answers")
+    parser.add_argument("--retry-after", type=float, default=Behaviour.retry_after, help="Retry-After of the 429s, seconds")
+    parser.add_argument("--provider", action="append", default=[], metavar="KEY:FIELD=VALUE,...",
+                        help="override the settings above for one provider (e.g. odos:latency=400,error_rate=0.1)")
+
+
+def behaviours_from_args(args: argparse.Namespace) -> Tuple[Behaviour, Dict[str, Behaviour]]:
+    default = Behaviour(args.latency, args.jitter, args.error_rate, args.rate_limited_rate, args.retry_after)
+    return default, dict(parse_behaviour(spec, default) for spec in args.provider)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in aggregator servers for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    add_behaviour_arguments(parser)
+    args = parser.parse_args()
+
+    default, behaviours = behaviours_from_args(args)
+    server = StubServer(args.host, args.port, default, behaviours)
+    print(f"Serving {', '.join(sorted(set(QUOTE_FIXTURES) | {'rpc'}))} on {server.url} (QUOTES_UPSTREAM={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# Modules in this folder import each other by bare name (e.g. `from quotes_config import ...`),
+# so pytest needs this directory on sys.path; having a conftest.py here is enough for that.
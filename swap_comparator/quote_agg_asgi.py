@@ -0,0 +1,181 @@
+# quote_agg_asgi.py
+#
+# Async serving mode of quote_agg_flask: same /get_quote contract, but the
+# upstream calls run on an event loop, so one worker serves many concurrent
+# requests. Recent quotes and token metadata live in a SQLite cache shared by
+# all the workers of the box.
+#
+#   uvicorn quote_agg_asgi:app --workers 4
+
+import asyncio
+import json
+import time
+from dataclasses import asdict
+from urllib.parse import parse_qs
+
+import quotes_http_async
+import quotes_timing
+from quotes_config import QUOTE_DEADLINE, METADATA_TTL
+from quotes_cache import QuoteCache, SharedCache, bucket_amount
+from quotes_metadata import TokenMeta
+from quotes_metrics import provider_latency, provider_outcomes, render_metrics
+from quote_agg_flask import metadata_index, provider_calls, provider_result, provider_timeout, rank_quotes, request_key
+
+shared_cache = SharedCache()
+# Per-process copy in front of the shared one, so hot keys skip SQLite too
+quote_cache = QuoteCache(name="quote_local")
+_in_flight = {}
+
+
+def shared_token(chain_id, symbol):
+    """metadata_index.token(), shared between workers through the SQLite cache"""
+    # Static and snapshot tokens are in memory already: no SQLite read for them
+    meta = metadata_index.known(chain_id, symbol)
+    if meta is not None:
+        return meta
+    key = ("token", chain_id, symbol.upper())
+    cached = shared_cache.get(key)
+    if cached is not None:
+        return TokenMeta(**cached)
+    meta = metadata_index.token(chain_id, symbol)
+    if meta is not None:
+        shared_cache.set(key, asdict(meta), ttl=METADATA_TTL)
+    return meta
+
+
+async def timed_call(project, chain, fn, args, deadline=None):
+    start = asyncio.get_running_loop().time()
+    try:
+        return await quotes_http_async.run_async(fn(*args), deadline)
+    finally:
+        provider_latency.observe(asyncio.get_running_loop().time() - start, provider=project, chain=chain)
+
+
+async def fan_out(calls, deadline=QUOTE_DEADLINE, chain=""):
+    """quote_agg_flask.fan_out() as tasks on the event loop (same per-provider deadlines and statuses)"""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    expiry = {project: start + min(provider_timeout(project), deadline) for project in calls}
+    # request() deadlines are on time.monotonic()
+    offset = time.monotonic() - start
+    pending = {
+        asyncio.ensure_future(timed_call(project, chain, fn, args, expiry[project] + offset)): project
+        for project, (fn, args) in calls.items()
+    }
+
+    results = {}
+    while pending:
+        timeout = max(min(expiry[project] for project in pending.values()) - loop.time(), 0)
+        done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            project = pending.pop(task)
+            results[project] = provider_result(project, task, chain)
+
+        now = loop.time()
+        for task, project in list(pending.items()):
+            if expiry[project] <= now:
+                task.cancel()
+                del pending[task]
+                provider_outcomes.inc(provider=project, chain=chain, outcome="timed_out")
+                results[project] = {"project": project, "status": "timed_out"}
+    timings = quotes_timing.current()
+    if timings is not None:
+        timings.add("fanout", loop.time() - start)
+    return [results[project] for project in calls]
+
+
+async def quote(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amountRaw):
+    # Metadata and prices are in memory (or in the shared cache); a miss may block, so keep it off the loop
+    calls, originChain = await asyncio.to_thread(
+        provider_calls, originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amountRaw, shared_token)
+    return rank_quotes(await fan_out(calls, chain=originChain))
+
+
+async def cached_quote(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amountRaw):
+    """quote() behind the local cache, then the shared cache; concurrent misses for a key share one quote()"""
+    amount = bucket_amount(amountRaw)
+    key = request_key(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amount)
+    quotes = quote_cache.get(key)
+    if quotes is None:
+        # SQLite is blocking I/O: off the loop
+        quotes = await asyncio.to_thread(shared_cache.get, key)
+        if quotes is not None:
+            quote_cache.set(key, quotes)
+    if quotes is not None:
+        return quotes
+
+    future = _in_flight.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+    future = _in_flight[key] = asyncio.get_running_loop().create_future()
+    try:
+        quotes = await quote(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amount)
+    except BaseException as e:
+        # A cancelled leader too (CancelledError is not an Exception), or its waiters would hang
+        future.set_exception(e if isinstance(e, Exception) else RuntimeError("Quote cancelled"))
+        # Waiters get the exception; nobody else may be listening
+        future.exception()
+        raise
+    else:
+        future.set_result(quotes)
+        # Don't pin a full outage for a whole TTL
+        if any('expectedAmount' in q for q in quotes):
+            quote_cache.set(key, quotes)
+            await asyncio.to_thread(shared_cache.set, key, quotes)
+        return quotes
+    finally:
+        _in_flight.pop(key, None)
+
+
+async def get_quote(query):
+    try:
+        amount = float(query.get('amount'))
+        quotes = await cached_quote(
+            query.get('origin_chain'),
+            query.get('destination_chain'),
+            query.get('origin_token'),
+            query.get('destination_token'),
+            amount,
+        )
+        # Quotes are for the bucketed amount (see bucket_amount), not necessarily the requested one
+        return 200, {"status": "success", "quotedAmount": bucket_amount(amount), "quotes": quotes}
+    except Exception as e:
+        return 400, {"status": "error", "message": str(e)}
+
+
+async def send_response(send, status, body, content_type, headers=()):
+    headers = [(b"content-type", content_type.encode())] + [(name.encode(), value.encode()) for name, value in headers]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await quotes_http_async.close_session()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    path, method = scope["path"], scope["method"]
+    if path == "/get_quote" and method == "GET":
+        query = {key: values[0] for key, values in parse_qs(scope["query_string"].decode()).items()}
+        # Same Server-Timing spans as quote_agg_flask (profiling stays Flask-only: the loop thread is shared by every request)
+        timings, _ = quotes_timing.begin()
+        try:
+            status, body = await get_quote(query)
+        finally:
+            quotes_timing.end()
+        if query.get("timing"):
+            body["timing"] = timings.as_list()
+        await send_response(send, status, json.dumps(body).encode(), "application/json", [("server-timing", timings.header())])
+    elif path == "/metrics" and method == "GET":
+        await send_response(send, 200, render_metrics().encode(), "text/plain; version=0.0.4")
+    else:
+        await send_response(send, 404, json.dumps({"status": "error", "message": "Not found"}).encode(), "application/json")
@@ -1,14 +1,37 @@
 
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 import requests
+import random
+import quotes_http
+import quotes_timing
 import hmac
 import hashlib
 import base64
+import time
+import json
+from threading import Lock
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 
+from quotes_config import (
+    PROVIDER_TIMEOUT, PROVIDER_TIMEOUTS, QUOTE_DEADLINE, FANOUT_WORKERS, BATCH_MAX_ITEMS,
+    HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE, HISTORY_MAX_POINTS, PROFILE_SAMPLE_RATE, PROFILE_HEADER, PROFILE_PATH,
+    NATIVE_TOKEN_ADDRESS
+)
+from quotes_metadata import MetadataIndex
+from quotes_prices import price_feed
+from quotes_gas import gas_prices, gas_cost, gas_units
+from quotes_cache import QuoteCache, quote_key, bucket_amount
+from quotes_breaker import CircuitOpen
+from quotes_ratelimit import DeadlineExceeded
+from quotes_metrics import provider_latency, provider_outcomes, parse_failures, render_metrics
+
 
 app = Flask(__name__)
+executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS)
+metadata_index = MetadataIndex()
+quote_cache = QuoteCache()
 
 
 #########
@@ -29,22 +52,28 @@ def relay_quote(originChain, destinationChain, originToken, destinationToken, am
         "tradeType": "EXACT_INPUT"
     }
     headers = {"Content-Type": "application/json"}
-    relay_response = requests.request("POST", url, json=payload, headers=headers)
+    relay_response = yield quotes_http.Call("POST", url, json=payload, headers=headers, timeout=provider_timeout("Relay"))
 
     if relay_response.status_code == 200:
-
-        relay = relay_response.json()
-
-        result = {
-        "project": "Relay",
-        "expectedAmount": float(relay["details"]["currencyOut"]["amountFormatted"]),
-        "efficiency": 1 + float(relay["details"]["totalImpact"]["percent"])/100,
-        "time": relay["details"]["timeEstimate"]}
-        result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
-        return result
+        return parse_relay_quote(relay_response.json())
     else:
         return {}
 
+def parse_relay_quote(relay):
+    result = {
+    "project": "Relay",
+    "expectedAmount": float(relay["details"]["currencyOut"]["amountFormatted"]),
+    "efficiency": 1 + float(relay["details"]["totalImpact"]["percent"])/100,
+    "time": relay["details"]["timeEstimate"]}
+    result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
+    # Relay prices the gas itself (no gas units), in whatever currency it charges it in
+    gas = relay.get("fees", {}).get("gas")
+    if gas:
+        result["gasCostUSD"] = float(gas["amountUsd"]) if gas.get("amountUsd") is not None else None
+        if gas["currency"]["address"].lower() == NATIVE_TOKEN_ADDRESS:
+            result["gasCostNative"] = float(gas["amountFormatted"])
+    return result
+
 ### Jumper
 
 def jumper_quote(originChain, destinationChain, originToken, destinationToken, amount, LIFI_KEY, price_from_amount, price_to_amount):
@@ -62,28 +91,29 @@ def jumper_quote(originChain, destinationChain, originToken, destinationToken, a
             "fromAddress": "0xb29601eB52a052042FB6c68C69a442BD0AE90082",
             "fromAmount": int(amount)
         }
-    lifi_response = requests.get(
+    lifi_response = yield quotes_http.Call("GET",
             "https://li.quest/v1/quote",
             headers=headers,
-            params=payload)
+            params=payload,
+            timeout=provider_timeout("Jumper"))
 
     if lifi_response.status_code == 200:
-
-        lifi = lifi_response.json()
-
-        to_amount = int(lifi["estimate"]["toAmount"]) / (10 ** lifi["action"]["toToken"]["decimals"])
-        to_amount_usd = to_amount * float(price_to_amount)
-        from_amount_usd = float(price_from_amount) * int(lifi["estimate"]["fromAmount"]) / (10 ** lifi["action"]["fromToken"]["decimals"])
-        result = {
-            "project": "Jumper",
-            "expectedAmount": to_amount,
-            "efficiency": to_amount_usd / from_amount_usd,
-            "time": lifi["estimate"]["executionDuration"]
-            }
-        result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
-        return result
+        return parse_jumper_quote(lifi_response.json(), price_from_amount, price_to_amount)
     else:
         return {}
+
+def parse_jumper_quote(lifi, price_from_amount, price_to_amount):
+    to_amount = int(lifi["estimate"]["toAmount"]) / (10 ** lifi["action"]["toToken"]["decimals"])
+    to_amount_usd = to_amount * float(price_to_amount)
+    from_amount_usd = float(price_from_amount) * int(lifi["estimate"]["fromAmount"]) / (10 ** lifi["action"]["fromToken"]["decimals"])
+    result = {
+        "project": "Jumper",
+        "expectedAmount": to_amount,
+        "efficiency": to_amount_usd / from_amount_usd,
+        "time": lifi["estimate"]["executionDuration"],
+        "gasUnits": gas_units(lifi["estimate"].get("gasCosts"))
+        }
+    result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
     return result
 
 
@@ -93,7 +123,7 @@ def bungee_quote(fromChain, toChain, fromTokenAddress, toTokenAddress, amount, p
     if fromChain == toChain:
         return {}
     else:
-        response = requests.get(
+        response = yield quotes_http.Call("GET",
             "https://api.socket.tech/v2/quote",
             params={
                 "fromChainId": fromChain,
@@ -107,22 +137,29 @@ def bungee_quote(fromChain, toChain, fromTokenAddress, toTokenAddress, amount, p
                 "API-KEY": bungee_key,
                 "Accept": "application/json",
                 "Content-Type": "application/json"
-            }
+            },
+            timeout=provider_timeout("Bungee")
         )
-        bungee = response.json()
-        to_amount = int(bungee["result"]["routes"][0]["toAmount"])/ (10 ** bungee["result"]["toAsset"]["decimals"])
-        to_amount_usd = float(price_to_amount) * to_amount
-        from_amount_usd = float(price_from_amount) * amount / (10 ** bungee["result"]["fromAsset"]["decimals"])
-        time = int(bungee["result"]["routes"][0]["serviceTime"])
-
-        result = {
-            "project": "Bungee",
-            "expectedAmount": to_amount,
-            "efficiency": to_amount_usd / from_amount_usd,
-            "time": time
-            }
-        result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
-        return result
+        return parse_bungee_quote(response.json(), amount, price_from_amount, price_to_amount)
+
+def parse_bungee_quote(bungee, amount, price_from_amount, price_to_amount):
+    to_amount = int(bungee["result"]["routes"][0]["toAmount"])/ (10 ** bungee["result"]["toAsset"]["decimals"])
+    to_amount_usd = float(price_to_amount) * to_amount
+    from_amount_usd = float(price_from_amount) * amount / (10 ** bungee["result"]["fromAsset"]["decimals"])
+    time = int(bungee["result"]["routes"][0]["serviceTime"])
+
+    gas_usd = bungee["result"]["routes"][0].get("totalGasFeesInUsd")
+
+    result = {
+        "project": "Bungee",
+        "expectedAmount": to_amount,
+        "efficiency": to_amount_usd / from_amount_usd,
+        "time": time,
+        # Bungee prices the gas itself (no gas units)
+        "gasCostUSD": float(gas_usd) if gas_usd is not None else None
+        }
+    result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
+    return result
 
 ### OKX
 
@@ -155,34 +192,42 @@ def okx_quote(fromChain, toChain, fromTokenAddress, toTokenAddress, amount,  pri
         'OK-ACCESS-PASSPHRASE': okx_passphrase
         }
 
-        response = requests.get(url, headers=headers)
+        # OKX reports its errors in a 200 body: count those against its circuit
+        response = yield quotes_http.Call("GET", url, headers=headers, timeout=provider_timeout("OKX"), validate=okx_answered)
 
         # Process the response
         if response.status_code == 200:
-            data = response.json()
+            return parse_okx_quote(response.json(), price_from_amount, price_to_amount)
+        else:
+            return {}
 
-            if data['code'] == '0' and data['data']:
-                first_route = data['data'][0]
+def okx_answered(response):
+    try:
+        return response.json().get('code') == '0'
+    except ValueError:
+        return False
 
-                to_amount = int(data["data"][0]["routerList"][0]["toTokenAmount"]) / (10 ** data["data"][0]["toToken"]["decimals"])
-                to_amount_usd = float(price_to_amount) * to_amount
-                from_amount_usd = float(price_from_amount) * int(data["data"][0]["fromTokenAmount"]) / (10 ** data["data"][0]["fromToken"]["decimals"])
+def parse_okx_quote(data, price_from_amount, price_to_amount):
+    if data['code'] == '0' and data['data']:
+        first_route = data['data'][0]
 
+        to_amount = int(data["data"][0]["routerList"][0]["toTokenAmount"]) / (10 ** data["data"][0]["toToken"]["decimals"])
+        to_amount_usd = float(price_to_amount) * to_amount
+        from_amount_usd = float(price_from_amount) * int(data["data"][0]["fromTokenAmount"]) / (10 ** data["data"][0]["fromToken"]["decimals"])
 
-                result = {
-                    "project": "OKX",
-                    "expectedAmount": to_amount,
-                    "efficiency": to_amount_usd / from_amount_usd,
-                    "time": int(first_route.get('routerList', [{}])[0].get('estimateTime', 0)),
-                }
 
-                result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
+        result = {
+            "project": "OKX",
+            "expectedAmount": to_amount,
+            "efficiency": to_amount_usd / from_amount_usd,
+            "time": int(first_route.get('routerList', [{}])[0].get('estimateTime', 0)),
+        }
 
-                return result
-            else:
-                return {}
-        else:
-            return {}
+        result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
+
+        return result
+    else:
+        return {}
 
 
 
@@ -192,14 +237,13 @@ def okx_quote(fromChain, toChain, fromTokenAddress, toTokenAddress, amount,  pri
 
 ### ODOS
 
-def odos_quote(fromChain, toChain, fromTokenAddress, toTokenAddress, amount, toTokenDecimals):
+def odos_quote(fromChain, toChain, fromTokenAddress, toTokenAddress, amount, toTokenDecimals, gas_price_gwei=None):
     if fromChain != toChain:
         return {}
     else:
         odos_data = {
                 "chainId": fromChain,
                 "compact": True,
-                "gasPrice": 20,
                 "inputTokens": [{"amount": str(int(amount)), "tokenAddress": fromTokenAddress}],
                 "outputTokens": [{"proportion": 1, "tokenAddress": toTokenAddress}],
                 "referralCode": 0,
@@ -208,28 +252,34 @@ def odos_quote(fromChain, toChain, fromTokenAddress, toTokenAddress, amount, toT
                 "sourceWhitelist": [],
                 "userAddr": "0xb29601eB52a052042FB6c68C69a442BD0AE90082"
             }
+        if gas_price_gwei is not None:
+            # Route for the chain's current gas price (Odos uses its own estimate otherwise)
+            odos_data["gasPrice"] = gas_price_gwei
 
-        odos_response = requests.post(
+        odos_response = yield quotes_http.Call("POST",
                 "https://api.odos.xyz/sor/quote/v2",
                 headers={"Content-Type": "application/json"},
-                json=odos_data
+                json=odos_data,
+                timeout=provider_timeout("Odos")
             )
 
         if odos_response.status_code == 200:
-                odos = odos_response.json()
-                to_amount = int(odos["outAmounts"][0]) / (10 ** toTokenDecimals)
-                result = {
-                    "project": "Odos",
-                    "expectedAmount": to_amount,
-                    "efficiency": 1 - odos["percentDiff"]/100,
-                    "time": 15
-                    }
-
-                result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
-                return result
+                return parse_odos_quote(odos_response.json(), toTokenDecimals)
         else:
                 return {}
-        return result
+
+def parse_odos_quote(odos, toTokenDecimals):
+    to_amount = int(odos["outAmounts"][0]) / (10 ** toTokenDecimals)
+    result = {
+        "project": "Odos",
+        "expectedAmount": to_amount,
+        "efficiency": 1 - odos["percentDiff"]/100,
+        "time": 15,
+        "gasUnits": gas_units(odos.get("gasEstimate"))
+        }
+
+    result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
+    return result
 
 ### 0x
 
@@ -244,35 +294,38 @@ def zero_quote(fromChain, toChain, fromTokenAddress, toTokenAddress, amount, pri
                     "sellAmount": int(amount),
                     'taker': '0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045'
                 }
-        zero_x_response = requests.get(
+        zero_x_response = yield quotes_http.Call("GET",
                     "https://api.0x.org/swap/permit2/quote",
                     headers={
                         "0x-api-key": zero_x_api_key,
                         "0x-version": "v2"
                     },
-                    params=zero_x_params
+                    params=zero_x_params,
+                    timeout=provider_timeout("0x")
                 )
 
         if zero_x_response.status_code == 200:
-                zero = zero_x_response.json()
-                to_amount = int(zero["buyAmount"]) / (10 ** toTokenDecimals)
-                to_amount_usd = float(price_to_amount) * to_amount / (10 ** toTokenDecimals)
-                from_amount_usd = float(price_from_amount) * int(amount) / (10 ** fromTokenDecimals)
+                return parse_zero_quote(zero_x_response.json(), amount, price_from_amount, price_to_amount, fromTokenDecimals, toTokenDecimals)
+        else:
+                return {}
 
-                result = {
-                    "project": "Odos",
-                    "expectedAmount": to_amount,
-                    "efficiency": 1- (to_amount_usd / from_amount_usd),
-                    "time": 15
-                    }
+def parse_zero_quote(zero, amount, price_from_amount, price_to_amount, fromTokenDecimals, toTokenDecimals):
+    to_amount = int(zero["buyAmount"]) / (10 ** toTokenDecimals)
+    to_amount_usd = float(price_to_amount) * to_amount
+    from_amount_usd = float(price_from_amount) * int(amount) / (10 ** fromTokenDecimals)
+
+    result = {
+        "project": "Odos",
+        "expectedAmount": to_amount,
+        "efficiency": 1- (to_amount_usd / from_amount_usd),
+        "time": 15,
+        "gasUnits": gas_units((zero.get("transaction") or {}).get("gas"))
+        }
 
-                result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
+    result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
 
 
-                return result
-        else:
-                return {}
-        return result
+    return result
 
 ### 1inch
 
@@ -284,45 +337,75 @@ def inch_quote(fromChain, toChain, fromTokenAddress, toTokenAddress, amount, pri
                    "src": fromTokenAddress,
                    "dst": toTokenAddress,
                    "amount": str(int(amount)),
-                   "fee": 0
+                   "fee": 0,
+                   "includeGas": "true"
                }
-       inch_response = requests.get(
+       inch_response = yield quotes_http.Call("GET",
                    f"https://api.1inch.dev/swap/v6.0/{fromChain}/quote",
                    headers={
                        "Authorization": f"Bearer {inch_api_key}",
                        "accept": "application/json",
                        "content-type": "application/json"
                    },
-                   params=inch_params
+                   params=inch_params,
+                   timeout=provider_timeout("1inch")
                )
 
        if inch_response.status_code == 200:
+                return parse_inch_quote(inch_response.json(), amount, price_from_amount, price_to_amount, fromTokenDecimals, toTokenDecimals)
+       else:
+                return {}
 
-                inch = inch_response.json()
-                to_amount = int(inch["dstAmount"]) / (10 ** toTokenDecimals)
-                to_amount_usd = float(price_to_amount) * to_amount
-                from_amount_usd = float(price_from_amount) * int(amount) / (10 ** fromTokenDecimals)
-
-                result = {
-                    "project": "1inch",
-                    "expectedAmount": to_amount,
-                    "efficiency": to_amount_usd / from_amount_usd,
-                    "time": 15
-                    }
+def parse_inch_quote(inch, amount, price_from_amount, price_to_amount, fromTokenDecimals, toTokenDecimals):
+    to_amount = int(inch["dstAmount"]) / (10 ** toTokenDecimals)
+    to_amount_usd = float(price_to_amount) * to_amount
+    from_amount_usd = float(price_from_amount) * int(amount) / (10 ** fromTokenDecimals)
+
+    result = {
+        "project": "1inch",
+        "expectedAmount": to_amount,
+        "efficiency": to_amount_usd / from_amount_usd,
+        "time": 15,
+        "gasUnits": gas_units(inch.get("gas"))
+        }
 
-                result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
+    result['efficiency'] = f"{result['efficiency'] * 100:.4f}%"
 
 
-                return result
-       else:
-                return {}
-       return result
+    return result
 
 ##########
 ### QUOTE FUNCTION
 ##########
 
+def normalize_token(token):
+    token = token.strip()
+    if token.lower().startswith('0x'):
+        return token.lower()
+    return 'WETH' if token.upper() == 'ETH' else token.upper()
+
+def normalize_request(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol):
+    """(origin chain id, destination chain id, origin token, destination token) of a request, as it is both quoted and cached
+
+    Chain names resolve in any case and spacing; tokens are upper-cased symbols (ETH is WETH) or lower-cased addresses.
+    """
+    return (metadata_index.chain_id(originChainSymbol, 1), metadata_index.chain_id(destinationChainSymbol, 8453),
+            normalize_token(originTokenSymbol), normalize_token(destinationTokenSymbol))
+
+def request_key(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amount):
+    """Cache key of a request: every spelling that quotes the same trade shares it"""
+    return quote_key(*normalize_request(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol), amount)
+
 def quote(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amountRaw):
+    calls, originChain = provider_calls(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amountRaw)
+    return rank_quotes(fan_out(calls, chain=originChain))
+
+def provider_calls(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amountRaw, resolve=None):
+    """Resolve the request and return ({project: (provider function, args)}, origin chain id)
+
+    `resolve(chain_id, symbol)` defaults to metadata_index.token; get_quotes passes a memoized one.
+    """
+    resolve = resolve or metadata_index.token
 
     lifi_key= "XXX"
     inch_api_key = "XXX"
@@ -333,58 +416,267 @@ def quote(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinat
     okx_secret_key = 'XXX'
     okx_passphrase = 'XXX'
 
-    headers = {
-        "accept": "application/json",
-        "x-lifi-api-key": lifi_key
-        }
-
-    # MAP: Chain -> ChainId
-    response = requests.get("https://li.quest/v1/chains?chainTypes=EVM", headers=headers)
-    chains = response.json()
-    name_to_chain_id = {item["name"]: item["id"] for item in chains["chains"]}
-    originChain = name_to_chain_id.get(originChainSymbol, 1)
-    destinationChain = name_to_chain_id.get(destinationChainSymbol, 8453)
-
-    # MAP: symbolToken -> Decimals, Token
-
-    if originTokenSymbol == 'ETH':
-        originTokenSymbol = 'WETH'
-    if destinationTokenSymbol == 'ETH':
-        destinationTokenSymbol = 'WETH'
-
-    response = requests.get(f"https://li.quest/v1/token?chain={originChain}&token={originTokenSymbol}", headers=headers)
-    token_1 = response.json()
-    amount = amountRaw * (10 ** token_1["decimals"])
-    originToken = token_1["address"]
-    price_from_amount = token_1["priceUSD"]
-    fromTokenDecimals = token_1["decimals"]
-
-    response = requests.get(f"https://li.quest/v1/token?chain={destinationChain}&token={destinationTokenSymbol}", headers=headers)
-    token_2 = response.json()
-    destinationToken = token_2["address"]
-    price_to_amount = token_2["priceUSD"]
-    toTokenDecimals = token_2["decimals"]
-
-
-    jumper = jumper_quote(originChain, destinationChain, originToken, destinationToken, amount, lifi_key, price_from_amount, price_to_amount)
-    relay = relay_quote(originChain, destinationChain, originToken, destinationToken, amount)
-    odos = odos_quote(originChain, destinationChain, originToken, destinationToken, amount, toTokenDecimals)
-    zero = zero_quote(originChain, destinationChain, originToken, destinationToken, amount, price_from_amount, price_to_amount, fromTokenDecimals, toTokenDecimals,zero_x_api_key)
-    inch = inch_quote(originChain, destinationChain, originToken, destinationToken, amount, price_from_amount, price_to_amount, fromTokenDecimals, toTokenDecimals, inch_api_key)
-    bungee = bungee_quote(originChain, destinationChain, originToken, destinationToken, amount, price_from_amount, price_to_amount, bungee_key)
-    okx_bridge = okx_quote(originChain, destinationChain, originToken, destinationToken, amount,  price_from_amount, price_to_amount,okx_project_key, okx_access_key, okx_secret_key, okx_passphrase, slippage=0.01)
-
-    if originChainSymbol== destinationChainSymbol:
-        quotes = [jumper,relay,odos,zero,inch]
+    with quotes_timing.span("metadata"):
+        metadata_index.maybe_refresh()
+
+        # MAP: Chain -> ChainId, symbolToken -> Decimals, Token (the same normalization as the cache key)
+        originChain, destinationChain, originTokenSymbol, destinationTokenSymbol = normalize_request(
+            originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol)
+
+        token_1 = resolve(originChain, originTokenSymbol)
+        token_2 = resolve(destinationChain, destinationTokenSymbol)
+    if token_1 is None or token_2 is None:
+        raise ValueError(f"Unknown token {originTokenSymbol if token_1 is None else destinationTokenSymbol}")
+
+    # MAP: Token -> priceUSD, from the in-memory feed (no per-request price I/O)
+    with quotes_timing.span("prices"):
+        prices_from = price_feed.snapshot(originChain)
+        prices_to = price_feed.snapshot(destinationChain)
+    price_feed.track(originChain, [token_1.address])
+    price_feed.track(destinationChain, [token_2.address])
+
+    amount = amountRaw * (10 ** token_1.decimals)
+    originToken = token_1.address
+    price_from_amount = prices_from.price(originToken)
+    fromTokenDecimals = token_1.decimals
+
+    destinationToken = token_2.address
+    price_to_amount = prices_to.price(destinationToken)
+    toTokenDecimals = token_2.decimals
+    if price_from_amount is None or price_to_amount is None:
+        raise ValueError(f"No USD price for {originTokenSymbol if price_from_amount is None else destinationTokenSymbol}")
+
+    # One origin-chain gas price, shared by every provider (and every request for about a block)
+    with quotes_timing.span("gas"):
+        gas_price = gas_prices.get(originChain)
+    gas_price_gwei = gas_price.gwei if gas_price is not None else None
+
+    calls = {
+        "Jumper": (jumper_quote, (originChain, destinationChain, originToken, destinationToken, amount, lifi_key, price_from_amount, price_to_amount)),
+        "Relay": (relay_quote, (originChain, destinationChain, originToken, destinationToken, amount)),
+    }
+    if originChain == destinationChain:
+        calls.update({
+            "Odos": (odos_quote, (originChain, destinationChain, originToken, destinationToken, amount, toTokenDecimals, gas_price_gwei)),
+            "0x": (zero_quote, (originChain, destinationChain, originToken, destinationToken, amount, price_from_amount, price_to_amount, fromTokenDecimals, toTokenDecimals, zero_x_api_key)),
+            "1inch": (inch_quote, (originChain, destinationChain, originToken, destinationToken, amount, price_from_amount, price_to_amount, fromTokenDecimals, toTokenDecimals, inch_api_key)),
+        })
     else:
-        quotes = [jumper,relay,bungee,okx_bridge]
-    quotes = sorted(quotes, key=lambda x: x['expectedAmount'], reverse=True)
-    return quotes
+        calls.update({
+            "Bungee": (bungee_quote, (originChain, destinationChain, originToken, destinationToken, amount, price_from_amount, price_to_amount, bungee_key)),
+            "OKX": (okx_quote, (originChain, destinationChain, originToken, destinationToken, amount, price_from_amount, price_to_amount,
+                                okx_project_key, okx_access_key, okx_secret_key, okx_passphrase, 0.01)),
+        })
+
+    # Every quote says which prices its efficiency was computed with
+    versions = (("priceVersion", prices_from.version),)
+    if originChain != destinationChain:
+        versions += (("destinationPriceVersion", prices_to.version),)
+    calls = {project: (stamp_quote, (versions, gas_price, prices_from, fn) + args) for project, (fn, args) in calls.items()}
+    return calls, originChain
+
+def stamp_quote(versions, gas_price, prices, fn, *args):
+    """Run a provider function and add the price versions and gas cost to its quote"""
+    result = yield from fn(*args)
+    if result:
+        result.update(versions)
+        # Costs the provider gave itself (bridges) are kept where ours are unknown
+        costs = gas_cost(result.get("gasUnits"), gas_price, prices)
+        result.update({name: value if value is not None else result.get(name) for name, value in costs.items()})
+    return result
+
+def rank_quotes(quotes):
+    """Best expected output first; entries without a quote (timed out, errors, ...) last"""
+    return sorted(quotes, key=lambda x: x.get('expectedAmount', -1), reverse=True)
+
+def cached_quote(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amountRaw):
+    """quote() behind the short-TTL cache; the amount is bucketed before quoting so every request in a bucket gets the same answer
+
+    The quotes are for that bucketed amount: responses report it as "quotedAmount".
+    """
+    amount = bucket_amount(amountRaw)
+    key = request_key(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amount)
+    return quote_cache.get_or_compute(
+        key,
+        lambda: quote(originChainSymbol, destinationChainSymbol, originTokenSymbol, destinationTokenSymbol, amount),
+        # Don't pin a full outage for a whole TTL
+        cacheable=lambda quotes: any('expectedAmount' in q for q in quotes)
+    )
 
 #########
 ## HELPERS
 ##########
 
+def batch_quotes(items, deadline=QUOTE_DEADLINE):
+    """Quote many (origin_chain, destination_chain, origin_token, destination_token, amount) items at once.
+
+    Items that normalize to the same cache key are quoted once, token metadata
+    is resolved once per distinct (chain, token), identical provider calls are
+    sent once, and every remaining call goes through a single fan-out, so the
+    batch costs about as much as its slowest upstream call (as long as the
+    calls fit the fan-out pool: past FANOUT_WORKERS they queue, each one's
+    timeout counting from its start, all within `deadline`). Returns one
+    {"status", "quotes"} or {"status": "error", "message"} per item, in order.
+    """
+    results = [None] * len(items)
+    keys = {}  # cache key -> (item indexes, normalized args)
+    for i, item in enumerate(items):
+        try:
+            args = (item['origin_chain'], item['destination_chain'], item['origin_token'], item['destination_token'],
+                    bucket_amount(float(item['amount'])))
+            key = request_key(*args)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            results[i] = {"status": "error", "message": f"Invalid item: {e}"}
+            continue
+        keys.setdefault(key, ([], args))[0].append(i)
+
+    def answer(key, value):
+        for i in keys[key][0]:
+            results[i] = value
+
+    # Cached answers first
+    for key in list(keys):
+        quotes = quote_cache.get(key)
+        if quotes is not None:
+            answer(key, {"status": "success", "quotedAmount": keys[key][1][4], "quotes": quotes})
+            del keys[key]
+
+    metadata_index.maybe_refresh()
+    resolved = {}
+    resolved_lock = Lock()
+
+    def lookup(chain_id, symbol):
+        token_key = (chain_id, symbol.upper())
+        with resolved_lock:
+            if token_key not in resolved:
+                resolved[token_key] = quotes_timing.submit(executor, metadata_index.token, chain_id, symbol)
+        return resolved[token_key]
+
+    def resolve(chain_id, symbol):
+        return lookup(chain_id, symbol).result()
+
+    # Start every distinct token lookup before building any call (misses go to LiFi concurrently)
+    for _, args in keys.values():
+        originChain, destinationChain, originToken, destinationToken = normalize_request(*args[:4])
+        lookup(originChain, originToken)
+        lookup(destinationChain, destinationToken)
+
+    # One job per distinct provider call; each key remembers which job answers which of its providers
+    jobs, job_ids, plans = {}, {}, {}
+    for key, (_, args) in keys.items():
+        try:
+            calls, chain = provider_calls(*args, resolve=resolve)
+        except Exception as e:
+            answer(key, {"status": "error", "message": str(e)})
+            continue
+        plan = plans[key] = []
+        for project, (fn, fn_args) in calls.items():
+            call = (fn, fn_args)
+            if call not in job_ids:
+                job_ids[call] = len(jobs)
+                jobs[job_ids[call]] = (project, chain, fn, fn_args)
+            plan.append(job_ids[call])
+
+    done = dict(_fan_out(jobs, deadline))
+    for key, plan in plans.items():
+        quotes = rank_quotes([done[job] for job in plan])
+        if any('expectedAmount' in q for q in quotes):
+            quote_cache.set(key, quotes)
+        answer(key, {"status": "success", "quotedAmount": keys[key][1][4], "quotes": quotes})
+    return results
+
+def provider_timeout(project):
+    return PROVIDER_TIMEOUTS.get(project, PROVIDER_TIMEOUT)
+
+def timed_call(project, chain, fn, args, deadline=None):
+    start = time.monotonic()
+    try:
+        # The provider's calls give up (rather than wait on rate limits or backoff) once the fan-out stops waiting for them
+        return quotes_http.run(fn(*args), deadline)
+    finally:
+        provider_latency.observe(time.monotonic() - start, provider=project, chain=chain)
+
+def fan_out(calls, deadline=QUOTE_DEADLINE, chain=""):
+    """Run provider calls concurrently and return their results in call order.
+
+    Each provider gets min(its own timeout, overall deadline) counted from the
+    start of the fan-out, so the response waits for the slowest provider within
+    budget instead of the sum of all of them. Late providers come back as
+    {"project": ..., "status": "timed_out"}.
+    """
+    # Keyed by call, not by result["project"]: a parser may label its quote differently
+    results = dict(_fan_out(_jobs(calls, chain), deadline))
+    return [results[project] for project in calls]
+
+def iter_fan_out(calls, deadline=QUOTE_DEADLINE, chain=""):
+    """Same as fan_out(), but yields each provider's result as soon as it is known"""
+    for _, result in _fan_out(_jobs(calls, chain), deadline):
+        yield result
+
+def _jobs(calls, chain):
+    return {project: (project, chain, fn, args) for project, (fn, args) in calls.items()}
+
+def _fan_out(jobs, deadline):
+    """Run {job id: (project, chain, fn, args)} concurrently, yielding (job id, result) in completion order.
+
+    A provider's timeout counts from when its call leaves the pool's queue (a
+    large batch has more calls than workers), within the overall deadline.
+    """
+    start = time.monotonic()
+    end = start + deadline
+    # Calls still queued have until the overall deadline; started ones until their own timeout too
+    expiry = dict.fromkeys(jobs, end)
+
+    def started(job, project, chain, fn, args):
+        expiry[job] = min(time.monotonic() + provider_timeout(project), end)
+        return timed_call(project, chain, fn, args, expiry[job])
+
+    pending = {
+        quotes_timing.submit(executor, started, job, project, chain, fn, args): job
+        for job, (project, chain, fn, args) in jobs.items()
+    }
+
+    while pending:
+        timeout = max(min(expiry[job] for job in pending.values()) - time.monotonic(), 0)
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            job = pending.pop(future)
+            project, chain = jobs[job][:2]
+            yield job, provider_result(project, future, chain)
+
+        now = time.monotonic()
+        for future, job in list(pending.items()):
+            if expiry[job] <= now:
+                future.cancel()
+                del pending[future]
+                project, chain = jobs[job][:2]
+                provider_outcomes.inc(provider=project, chain=chain, outcome="timed_out")
+                yield job, {"project": project, "status": "timed_out"}
+
+    timings = quotes_timing.current()
+    if timings is not None:
+        timings.add("fanout", time.monotonic() - start)
+
+def provider_result(project, future, chain):
+    """Normalize a finished provider call into a quote or a {"project", "status"} entry"""
+    try:
+        result = future.result()
+    except CircuitOpen as e:
+        result = {"project": project, "status": "skipped", "message": str(e)}
+    except DeadlineExceeded:
+        # Over its rate limit for this request's deadline: not called
+        result = {"project": project, "status": "rate_limited"}
+    except requests.exceptions.Timeout:
+        result = {"project": project, "status": "timed_out"}
+    except Exception as e:
+        # Anything raised while reading a 200 response is a parse failure
+        if isinstance(e, (KeyError, IndexError, TypeError, ValueError)):
+            parse_failures.inc(provider=project)
+        result = {"project": project, "status": "error", "message": str(e)}
+    result = result or {"project": project, "status": "no_quote"}
+    provider_outcomes.inc(provider=project, chain=chain, outcome=result.get("status", "ok"))
+    return result
+
 def generate_okx_signature(timestamp, method, request_path, secret_key):
     message = f"{timestamp}{method}{request_path}"
     # Create HMAC-SHA256 signature
@@ -395,6 +687,41 @@ def generate_okx_signature(timestamp, method, request_path, secret_key):
     ).digest()
     return base64.b64encode(signature).decode('utf-8')
 
+@app.before_request
+def start_timing():
+    """Collect the request's stage spans; profile a PROFILE_SAMPLE_RATE share of requests, and those sent with PROFILE_HEADER"""
+    profile = random.random() < PROFILE_SAMPLE_RATE or bool(request.headers.get(PROFILE_HEADER))
+    _, g.profile = quotes_timing.begin(profile=profile)
+    g.thread_profile = g.profile.start() if g.profile is not None else None
+
+@app.after_request
+def add_server_timing(response):
+    """Server-Timing header with every span (and in the JSON body with ?timing=1); saves the profile if any"""
+    timings = quotes_timing.current()
+    if timings is None:
+        return response
+    if g.get('profile') is not None:
+        g.profile.stop(g.pop('thread_profile', None))
+        path = g.profile.save(PROFILE_PATH, request.endpoint or "request")
+        if path:
+            response.headers['X-Profile-Path'] = path
+    # Streamed bodies are produced after the headers are sent
+    if response.is_streamed:
+        return response
+    response.headers['Server-Timing'] = timings.header()
+    if request.args.get('timing') and response.is_json:
+        body = response.get_json()
+        if isinstance(body, dict):
+            body['timing'] = timings.as_list()
+            response.set_data(json.dumps(body))
+    return response
+
+@app.teardown_request
+def end_timing(exc):
+    if g.get('thread_profile') is not None:
+        g.profile.stop(g.pop('thread_profile'))
+    quotes_timing.end()
+
 @app.route('/get_quote', methods=['GET'])
 def get_quote():
     try:
@@ -407,10 +734,12 @@ def get_quote():
 
 
         # Call the quote function
-        quotes = quote(origin_chain, destination_chain, origin_token, destination_token, amount)
+        quotes = cached_quote(origin_chain, destination_chain, origin_token, destination_token, amount)
 
         return jsonify({
             "status": "success",
+            # Quotes are for the bucketed amount (see bucket_amount), not necessarily the requested one
+            "quotedAmount": bucket_amount(amount),
             "quotes": quotes
         }), 200
 
@@ -420,6 +749,111 @@ def get_quote():
             "message": str(e)
         }), 400
 
+@app.route('/get_quotes', methods=['POST'])
+def get_quotes():
+    """Batch /get_quote: {"items": [{"origin_chain", "destination_chain", "origin_token", "destination_token", "amount", "id"?}, ...]}
+
+    Results are keyed by each item's "id", or by its position when it has none.
+    """
+    body = request.get_json(silent=True) or {}
+    items = body.get('items')
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({"status": "error", "message": "Expected a JSON body with a list of items"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"status": "error", "message": f"At most {BATCH_MAX_ITEMS} items per request"}), 400
+
+    results = batch_quotes(items)
+    return jsonify({
+        "status": "success",
+        "results": {str(item.get('id', i)): result for i, (item, result) in enumerate(zip(items, results))}
+    }), 200
+
+@app.route('/get_quote/stream', methods=['GET'])
+def get_quote_stream():
+    """Server-Sent Events: one `quote` event per provider as it answers, then a ranked `summary`"""
+    origin_chain = request.args.get('origin_chain')
+    destination_chain = request.args.get('destination_chain')
+    origin_token = request.args.get('origin_token')
+    destination_token = request.args.get('destination_token')
+    amount = request.args.get('amount')
+
+    def events():
+        try:
+            amountRaw = bucket_amount(float(amount))
+            calls, originChain = provider_calls(origin_chain, destination_chain, origin_token, destination_token, amountRaw)
+            quotes = []
+            for result in iter_fan_out(calls, chain=originChain):
+                quotes.append(result)
+                yield sse_event("quote", result)
+
+            quotes = rank_quotes(quotes)
+            if any('expectedAmount' in q for q in quotes):
+                quote_cache.set(request_key(origin_chain, destination_chain, origin_token, destination_token, amountRaw), quotes)
+            yield sse_event("summary", {"status": "success", "quotedAmount": amountRaw, "quotes": quotes})
+        except Exception as e:
+            yield sse_event("error", {"status": "error", "message": str(e)})
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/history', methods=['GET'])
+def get_history():
+    """Stored quotes for a chain/pair (optionally size and platform) between start and end (unix seconds).
+
+    Paginated with limit/offset. Long ranges are downsampled to at most
+    HISTORY_MAX_POINTS points per series unless `interval` (seconds, 0 = raw
+    rows) is given.
+    """
+    try:
+        from quotes_store import query_history
+
+        chain = request.args.get('chain', '')
+        chain_id = int(chain) if chain.isdigit() else metadata_index.chain_id(chain)
+        if chain_id is None:
+            raise ValueError(f"Unknown chain {chain}")
+        end = int(request.args.get('end', time.time()))
+        start = int(request.args.get('start', end - 7 * 86400))
+        limit = min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+        offset = int(request.args.get('offset', 0))
+        interval = request.args.get('interval')
+        if interval is None:
+            # Hourly snapshots: keep raw rows up to HISTORY_MAX_POINTS hours, then whole hours per point
+            hours = -(-(end - start) // 3600)
+            interval = 0 if hours <= HISTORY_MAX_POINTS else -(-hours // HISTORY_MAX_POINTS) * 3600
+        interval = int(interval)
+        size = request.args.get('size')
+
+        table, next_offset = query_history(
+            chain_id=chain_id,
+            fromToken=request.args.get('origin_token', '').upper() or None,
+            toToken=request.args.get('destination_token', '').upper() or None,
+            platform=request.args.get('platform'),
+            amountIn=float(size) if size is not None else None,
+            start=start,
+            end=end,
+            limit=limit,
+            offset=offset,
+            interval=interval,
+        )
+        return jsonify({
+            "status": "success",
+            "interval": interval,
+            "rows": table.to_pylist(),
+            "next_offset": next_offset
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
 
 # if __name__ == '__main__':
 #     app.run(debug=True, port=5001)
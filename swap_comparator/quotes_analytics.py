@@ -0,0 +1,80 @@
+# quotes_analytics.py
+
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from quotes_config import STORE_PATH
+
+# One comparable snapshot: every provider quoted the same trade in the same hour
+SNAPSHOT_KEYS = ['timestamp', 'chainId', 'fromToken', 'toToken', 'amountIn']
+DIMENSIONS = ['platform', 'chainId', 'fromToken', 'toToken', 'size_bucket', 'window']
+
+
+def load_history(root: str = STORE_PATH, **keys) -> pd.DataFrame:
+    """Stored quote rows as a DataFrame (keys are passed to quotes_store.read_history)"""
+    from quotes_store import read_history
+
+    table = read_history(root, **keys)
+    df = table.to_pandas()
+    for column in ('platform', 'fromToken', 'toToken', 'status'):
+        if column in df and isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(str)
+    return df
+
+
+def score_quotes(df: pd.DataFrame) -> pd.DataFrame:
+    """Add per-quote competitiveness columns, comparing each quote with the rest of its snapshot.
+
+    - bps_vs_best: output vs the best output of the snapshot, in bps (0 for the winner)
+    - rank: 1 = best output (ties share the rank)
+    - win: rank == 1
+    - gas_adjusted_bps: same as bps_vs_best on amountOutUSD - gasCostUSD, when both are stored
+    """
+    df = df[(df['status'] == 'ok') & df['amountOut'].notna()].copy()
+    snapshot = df.groupby(SNAPSHOT_KEYS, sort=False, observed=True)['amountOut']
+
+    best = snapshot.transform('max')
+    df['bps_vs_best'] = (df['amountOut'] / best - 1) * 1e4
+    df['rank'] = snapshot.rank(method='min', ascending=False).astype(int)
+    df['win'] = df['rank'] == 1
+
+    if 'amountOutUSD' in df and 'gasCostUSD' in df:
+        net = df['amountOutUSD'] - df['gasCostUSD'].fillna(0)
+        best_net = net.groupby([df[key] for key in SNAPSHOT_KEYS], sort=False, observed=True).transform('max')
+        df['gas_adjusted_bps'] = (net / best_net - 1) * 1e4
+    else:
+        df['gas_adjusted_bps'] = np.nan
+    return df
+
+
+def add_dimensions(df: pd.DataFrame, freq: str = 'D') -> pd.DataFrame:
+    """Add the size bucket (power of ten of amountIn) and the time window (`freq` period) of each row"""
+    df = df.copy()
+    # The epsilon keeps exact powers of ten (1000 -> log10 2.9999...) in their own bucket
+    df['size_bucket'] = 10.0 ** np.floor(np.log10(df['amountIn'].to_numpy(dtype=float)) + 1e-9)
+    df['window'] = pd.to_datetime(df['timestamp'], unit='s', utc=True).dt.tz_localize(None).dt.to_period(freq).dt.start_time
+    return df
+
+
+def competitiveness(df: pd.DataFrame, freq: str = 'D', by: Optional[List[str]] = None) -> pd.DataFrame:
+    """Win rate, bps vs best, mean rank and gas-adjusted efficiency per platform x chain x pair x size x window"""
+    by = by or DIMENSIONS
+    scored = add_dimensions(score_quotes(df), freq)
+    return scored.groupby(by, observed=True).agg(
+        quotes=('amountOut', 'size'),
+        win_rate=('win', 'mean'),
+        mean_bps_vs_best=('bps_vs_best', 'mean'),
+        median_bps_vs_best=('bps_vs_best', 'median'),
+        mean_rank=('rank', 'mean'),
+        gas_adjusted_bps=('gas_adjusted_bps', 'mean'),
+    ).reset_index()
+
+
+def rank_distribution(df: pd.DataFrame, freq: str = 'D', by: Optional[List[str]] = None) -> pd.DataFrame:
+    """Share of quotes at each rank, one column per rank"""
+    by = by or DIMENSIONS
+    scored = add_dimensions(score_quotes(df), freq)
+    counts = scored.groupby(by + ['rank'], observed=True).size().unstack('rank', fill_value=0)
+    return counts.div(counts.sum(axis=1), axis=0).reset_index()
@@ -0,0 +1,245 @@
+# quotes_archive.py
+
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import repeat
+from typing import Callable, Dict, IO, Iterator, List, Optional, Tuple
+
+from quotes_config import ARCHIVE_PATH, ARCHIVE_LEVEL, NETWORK_CONFIG, PRICE_LOG_PATH, STORE_PATH
+
+# zstandard is only needed by the archive; sweeps run without it (unarchived)
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+# (timestamp, platform, chainId, fromToken, toToken, amountIn)
+IndexKey = Tuple[int, str, int, str, str, float]
+
+# Row fields computed from the answer, reset before it is re-extracted
+EXTRACTED_FIELDS = [
+    "amountOut", "amountOutRaw", "minAmountOutRaw", "amountInUSD", "amountOutUSD",
+    "gasUnits", "gasCostNative", "gasCostUSD",
+]
+
+NETWORKS = {config['chain_id']: network for network, config in NETWORK_CONFIG.items()}
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise ImportError("The raw-response archive needs zstandard: pip install zstandard")
+
+
+def index_key(row: Dict) -> IndexKey:
+    return (int(row["timestamp"]), row["platform"], int(row["chainId"]), row["fromToken"], row["toToken"], float(row["amountIn"]))
+
+
+def _parse_index_line(line: str) -> Tuple[IndexKey, int, int]:
+    timestamp, platform, chain_id, fromToken, toToken, amountIn, offset, length = line.rstrip("\n").split("\t")
+    return (int(timestamp), platform, int(chain_id), fromToken, toToken, float(amountIn)), int(offset), int(length)
+
+
+def _date(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class ArchiveWriter:
+    """Append-only log of raw provider answers.
+
+    Each answer (with the row it produced) is one zstd frame appended to a
+    segment, `<root>/date=<date>/part-<timestamp>-<run>.zst`, and its key and
+    byte range are appended to the segment's `.idx`, so one answer can be read
+    back without decompressing the others. Every writer starts its own
+    segments; nothing is rewritten.
+    """
+
+    def __init__(self, root: str = ARCHIVE_PATH, level: int = ARCHIVE_LEVEL):
+        _require_zstandard()
+        self.root = root
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._segments: Dict[str, Tuple[IO[bytes], IO[str]]] = {}
+        self._run_id = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+
+    def append(self, row: Dict, response: Optional[Dict]) -> None:
+        payload = json.dumps({"row": row, "response": response}, separators=(",", ":"), default=str).encode()
+        key = index_key(row)
+        with self._lock:
+            frame = self._compressor.compress(payload)
+            data, index = self._segment(row["timestamp"])
+            offset = data.tell()
+            data.write(frame)
+            # The frame is written before its index line: a crash leaves unindexed bytes, never a dangling entry
+            data.flush()
+            index.write("\t".join(str(value) for value in key + (offset, len(frame))) + "\n")
+            index.flush()
+
+    def _segment(self, timestamp: int) -> Tuple[IO[bytes], IO[str]]:
+        date = _date(timestamp)
+        segment = self._segments.get(date)
+        if segment is None:
+            directory = os.path.join(self.root, f"date={date}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{timestamp}-{self._run_id}")
+            segment = self._segments[date] = (open(path + ".zst", "ab"), open(path + ".idx", "a"))
+        return segment
+
+    def close(self) -> None:
+        with self._lock:
+            for data, index in self._segments.values():
+                data.close()
+                index.close()
+            self._segments.clear()
+
+
+class ArchiveSink:
+    """Sink wrapper: archive each row's raw answer (its "response"), then pass the row on without it"""
+
+    def __init__(self, sink: Callable[[Dict], None], writer: Optional[ArchiveWriter] = None):
+        self.sink = sink
+        self.writer = writer or ArchiveWriter()
+
+    @property
+    def on_flush(self):
+        # Rows are stored once the wrapped sink writes them out (AttributeError when it does so at once)
+        return self.sink.on_flush
+
+    @on_flush.setter
+    def on_flush(self, callback) -> None:
+        self.sink.on_flush = callback
+
+    def __call__(self, row: Dict) -> None:
+        response = row.pop("response", None)
+        self.writer.append(row, response)
+        self.sink(row)
+
+    def close(self) -> None:
+        self.writer.close()
+        if hasattr(self.sink, "close"):
+            self.sink.close()
+
+
+def segments(root: str = ARCHIVE_PATH) -> List[str]:
+    """Segment files of the archive, oldest date first"""
+    found = []
+    if not os.path.isdir(root):
+        return found
+    for date_dir in sorted(os.listdir(root)):
+        directory = os.path.join(root, date_dir)
+        found += sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".zst"))
+    return found
+
+
+def read_index(segment: str) -> List[Tuple[IndexKey, int, int]]:
+    """(key, offset, length) of every answer of a segment"""
+    with open(segment[:-len(".zst")] + ".idx") as f:
+        return [_parse_index_line(line) for line in f if line.strip()]
+
+
+def read_segment(segment: str) -> Iterator[Tuple[Dict, Optional[Dict]]]:
+    """(row, response) of every answer of a segment, in write order"""
+    _require_zstandard()
+    decompressor = zstandard.ZstdDecompressor()
+    with open(segment, "rb") as f:
+        data = f.read()
+    for _, offset, length in read_index(segment):
+        record = json.loads(decompressor.decompress(data[offset:offset + length]))
+        yield record["row"], record["response"]
+
+
+def lookup(timestamp: int, platform: str, chain_id: int, fromToken: str, toToken: str, amountIn: float,
+           root: str = ARCHIVE_PATH) -> Optional[Tuple[Dict, Optional[Dict]]]:
+    """(row, response) archived for one quote, reading only its own frame"""
+    _require_zstandard()
+    key = (int(timestamp), platform, int(chain_id), fromToken, toToken, float(amountIn))
+    directory = os.path.join(root, f"date={_date(timestamp)}")
+    if not os.path.isdir(directory):
+        return None
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".zst"):
+            continue
+        segment = os.path.join(directory, name)
+        for entry_key, offset, length in read_index(segment):
+            if entry_key == key:
+                with open(segment, "rb") as f:
+                    f.seek(offset)
+                    record = json.loads(zstandard.ZstdDecompressor().decompress(f.read(length)))
+                return record["row"], record["response"]
+    return None
+
+
+@lru_cache(maxsize=None)
+def _price_versions(chain_id: int, log_path: str) -> Dict:
+    """Every logged price version of a chain (read once per process)"""
+    from quotes_prices import PriceSnapshot
+
+    versions = {}
+    path = os.path.join(log_path, f"{chain_id}.jsonl")
+    if os.path.isfile(path):
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                versions[entry["version"]] = PriceSnapshot(chain_id, entry["version"], entry["fetchedAt"], entry["prices"])
+    return versions
+
+
+def rebuild_row(row: Dict, response: Optional[Dict], log_path: str = PRICE_LOG_PATH) -> Dict:
+    """Re-extract an archived answer with the current extractors.
+
+    USD values use the price version the row was stored with (from the price
+    log) and gas costs its gas price, so nothing is fetched again. Rows without
+    an answer (no quote, skipped, interpolated...) are kept as archived.
+    """
+    if response is None:
+        return row
+    from quotes_gas import GasPrice
+    from quotes_sweep import WorkUnit, extract_row
+
+    chain_id = int(row["chainId"])
+    unit = WorkUnit(NETWORKS[chain_id], chain_id, row["fromToken"], row["toToken"], row["amountIn"], row["platform"])
+    prices = _price_versions(chain_id, log_path).get(row.get("priceVersion"))
+    gas_price = GasPrice(chain_id, round(row["gasPriceGwei"] * 1e9), 0.0) if row.get("gasPriceGwei") is not None else None
+
+    row = dict(row, **{field: None for field in EXTRACTED_FIELDS})
+    try:
+        extract_row(row, unit, response, gas_price, prices)
+    except Exception:
+        row["status"] = "error"
+    return row
+
+
+def replay_segment(segment: str, output_root: str, log_path: str = PRICE_LOG_PATH) -> int:
+    """Re-extract one segment into the store at `output_root`; returns the number of rows"""
+    from quotes_store import ParquetSink
+
+    sink = ParquetSink(output_root)
+    count = 0
+    try:
+        for row, response in read_segment(segment):
+            sink(rebuild_row(row, response, log_path))
+            count += 1
+    finally:
+        sink.close()
+    return count
+
+
+def replay(root: str = ARCHIVE_PATH, output_root: str = STORE_PATH + "-replay", processes: Optional[int] = None,
+           log_path: str = PRICE_LOG_PATH) -> int:
+    """Rebuild the quote store from the archive, one segment per worker process.
+
+    The store is written to a new `output_root` (swap it in place of the old
+    one once checked). Returns the number of rows written.
+    """
+    _require_zstandard()
+    if os.path.isdir(output_root) and os.listdir(output_root):
+        raise ValueError(f"{output_root} is not empty")
+    found = segments(root)
+    # Biggest segments first, so the pool doesn't end waiting on one
+    found.sort(key=os.path.getsize, reverse=True)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return sum(pool.map(replay_segment, found, repeat(output_root), repeat(log_path)))
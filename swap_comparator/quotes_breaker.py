@@ -0,0 +1,152 @@
+# quotes_breaker.py
+
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+from quotes_config import (
+    BREAKER_WINDOW, BREAKER_MIN_CALLS, BREAKER_ERROR_RATE, BREAKER_SLOW_CALL, BREAKER_SLOW_CALLS,
+    BREAKER_COOLDOWN, BREAKER_PROBES
+)
+from quotes_metrics import Gauge, circuit_transitions, registry, _labels
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+    def __init__(self, provider: str):
+        super().__init__(f"{provider} skipped: circuit open")
+        self.provider = provider
+
+
+class CircuitBreaker:
+    """Rolling error-rate breaker for one provider.
+
+    Calls that fail or take longer than `slow_call` seconds count as failures.
+    Once at least `min_calls` calls in the last `window` seconds have a failure
+    rate of `error_rate` or more, the circuit opens and calls are refused for
+    `cooldown` seconds. It then goes half-open: up to `probes` calls go through,
+    and the circuit closes once they all succeed, or opens again on the first failure.
+    """
+
+    def __init__(self, provider: str, window: float = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate: float = BREAKER_ERROR_RATE, slow_call: float = BREAKER_SLOW_CALL,
+                 cooldown: float = BREAKER_COOLDOWN, probes: int = BREAKER_PROBES):
+        self.provider = provider
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.cooldown = cooldown
+        self.probes = probes
+        self.state = CLOSED
+        self._calls: deque = deque()  # (time, failed)
+        self._opened_at = 0.0
+        self._probes_sent = 0
+        self._probes_ok = 0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether a call would be let through right now (does not take a probe slot)"""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self._opened_at >= self.cooldown
+            return self.state == CLOSED or self._probes_sent < self.probes
+
+    def allow(self) -> bool:
+        """Ask to make a call; every allowed call must be followed by record()"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now - self._opened_at < self.cooldown:
+                    return False
+                self._transition(HALF_OPEN, now)
+            if self.state == HALF_OPEN:
+                # A probe that never reported back (e.g. cancelled) frees its slot after another cooldown
+                if self._probes_sent >= self.probes and now - self._opened_at >= 2 * self.cooldown:
+                    self._opened_at = now - self.cooldown
+                    self._probes_sent = self._probes_ok
+                if self._probes_sent >= self.probes:
+                    return False
+                self._probes_sent += 1
+            return True
+
+    def release(self) -> None:
+        """Give back the slot of an allowed call that was never made (nothing to record)"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_sent > self._probes_ok:
+                self._probes_sent -= 1
+
+    def record(self, ok: bool, latency: float = 0.0) -> None:
+        failed = not ok or latency > self.slow_call
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._transition(OPEN, now)
+                else:
+                    self._probes_ok += 1
+                    if self._probes_ok >= self.probes:
+                        self._transition(CLOSED, now)
+                return
+            if self.state == OPEN:
+                return  # late answer from before the circuit opened
+
+            self._calls.append((now, failed))
+            while self._calls and self._calls[0][0] < now - self.window:
+                self._calls.popleft()
+            failures = sum(failed for _, failed in self._calls)
+            if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.error_rate:
+                self._transition(OPEN, now)
+
+    def _transition(self, state: str, now: float) -> None:
+        self.state = state
+        self._probes_sent = self._probes_ok = 0
+        if state == OPEN:
+            self._opened_at = now
+        if state != HALF_OPEN:
+            self._calls.clear()
+        circuit_transitions.inc(provider=self.provider, state=state)
+
+
+class Breakers:
+    """One circuit breaker per provider (quotes_http provider keys)"""
+
+    def __init__(self, slow_calls: Dict[str, float] = BREAKER_SLOW_CALLS):
+        self.slow_calls = slow_calls
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker(provider, slow_call=self.slow_calls.get(provider, BREAKER_SLOW_CALL))
+            return self._breakers[provider]
+
+    def available(self, provider: str) -> bool:
+        return self.breaker(provider).available()
+
+    def allow(self, provider: str) -> bool:
+        return self.breaker(provider).allow()
+
+    def release(self, provider: str) -> None:
+        self.breaker(provider).release()
+
+    def record(self, provider: str, ok: bool, latency: float = 0.0) -> None:
+        self.breaker(provider).record(ok, latency)
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            return {provider: breaker.state for provider, breaker in self._breakers.items()}
+
+
+breakers = Breakers()
+
+registry.register(Gauge(
+    "quotes_circuit_state", "Circuit breaker state by provider (0 closed, 1 half-open, 2 open)",
+    lambda: {_labels({"provider": provider}): STATE_VALUES[state] for provider, state in breakers.states().items()}
+))
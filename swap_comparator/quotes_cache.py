@@ -0,0 +1,169 @@
+# quotes_cache.py
+
+import json
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from quotes_config import QUOTE_CACHE_TTL, QUOTE_CACHE_SIZE, QUOTE_AMOUNT_SIG_DIGITS, SHARED_CACHE_PATH, SHARED_CACHE_BUSY_TIMEOUT
+from quotes_metrics import lookups
+
+
+def bucket_amount(amount: float, digits: int = QUOTE_AMOUNT_SIG_DIGITS) -> float:
+    """Round an amount to `digits` significant digits so near-identical requests share a key"""
+    if amount <= 0:
+        return amount
+    return round(amount, digits - 1 - int(math.floor(math.log10(amount))))
+
+
+def quote_key(originChain: int, destinationChain: int, originToken: str, destinationToken: str, amount: float) -> tuple:
+    """Normalized cache key for a /get_quote request, on resolved chain ids (see quote_agg_flask.request_key)"""
+    tokens = tuple('WETH' if token.strip().upper() == 'ETH' else token.strip().upper() for token in (originToken, destinationToken))
+    return (int(originChain), int(destinationChain)) + tokens + (bucket_amount(amount),)
+
+
+class QuoteCache:
+    """LRU cache with a TTL and single-flight coalescing of concurrent misses.
+
+    While a value is being computed for a key, other callers asking for the
+    same key wait for that computation instead of starting their own.
+    """
+
+    def __init__(self, ttl: float = QUOTE_CACHE_TTL, max_size: int = QUOTE_CACHE_SIZE, name: str = "quote"):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.counters: Counter = Counter()
+        self._entries: OrderedDict = OrderedDict()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                result = "hit"
+            else:
+                future = self._in_flight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._in_flight[key] = Future()
+                result = "miss" if leader else "coalesced"
+            self.counters[result] += 1
+        lookups.inc(cache=self.name, result=result)
+
+        if result == "hit":
+            return entry[1]
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            if cacheable(value):
+                self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                result = "hit"
+            else:
+                entry = None
+                result = "miss"
+            self.counters[result] += 1
+        lookups.inc(cache=self.name, result=result)
+        return entry[1] if entry is not None else None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedCache:
+    """JSON values with a TTL in a SQLite file, shared by every worker process on the box.
+
+    Each thread gets its own connection; WAL mode lets readers run while a
+    worker writes. Keys are any JSON-serializable value (tuples included).
+    The cache is best effort: a file still locked after `busy_timeout`
+    seconds makes a read a miss and drops a write.
+    """
+
+    def __init__(self, path: str = SHARED_CACHE_PATH, ttl: float = QUOTE_CACHE_TTL, name: str = "shared",
+                 busy_timeout: float = SHARED_CACHE_BUSY_TIMEOUT):
+        self.path = path
+        self.ttl = ttl
+        self.name = name
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return json.dumps(key, default=str)
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value, or None when missing, expired or locked"""
+        try:
+            row = self._connection().execute("SELECT value, expires FROM cache WHERE key = ?", (self._key(key),)).fetchone()
+        except sqlite3.OperationalError:
+            # Busy: not worth waiting for, the caller computes the value instead
+            row = None
+        hit = row is not None and row[1] > time.time()
+        lookups.inc(cache=self.name, result="hit" if hit else "miss")
+        return json.loads(row[0]) if hit else None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (self._key(key), json.dumps(value), now + (self.ttl if ttl is None else ttl))
+            )
+            # Expired rows are dropped now and then rather than on every write
+            if random.random() < 0.01:
+                connection.execute("DELETE FROM cache WHERE expires < ?", (now,))
+        except sqlite3.OperationalError:
+            # Busy: drop the write, the next miss fills it
+            pass
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM cache")
@@ -8,6 +8,8 @@ Created on Sat Oct 26 08:42:42 2024
 
 # config.py
 
+import os
+
 # API Keys
 INCH_API_KEY = "XX"
 ZERO_X_API_KEY =  "XX"
@@ -29,7 +31,10 @@ NETWORK_CONFIG = {
     'Arbitrum': {
         'chain_id': 42161,
         'USDC': '0xaf88d065e77c8cc2239327c5edb3a432268e5831',
-        'WETH': '0x82af49447d8a07e3bd95bd0d56f35241523fbab1'
+        'WETH': '0x82af49447d8a07e3bd95bd0d56f35241523fbab1',
+        'USDT': '0xfd086bc7cd5c481dcc9c85ebe478a1c0b69fcbb9',
+        'WBTC': '0x2f2a2543b76a4166549f7aab2e75bef0aefc5b0f',
+        'ARB': '0x912ce59144191c1204e64559fe8253a0e49e6548'
     },
     'Optimism': {
         'chain_id': 10,
@@ -39,10 +44,215 @@ NETWORK_CONFIG = {
     'Mainnet': {
         'chain_id': 1,
         'USDC': '0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48',
-        'WETH': '0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2'
+        'WETH': '0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2',
+        'USDT': '0xdac17f958d2ee523a2206206994597c13d831ec7',
+        'DAI': '0x6b175474e89094c44da98b954eedeac495271d0f',
+        'WBTC': '0x2260fac5e5542a773aa44fbcfedf7c193bc2c599',
+        'WSTETH': '0x7f39c581f595b53c5cb19bd0b3f8da6c935e2ca0',
+        'MKR': '0x9f8f72aa9304c8b593d555f12ef6589cc3a579a2',
+        'PEPE': '0x6982508145454ce325ddbe47a25d4ec3d2311933'
     }
 }
 
+# Token decimals (same on every chain for the tokens we track)
+TOKEN_DECIMALS = {
+    'USDC': 6,
+    'USDT': 6,
+    'DAI': 18,
+    'WETH': 18,
+    'WBTC': 8,
+    'WSTETH': 18,
+    'MKR': 18,
+    'PEPE': 18,
+    'ARB': 18
+}
+
+# Other names the same networks go by (LiFi chain names, CLI shorthands)
+CHAIN_ALIASES = {
+    'Ethereum': 'Mainnet',
+    'ETH': 'Mainnet',
+    'ARBITRUM': 'Arbitrum',
+    'OP Mainnet': 'Optimism'
+}
+
 # Default parameters
 DEFAULT_USER_ADDRESS = "0xb29601eB52a052042FB6c68C69a442BD0AE90082"
 DEFAULT_TAKER_ADDRESS = "0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045"
+
+# Provider fan-out (seconds)
+PROVIDER_TIMEOUT = 5
+PROVIDER_TIMEOUTS = {
+    'Bungee': 8,
+    'OKX': 8,
+    'Relay': 8
+}
+QUOTE_DEADLINE = 10
+FANOUT_WORKERS = 32
+BATCH_MAX_ITEMS = 20  # POST /get_quotes: up to 5 provider calls each, about three rounds of the fan-out pool
+
+# Chain/token metadata index
+LIFI_CHAINS_URL = "https://li.quest/v1/chains"
+LIFI_TOKENS_URL = "https://li.quest/v1/tokens"
+LIFI_TOKEN_URL = "https://li.quest/v1/token"
+METADATA_SNAPSHOT_PATH = "data/metadata_snapshot.json"
+METADATA_TTL = 300
+
+# USD price feed (quotes_prices, seconds)
+PRICE_REFRESH_INTERVAL = 60
+PRICE_MAX_STALENESS = 600
+PRICE_LOG_PATH = "data/prices"
+
+# Gas prices (quotes_gas): one eth_gasPrice call per chain, reused for GAS_PRICE_TTL seconds
+# (about a block) when serving, and for the whole snapshot in sweeps
+RPC_URLS = {
+    1: "https://ethereum-rpc.publicnode.com",
+    10: "https://mainnet.optimism.io",
+    8453: "https://mainnet.base.org",
+    42161: "https://arb1.arbitrum.io/rpc"
+}
+GAS_PRICE_TTL = 12
+# Address LiFi (and so the price feed) lists each chain's native token under; 18 decimals on every chain we cover
+NATIVE_TOKEN_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Pooled HTTP clients (connections kept alive per provider host)
+HTTP_POOL_MAXSIZE = 32
+
+# Sweep matrix (README specs)
+SWEEP_PAIRS = {
+    'Mainnet': [
+        ('USDC', 'USDT'), ('USDC', 'DAI'), ('WETH', 'WBTC'), ('WETH', 'USDC'),
+        ('WETH', 'USDT'), ('WETH', 'WSTETH'), ('WETH', 'MKR'), ('WETH', 'PEPE')
+    ],
+    'Arbitrum': [
+        ('USDC', 'USDT'), ('WETH', 'USDC'), ('WETH', 'USDT'), ('WETH', 'ARB')
+    ]
+}
+
+# Amount ladder (in sell-token units) per sell-token category
+AMOUNT_LADDERS = {
+    'stable_coin': [100, 1000, 10000, 100000, 1000000],
+    'WETH': [0.01, 0.1, 1, 10, 100, 1000, 10000],
+    'WBTC': [0.01, 0.1, 1, 10, 100, 1000]
+}
+TOKEN_CATEGORY = {
+    'USDC': 'stable_coin',
+    'USDT': 'stable_coin',
+    'DAI': 'stable_coin',
+    'WETH': 'WETH',
+    'WBTC': 'WBTC'
+}
+
+# Adaptive ladder (quotes_ladder): quote every ADAPTIVE_STRIDE-th size first, prune sizes
+# past ADAPTIVE_MAX_IMPACT_BPS and only fill in sizes whose impact is uncertain by more than ADAPTIVE_TOLERANCE_BPS
+ADAPTIVE_STRIDE = 2
+ADAPTIVE_MAX_IMPACT_BPS = 300
+ADAPTIVE_TOLERANCE_BPS = 10
+
+# Synchronized snapshots (quotes_sweep.run_synchronized_sweep): units whose providers' quotes are
+# further apart than this (seconds) are flagged as skewed
+SNAPSHOT_MAX_SKEW = 1.0
+
+# Sweep concurrency (in-flight requests)
+SWEEP_CONCURRENCY = 16
+SWEEP_PROVIDER_CONCURRENCY = {
+    'odos': 4,
+    'zero_x': 4,
+    'lifi': 4,
+    '1inch': 4
+}
+
+# Provider name for each upstream host (rate limits, metrics, ... are keyed by it)
+PROVIDER_HOSTS = {
+    'api.odos.xyz': 'odos',
+    'api.0x.org': 'zero_x',
+    'li.quest': 'lifi',
+    'api.1inch.dev': '1inch',
+    'api.relay.link': 'relay',
+    'api.socket.tech': 'bungee',
+    'www.okx.com': 'okx',
+    'ethereum-rpc.publicnode.com': 'rpc',
+    'mainnet.optimism.io': 'rpc',
+    'mainnet.base.org': 'rpc',
+    'arb1.arbitrum.io': 'rpc'
+}
+
+# Base URL per provider key replacing the scheme and host of its calls (paths are kept), e.g.
+# to run against the stand-in servers of benchmarks/stub_server.py. QUOTES_UPSTREAM=<url> sends
+# every provider to <url>/<provider>
+UPSTREAM_URLS = {}
+if os.environ.get("QUOTES_UPSTREAM"):
+    UPSTREAM_URLS.update({
+        provider: f"{os.environ['QUOTES_UPSTREAM'].rstrip('/')}/{provider}"
+        for provider in set(PROVIDER_HOSTS.values())
+    })
+
+# Rate limits per provider: (requests per second, burst)
+RATE_LIMITS = {
+    'odos': (10, 10),
+    'zero_x': (10, 10),
+    'lifi': (5, 10),
+    '1inch': (1, 1),
+    'relay': (5, 5),
+    'bungee': (5, 5),
+    'okx': (3, 3),
+    'rpc': (5, 5)
+}
+
+# Circuit breakers, per provider key above (seconds)
+BREAKER_WINDOW = 60
+BREAKER_MIN_CALLS = 5
+BREAKER_ERROR_RATE = 0.5
+BREAKER_SLOW_CALL = 4  # slower calls count as failures
+BREAKER_SLOW_CALLS = {
+    'relay': 7,
+    'bungee': 7,
+    'okx': 7
+}
+BREAKER_COOLDOWN = 30
+BREAKER_PROBES = 1
+
+# Retries on 429/5xx (seconds)
+RETRY_ATTEMPTS = 2
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 10
+# Longest a call with a deadline (/get_quote fan-outs) waits on its provider's rate limit or
+# backoff; longer waits fail fast instead of holding a fan-out worker. Sweeps have no deadline
+DEADLINE_MAX_WAIT = 1.0
+
+# /get_quote cache
+QUOTE_CACHE_TTL = 10
+QUOTE_CACHE_SIZE = 1024
+QUOTE_AMOUNT_SIG_DIGITS = 3
+# Cross-process cache of the ASGI mode (quote_agg_asgi): recent quotes and token metadata
+SHARED_CACHE_PATH = "data/shared_cache.sqlite"
+# Longest a shared cache read or write waits on another worker's lock (seconds); past it, a read is a miss and a write is dropped
+SHARED_CACHE_BUSY_TIMEOUT = 0.1
+
+# Columnar quote store (Parquet, partitioned by date and chainId)
+STORE_PATH = "data/quotes"
+STORE_ROW_GROUP_SIZE = 500
+ROLLUP_PATH = "data/rollups"
+
+# Raw provider answers (quotes_archive): zstd frames appended per date, with an offset index
+ARCHIVE_PATH = "data/archive"
+ARCHIVE_LEVEL = 3
+
+# /history (seconds)
+HISTORY_DATASET_TTL = 60
+HISTORY_PAGE_SIZE = 1000
+HISTORY_MAX_PAGE_SIZE = 10000
+HISTORY_MAX_POINTS = 500  # per series before a long range is downsampled
+
+# Hourly scheduler
+SCHEDULER_WINDOW = 1800
+SCHEDULER_CHECKPOINT_PATH = "data/checkpoints"
+SCHEDULER_BACKFILL_HOURS = 24
+
+# Sampled request profiling (quotes_timing): a fraction of requests, plus any request sent with PROFILE_HEADER
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_HEADER = "X-Profile"
+PROFILE_PATH = "data/profiles"
+
+# Metrics (latency histogram buckets, seconds)
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13]
+METRICS_PATH = "data/metrics.prom"
@@ -0,0 +1,110 @@
+# quotes_gas.py
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional, Tuple
+
+import quotes_http
+from quotes_cache import QuoteCache
+from quotes_config import RPC_URLS, GAS_PRICE_TTL, NATIVE_TOKEN_ADDRESS
+from quotes_prices import PriceSnapshot
+
+NATIVE_DECIMALS = 18
+
+
+@dataclass(frozen=True)
+class GasPrice:
+    """Gas price of one chain at one point in time"""
+    chain_id: int
+    wei: int
+    fetched_at: float
+
+    @property
+    def gwei(self) -> float:
+        return self.wei / 1e9
+
+    def cost(self, gas_units: int) -> float:
+        """Cost of `gas_units` in the native token"""
+        return gas_units * self.wei / (10 ** NATIVE_DECIMALS)
+
+
+class GasPrices:
+    """Gas price per chain, fetched with one eth_gasPrice call and shared by every quote that needs it.
+
+    Without a snapshot, a chain's price is reused for `ttl` seconds (concurrent
+    misses share one call). Sweeps pass their snapshot timestamp instead: the
+    first quote of a chain in a snapshot gets the price and every other quote of
+    that snapshot reuses it, however long the snapshot takes.
+    """
+
+    def __init__(self, ttl: float = GAS_PRICE_TTL, rpc_urls: Dict[int, str] = RPC_URLS):
+        self.rpc_urls = rpc_urls
+        self._recent = QuoteCache(ttl=ttl, max_size=max(len(rpc_urls), 1), name="gas_price")
+        self._snapshots: Dict[int, Tuple[Hashable, GasPrice]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, chain_id: int, snapshot: Optional[Hashable] = None) -> Optional[GasPrice]:
+        """Gas price of the chain (None when it has no RPC endpoint or the call failed)"""
+        if snapshot is None:
+            return self._recent.get_or_compute(chain_id, lambda: self.fetch(chain_id), cacheable=lambda price: price is not None)
+
+        pinned = self._snapshots.get(chain_id)
+        if pinned is not None and pinned[0] == snapshot:
+            return pinned[1]
+        price = self.get(chain_id)
+        if price is None:
+            return None
+        with self._lock:
+            pinned = self._snapshots.get(chain_id)
+            # Another quote of the snapshot may have pinned it first; everyone uses that one
+            if pinned is None or pinned[0] != snapshot:
+                pinned = self._snapshots[chain_id] = (snapshot, price)
+        return pinned[1]
+
+    def fetch(self, chain_id: int) -> Optional[GasPrice]:
+        url = self.rpc_urls.get(chain_id)
+        if url is None:
+            return None
+        try:
+            response = quotes_http.post(url, json={"jsonrpc": "2.0", "id": 1, "method": "eth_gasPrice", "params": []})
+            response.raise_for_status()
+            return GasPrice(chain_id, int(response.json()["result"], 16), time.time())
+        except Exception as e:
+            print(f"Gas price error on chain {chain_id}: {str(e)}")
+            return None
+
+
+def gas_units(value) -> Optional[int]:
+    """Gas units of a provider answer: a number or numeric string, or LiFi's list of gasCosts"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, list):
+        # A plain loop: this runs on every extracted quote
+        total = None
+        for cost in value:
+            total = (total or 0) + int(cost["estimate"])
+        return total
+    try:
+        return int(value)
+    except ValueError:
+        # "1.5e5", "150000.0"
+        return int(float(value))
+
+
+def gas_cost(units: Optional[int], gas_price: Optional[GasPrice], prices: Optional[PriceSnapshot] = None) -> Dict:
+    """gasUnits, gasPriceGwei, gasCostNative and gasCostUSD (native token priced with `prices`) of a quote, None where unknown"""
+    costs = {"gasUnits": units, "gasPriceGwei": None, "gasCostNative": None, "gasCostUSD": None}
+    if gas_price is None:
+        return costs
+    costs["gasPriceGwei"] = gas_price.gwei
+    if units is None:
+        return costs
+    costs["gasCostNative"] = gas_price.cost(units)
+    native_price = prices.price(NATIVE_TOKEN_ADDRESS) if prices is not None else None
+    if native_price is not None:
+        costs["gasCostUSD"] = costs["gasCostNative"] * native_price
+    return costs
+
+
+gas_prices = GasPrices()
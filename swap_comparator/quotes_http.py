@@ -0,0 +1,174 @@
+# quotes_http.py
+
+import inspect
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from quotes_config import PROVIDER_TIMEOUT, HTTP_POOL_MAXSIZE, PROVIDER_HOSTS, RETRY_ATTEMPTS, UPSTREAM_URLS
+from quotes_ratelimit import rate_limiter, parse_retry_after, DeadlineExceeded, RETRYABLE_STATUS
+from quotes_breaker import breakers, CircuitOpen
+from quotes_metrics import upstream_responses, upstream_timeouts, upstream_errors
+from quotes_timing import span
+
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def provider_for(url: str) -> str:
+    host = urlsplit(url).netloc
+    return PROVIDER_HOSTS.get(host, host)
+
+
+def upstream_url(url: str) -> str:
+    """The URL actually called: the provider's UPSTREAM_URLS base, if any, in place of the scheme and host"""
+    base = UPSTREAM_URLS.get(provider_for(url))
+    if base is None:
+        return url
+    parts = urlsplit(url)
+    return base.rstrip("/") + parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the keep-alive session shared by every call to this URL's host"""
+    host = urlsplit(url).netloc
+    session = _sessions.get(host)
+    if session is None:
+        with _lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                # Retries are handled by the callers; the adapter only pools connections
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=True, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sessions[host] = session
+    return session
+
+
+def answered(response, validate: Optional[Callable] = None) -> bool:
+    """Whether a response counts as a success for the provider's circuit breaker"""
+    if response.status_code >= 500:
+        return False
+    return validate is None or response.status_code >= 300 or validate(response)
+
+
+def remaining(timeout: float, deadline: Optional[float]) -> float:
+    """A call's timeout, cut to what is left before `deadline` (time.monotonic())"""
+    if deadline is None:
+        return timeout
+    return max(min(timeout, deadline - time.monotonic()), 0.001)
+
+
+def request(method: str, url: str, validate: Optional[Callable[[requests.Response], bool]] = None,
+            deadline: Optional[float] = None, **kwargs) -> requests.Response:
+    """Same as requests.request, but over the pooled session and with a default timeout.
+
+    Calls wait for the provider's rate limit, and 429/5xx answers are retried
+    with backoff (honouring Retry-After). The last response is returned as is
+    once retries run out. Raises CircuitOpen without calling when the
+    provider's circuit breaker is open; 5xx answers, failed calls and slow
+    calls count against it, as do 2xx answers `validate` rejects (providers
+    reporting errors in a 200 body). Each call is recorded once.
+
+    With a `deadline` (time.monotonic()), waits are bounded by it and by
+    DEADLINE_MAX_WAIT: a longer rate-limit wait raises DeadlineExceeded
+    without calling, a longer backoff drops the retry (the last answer
+    stands), and each call's timeout is cut to the time left.
+    """
+    timeout = kwargs.pop("timeout", PROVIDER_TIMEOUT)
+    provider = provider_for(url)
+    if not breakers.allow(provider):
+        raise CircuitOpen(provider)
+    url = upstream_url(url)
+    session = get_session(url)
+
+    response = None
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        try:
+            rate_limiter.acquire(provider, deadline)
+        except DeadlineExceeded:
+            if response is None:
+                # Never called: free the breaker slot allow() handed out
+                breakers.release(provider)
+                raise
+            breakers.record(provider, answered(response, validate), latency)
+            return response
+        # Time the call itself: waiting on our own rate limit is not the provider being slow
+        start = time.monotonic()
+        try:
+            response = session.request(method, url, timeout=remaining(timeout, deadline), **kwargs)
+        except requests.exceptions.Timeout:
+            upstream_timeouts.inc(provider=provider)
+            breakers.record(provider, False, time.monotonic() - start)
+            raise
+        except requests.exceptions.RequestException:
+            upstream_errors.inc(provider=provider)
+            breakers.record(provider, False, time.monotonic() - start)
+            raise
+        latency = time.monotonic() - start
+        upstream_responses.inc(provider=provider, status=response.status_code)
+        if response.status_code == 429:
+            rate_limiter.count(provider, "rate_limited")
+        delay = None
+        if response.status_code in RETRYABLE_STATUS and attempt < RETRY_ATTEMPTS:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            delay = rate_limiter.backoff(provider, attempt, retry_after, deadline)
+        if delay is None:
+            breakers.record(provider, answered(response, validate), latency)
+            return response
+        time.sleep(delay)
+    return response
+
+
+class Call:
+    """An HTTP request yielded by a provider function.
+
+    Provider functions (quote_agg_flask) are generators: they yield the
+    request they need, get the response sent back, and return their quote.
+    run() makes the calls with request(); quotes_http_async.run_async() makes
+    them on an event loop, so both serving modes share the provider code.
+    """
+
+    def __init__(self, method: str, url: str, **kwargs):
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+
+
+def run(result, deadline: Optional[float] = None):
+    """Drive a provider generator to completion with blocking calls (plain values are returned as is).
+
+    Every call is made with the `deadline` of the whole provider answer (see request()).
+    """
+    if not inspect.isgenerator(result):
+        return result
+    try:
+        call = next(result)
+        while True:
+            # Upstream time and our own decoding/parsing, as spans of the current request
+            provider = provider_for(call.url)
+            with span(f"{provider}-http"):
+                response = request(call.method, call.url, deadline=deadline, **call.kwargs)
+            with span(f"{provider}-parse"):
+                call = result.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def close_sessions() -> None:
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
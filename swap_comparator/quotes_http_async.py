@@ -0,0 +1,129 @@
+# quotes_http_async.py
+
+import asyncio
+import inspect
+import json
+from typing import Callable, Dict, Optional
+
+import aiohttp
+import requests
+
+from quotes_config import PROVIDER_TIMEOUT, HTTP_POOL_MAXSIZE, RETRY_ATTEMPTS
+from quotes_http import answered, provider_for, remaining, upstream_url
+from quotes_ratelimit import rate_limiter, parse_retry_after, DeadlineExceeded, RETRYABLE_STATUS
+from quotes_breaker import breakers, CircuitOpen
+from quotes_metrics import upstream_responses, upstream_timeouts, upstream_errors
+from quotes_timing import span
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+class Response:
+    """The parts of a requests.Response the provider functions use"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str], content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Keep-alive session of the running event loop, pooling up to HTTP_POOL_MAXSIZE connections per host"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=HTTP_POOL_MAXSIZE, keepalive_timeout=60)
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+
+async def close_session() -> None:
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+def _request_kwargs(kwargs: Dict) -> Dict:
+    """requests-style arguments to aiohttp ones (but the timeout, set per attempt)"""
+    kwargs = dict(kwargs)
+    if kwargs.get("params") is not None:
+        # aiohttp only takes str/int/float query values; requests stringifies everything
+        kwargs["params"] = {key: str(value) for key, value in kwargs["params"].items() if value is not None}
+    return kwargs
+
+
+async def request(method: str, url: str, validate: Optional[Callable[[Response], bool]] = None,
+                  deadline: Optional[float] = None, **kwargs) -> Response:
+    """quotes_http.request() on the event loop: same rate limits, retries, circuit breakers, deadline and metrics.
+
+    Failures are raised as the matching requests exceptions so callers
+    classify them the same way in both serving modes.
+    """
+    timeout = kwargs.pop("timeout", PROVIDER_TIMEOUT)
+    provider = provider_for(url)
+    if not breakers.allow(provider):
+        raise CircuitOpen(provider)
+    url = upstream_url(url)
+    session = get_session()
+    kwargs = _request_kwargs(kwargs)
+    loop = asyncio.get_running_loop()
+
+    response = None
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        try:
+            await rate_limiter.acquire_async(provider, deadline)
+        except DeadlineExceeded:
+            if response is None:
+                breakers.release(provider)
+                raise
+            breakers.record(provider, answered(response, validate), latency)
+            return response
+        start = loop.time()
+        try:
+            client_timeout = aiohttp.ClientTimeout(total=remaining(timeout, deadline))
+            async with session.request(method, url, timeout=client_timeout, **kwargs) as raw:
+                response = Response(raw.status, dict(raw.headers), await raw.read())
+        except asyncio.TimeoutError as e:
+            upstream_timeouts.inc(provider=provider)
+            breakers.record(provider, False, loop.time() - start)
+            raise requests.exceptions.Timeout(f"{provider} timed out") from e
+        except aiohttp.ClientError as e:
+            upstream_errors.inc(provider=provider)
+            breakers.record(provider, False, loop.time() - start)
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        latency = loop.time() - start
+        upstream_responses.inc(provider=provider, status=response.status_code)
+        if response.status_code == 429:
+            rate_limiter.count(provider, "rate_limited")
+        delay = None
+        if response.status_code in RETRYABLE_STATUS and attempt < RETRY_ATTEMPTS:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            delay = rate_limiter.backoff(provider, attempt, retry_after, deadline)
+        if delay is None:
+            breakers.record(provider, answered(response, validate), latency)
+            return response
+        await asyncio.sleep(delay)
+    return response
+
+
+async def run_async(result, deadline: Optional[float] = None):
+    """quotes_http.run() on the event loop: make each Call a provider generator yields with request()"""
+    if not inspect.isgenerator(result):
+        return result
+    try:
+        call = next(result)
+        while True:
+            provider = provider_for(call.url)
+            with span(f"{provider}-http"):
+                response = await request(call.method, call.url, deadline=deadline, **call.kwargs)
+            with span(f"{provider}-parse"):
+                call = result.send(response)
+    except StopIteration as stop:
+        return stop.value
@@ -0,0 +1,172 @@
+# quotes_ladder.py
+
+import math
+import time
+from typing import Callable, Dict, List, Optional
+
+from quotes_config import ADAPTIVE_STRIDE, ADAPTIVE_MAX_IMPACT_BPS, ADAPTIVE_TOLERANCE_BPS
+from quotes_sweep import WorkUnit, empty_row, run_sweep
+
+
+def isotonic(values: List[float]) -> List[float]:
+    """Least-squares non-decreasing fit (pool adjacent violators)"""
+    blocks: List[List[float]] = []  # [mean, size]
+    for value in values:
+        blocks.append([value, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            mean, size = blocks.pop()
+            blocks[-1][0] = (blocks[-1][0] * blocks[-1][1] + mean * size) / (blocks[-1][1] + size)
+            blocks[-1][1] += size
+    return [mean for mean, size in blocks for _ in range(int(size))]
+
+
+class Ladder:
+    """Adaptive sampling state of one provider's amount ladder for one (chain, pair).
+
+    Price impact is measured against the unit price of the smallest quoted
+    size. The coarse rungs (every `stride`-th size) are quoted smallest first;
+    a size the provider has no route for, or with more than `max_impact` bps
+    of impact, prunes every larger size (a skipped or failed call prunes
+    nothing). Then, since impact is fitted as non-decreasing in size, each
+    unquoted size is bracketed by its quoted neighbours: the middle size of a
+    gap is only quoted when that bracket is wider than 2 x `tolerance` bps, and
+    the boundary of a pruned tail is bisected. Whatever is left unquoted is
+    interpolated (in log size) with its error bound, or marked pruned.
+    """
+
+    def __init__(self, units: List[WorkUnit], stride: int = ADAPTIVE_STRIDE,
+                 max_impact: float = ADAPTIVE_MAX_IMPACT_BPS, tolerance: float = ADAPTIVE_TOLERANCE_BPS):
+        self.units = sorted(units, key=lambda unit: unit.amount)
+        self.max_impact = max_impact
+        self.tolerance = tolerance
+        self.rows: Dict[int, Dict] = {}
+        self.limit = len(self.units)  # sizes at or above this index are pruned
+        self._coarse = sorted(set(range(0, len(self.units), stride)) | {len(self.units) - 1})
+        self._reference: Optional[float] = None  # unit price of the smallest quoted size
+        self._reference_index: Optional[int] = None
+
+    def pending(self) -> List[WorkUnit]:
+        """Units to quote in the next round (empty once the ladder is settled)"""
+        coarse = [i for i in self._coarse if i < self.limit and i not in self.rows]
+        if coarse:
+            return [self.units[coarse[0]]]
+
+        quoted = self._quoted()
+        # Sizes below the smallest quoted one (after a failed call) can't be interpolated: quote them
+        indexes = [i for i in range(quoted[0] if quoted else 0) if i not in self.rows]
+        fitted = self._fitted(quoted)
+        for (a, fa), (b, fb) in zip(zip(quoted, fitted), zip(quoted[1:], fitted[1:])):
+            if b - a > 1 and (fb - fa) / 2 > self.tolerance:
+                indexes.append((a + b) // 2)
+        tail = quoted[-1] if quoted else -1
+        if self.limit - tail > 1 and self.limit < len(self.units) and tail >= 0:
+            indexes.append((tail + self.limit) // 2)
+        return [self.units[i] for i in indexes if i not in self.rows]
+
+    def record(self, row: Dict) -> Dict:
+        """Take the row of a quoted unit, adding its price impact"""
+        i = next(i for i, unit in enumerate(self.units) if unit.amount == row["amountIn"])
+        self.rows[i] = row
+        if row["status"] == "no_quote":
+            # No route at this size: none at larger ones either
+            self.limit = min(self.limit, i)
+        if row["status"] != "ok":
+            # Skipped and errored rows say nothing about impact: kept as they are, without pruning
+            return row
+
+        if self._reference_index is None or i < self._reference_index:
+            # A smaller size than the reference answered: measure every impact against it
+            self._reference_index = i
+            self._reference = row["amountOut"] / row["amountIn"]
+            for j in self._quoted():
+                self._add_impact(j, self.rows[j])
+        self._add_impact(i, row)
+        return row
+
+    def _add_impact(self, i: int, row: Dict) -> None:
+        if not self._reference:
+            return
+        row["priceImpactBps"] = (1 - row["amountOut"] / row["amountIn"] / self._reference) * 1e4
+        row["impactErrorBps"] = 0.0
+        if row["priceImpactBps"] > self.max_impact:
+            self.limit = min(self.limit, i + 1)
+
+    def finish(self, template: Callable[[WorkUnit], Dict]) -> List[Dict]:
+        """Rows for the sizes that were not quoted: interpolated or pruned"""
+        quoted = self._quoted()
+        fitted = dict(zip(quoted, self._fitted(quoted)))
+        rows = []
+        for i, unit in enumerate(self.units):
+            if i in self.rows:
+                continue
+            row = template(unit)
+            below = [q for q in quoted if q < i]
+            above = [q for q in quoted if q > i]
+            if i < self.limit and below and above and self._reference:
+                a, b = below[-1], above[0]
+                x = math.log(unit.amount)
+                xa, xb = math.log(self.units[a].amount), math.log(self.units[b].amount)
+                estimate = fitted[a] + (fitted[b] - fitted[a]) * (x - xa) / (xb - xa)
+                row.update({
+                    "amountOut": unit.amount * self._reference * (1 - estimate / 1e4),
+                    "status": "interpolated",
+                    "priceImpactBps": estimate,
+                    # Impact is non-decreasing, so the true value lies between the neighbours' fits
+                    "impactErrorBps": max(estimate - fitted[a], fitted[b] - estimate),
+                })
+            else:
+                row["status"] = "pruned"
+            rows.append(row)
+        return rows
+
+    def _quoted(self) -> List[int]:
+        return sorted(i for i, row in self.rows.items() if i < self.limit and row["status"] == "ok" and "priceImpactBps" in row)
+
+    def _fitted(self, quoted: List[int]) -> List[float]:
+        return isotonic([self.rows[i]["priceImpactBps"] for i in quoted])
+
+
+def build_ladders(units: List[WorkUnit], **options) -> List[Ladder]:
+    """Group work units into one ladder per (chain, pair, provider)"""
+    groups: Dict[tuple, List[WorkUnit]] = {}
+    for unit in units:
+        groups.setdefault((unit.chain_id, unit.fromToken, unit.toToken, unit.provider), []).append(unit)
+    return [Ladder(group, **options) for group in groups.values()]
+
+
+async def run_adaptive_sweep(
+    units: List[WorkUnit],
+    sink: Callable[[Dict], None],
+    timestamp: Optional[int] = None,
+    spread_over: float = 0,
+    **options
+) -> int:
+    """Adaptive version of run_sweep: quote each ladder in rounds, interpolating what is not needed.
+
+    Every round quotes the next units of all ladders concurrently through
+    run_sweep; `spread_over` is shared between the rounds. Returns the number
+    of rows produced, quoted or not.
+    """
+    timestamp = timestamp if timestamp is not None else int(time.time()) // 3600 * 3600
+    ladders = build_ladders(units, **options)
+    by_key = {
+        (unit.chain_id, unit.fromToken, unit.toToken, unit.provider): ladder
+        for ladder in ladders for unit in ladder.units
+    }
+    rounds = max((len(ladder._coarse) for ladder in ladders), default=0) + 1
+    produced = 0
+
+    def record(row: Dict) -> None:
+        sink(by_key[(row["chainId"], row["fromToken"], row["toToken"], row["platform"])].record(row))
+
+    while True:
+        batch = [unit for ladder in ladders for unit in ladder.pending()]
+        if not batch:
+            break
+        produced += await run_sweep(batch, record, timestamp=timestamp, spread_over=spread_over / rounds)
+
+    for ladder in ladders:
+        for row in ladder.finish(lambda unit: empty_row(unit, timestamp)):
+            sink(row)
+            produced += 1
+    return produced
@@ -8,19 +8,74 @@ Created on Sat Oct 26 08:44:05 2024
 
 # main.py
 
-from quote_utils import get_unified_quotes_for_routes
+import argparse
+import os
+
+import quotes_archive
+
+from quotes_config import STORE_PATH, METRICS_PATH
+from quotes_metrics import write_metrics
+from quotes_sweep import sweep, CsvSink
+from quotes_scheduler import run_forever
 
 def main():
-    # Define the amounts to query (in USD)
-    amounts = [1000, 10000, 100000, 1000000]
-    #amounts = [1000]
-    
-    # Define the networks to query
-    networks = ['Base', 'Arbitrum', 'Optimism', 'Mainnet']
+    parser = argparse.ArgumentParser(description="Quote the README matrix once")
+    parser.add_argument("--output", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--adaptive", action="store_true", help="sample the amount ladders adaptively instead of quoting every size")
+    parser.add_argument("--synchronized", action="store_true", help="quote each unit's providers as one burst and record their time skew")
+    parser.add_argument("--replay", metavar="STORE", help="only rebuild the quote store into STORE by re-extracting the raw-response archive")
+    parser.add_argument("--rollups", action="store_true", help="only update the daily/weekly rollups from the stored quotes")
+    parser.add_argument("--daemon", action="store_true", help="snapshot every hour, resuming and backfilling from checkpoints")
+    parser.add_argument("--compact", action="store_true", help="only merge the small files of the quote store's past days")
+    args = parser.parse_args()
+
+    # Define the networks to query (pairs and amount ladders come from quotes_config)
+    networks = ['Mainnet', 'Arbitrum']
     #networks = ['Arbitrum']
     
-    # Get quotes for all combinations
-    get_unified_quotes_for_routes(amounts, networks)
+    # Get quotes for the whole matrix
+    def make_sink():
+        if args.output == "parquet":
+            from quotes_store import ParquetSink
+            sink = ParquetSink(STORE_PATH)
+        else:
+            sink = CsvSink(os.path.join("data", "quotes.csv"))
+        # Keep every raw answer so the rows can be re-extracted later
+        if quotes_archive.zstandard is None:
+            print("zstandard is not installed: raw answers are not archived")
+            return sink
+        return quotes_archive.ArchiveSink(sink)
+
+    if args.replay:
+        print(f"Rows re-extracted into {args.replay}: {quotes_archive.replay(output_root=args.replay)}")
+        return
+
+    if args.rollups:
+        from quotes_rollups import update_rollups
+        print(f"Rollup buckets recomputed: {update_rollups()}")
+        return
+
+    if args.compact:
+        from quotes_store import compact
+        print(f"Partitions compacted: {compact(STORE_PATH)}")
+        return
+
+    if args.daemon:
+        # The daemon compacts the Parquet store itself
+        run_forever(make_sink, networks, adaptive=args.adaptive, synchronized=args.synchronized,
+                    compact_root=STORE_PATH if args.output == "parquet" else None)
+        return
+
+    sink = make_sink()
+    try:
+        rows = sweep(networks, sink=sink, adaptive=args.adaptive, synchronized=args.synchronized)
+    finally:
+        sink.close()
+    print(f"Wrote {rows} quotes")
+
+    # Same counters as the Flask /metrics endpoint
+    write_metrics(METRICS_PATH)
+    print(f"Metrics written to {METRICS_PATH}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,191 @@
+# quotes_metadata.py
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+
+import quotes_http
+from quotes_metrics import lookups
+from quotes_config import (
+    NETWORK_CONFIG, TOKEN_DECIMALS, CHAIN_ALIASES, LIFI_CHAINS_URL, LIFI_TOKENS_URL,
+    LIFI_TOKEN_URL, METADATA_SNAPSHOT_PATH, METADATA_TTL
+)
+
+
+@dataclass
+class TokenMeta:
+    chain_id: int
+    symbol: str
+    address: str
+    decimals: int
+    priceUSD: Optional[str] = None
+
+
+_ALIASES = {alias.lower(): name.lower() for alias, name in CHAIN_ALIASES.items()}
+
+
+class MetadataIndex:
+    """In-process chain/token index keyed by (chain, symbol) and (chain, address).
+
+    Seeded from NETWORK_CONFIG, then from the on-disk snapshot, so a cold start
+    needs no network. Once older than `ttl` it is refreshed from LiFi in a
+    background thread while lookups keep answering from the current data.
+    """
+
+    def __init__(self, snapshot_path: str = METADATA_SNAPSHOT_PATH, ttl: float = METADATA_TTL):
+        self.snapshot_path = snapshot_path
+        self.ttl = ttl
+        self.refreshed_at = 0.0
+        self._chains: Dict[str, int] = {}
+        self._by_symbol: Dict[tuple, TokenMeta] = {}
+        self._by_address: Dict[tuple, TokenMeta] = {}
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+        self._load_static()
+        self._load_snapshot()
+
+    # Lookups
+
+    def chain_id(self, name: str, default: Optional[int] = None) -> Optional[int]:
+        """Resolve a chain name (or alias, in any case and spacing) to its chain id"""
+        name = name.strip().lower()
+        name = _ALIASES.get(name, name)
+        return self._chains.get(name, default)
+
+    def token(self, chain_id: int, token: str) -> Optional[TokenMeta]:
+        """Resolve a token symbol or address on a chain, falling back to a single LiFi lookup for unknown tokens"""
+        meta = self.known(chain_id, token)
+        lookups.inc(cache="metadata", result="hit" if meta is not None else "miss")
+        # Prices come from quotes_prices; a known token without one needs no lookup
+        if meta is None:
+            fetched = self._fetch_token(chain_id, token)
+            if fetched is not None:
+                meta = fetched
+        return meta
+
+    def known(self, chain_id: int, token: str) -> Optional[TokenMeta]:
+        """The in-memory entry for a token symbol or address, without any lookup"""
+        if token.lower().startswith("0x"):
+            return self._by_address.get((chain_id, token.lower()))
+        return self._by_symbol.get((chain_id, token.upper()))
+
+    # Refresh
+
+    def is_stale(self) -> bool:
+        return time.time() - self.refreshed_at > self.ttl
+
+    def maybe_refresh(self) -> None:
+        """Start a background refresh if the index is stale and none is running"""
+        with self._lock:
+            if self._refreshing or not self.is_stale():
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Metadata refresh error: {str(e)}")
+        finally:
+            self._refreshing = False
+
+    def refresh(self) -> None:
+        """Reload chains and tracked-chain tokens from LiFi and save a snapshot"""
+        headers = {"accept": "application/json"}
+        response = quotes_http.get(LIFI_CHAINS_URL, headers=headers, params={"chainTypes": "EVM"})
+        response.raise_for_status()
+        chains = {item["name"].lower(): item["id"] for item in response.json()["chains"]}
+
+        chain_ids = sorted({network["chain_id"] for network in NETWORK_CONFIG.values()} | {key[0] for key in self._by_symbol})
+        response = quotes_http.get(LIFI_TOKENS_URL, headers=headers, params={"chains": ",".join(map(str, chain_ids))})
+        response.raise_for_status()
+        tokens = [
+            TokenMeta(int(chain_id), item["symbol"], item["address"], item["decimals"], item.get("priceUSD"))
+            for chain_id, items in response.json()["tokens"].items()
+            for item in items
+        ]
+
+        with self._lock:
+            self._chains.update(chains)
+            for meta in tokens:
+                self._add(meta)
+            self.refreshed_at = time.time()
+        self.save_snapshot()
+
+    def _fetch_token(self, chain_id: int, token: str) -> Optional[TokenMeta]:
+        try:
+            response = quotes_http.get(
+                LIFI_TOKEN_URL,
+                headers={"accept": "application/json"},
+                params={"chain": chain_id, "token": token}
+            )
+            if response.status_code != 200:
+                return None
+            item = response.json()
+        except Exception as e:
+            print(f"Metadata lookup error: {str(e)}")
+            return None
+
+        meta = TokenMeta(chain_id, item["symbol"], item["address"], item["decimals"], item.get("priceUSD"))
+        with self._lock:
+            self._add(meta)
+            # Keep the symbol the caller asked for pointing at this token (e.g. ETH -> WETH lookups)
+            if not token.lower().startswith("0x"):
+                self._by_symbol[(chain_id, token.upper())] = self._by_address[(chain_id, meta.address.lower())]
+        return meta
+
+    def _add(self, meta: TokenMeta) -> None:
+        key = (meta.chain_id, meta.address.lower())
+        known = self._by_address.get(key)
+        if known is not None:
+            # Same token: keep our symbol/decimals, take the fresher price
+            known.priceUSD = meta.priceUSD or known.priceUSD
+            return
+        self._by_address[key] = meta
+        # Static entries own their symbol; LiFi lists several tokens under popular symbols
+        self._by_symbol.setdefault((meta.chain_id, meta.symbol.upper()), meta)
+
+    # Persistence
+
+    def _load_static(self) -> None:
+        for network, config in NETWORK_CONFIG.items():
+            chain_id = config["chain_id"]
+            self._chains[network.lower()] = chain_id
+            for symbol, address in config.items():
+                if symbol in TOKEN_DECIMALS:
+                    self._add(TokenMeta(chain_id, symbol, address, TOKEN_DECIMALS[symbol]))
+
+    def _load_snapshot(self) -> None:
+        if not os.path.isfile(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Metadata snapshot error: {str(e)}")
+            return
+
+        self._chains.update(snapshot["chains"])
+        for item in snapshot["tokens"]:
+            self._add(TokenMeta(**item))
+        self.refreshed_at = snapshot["refreshed_at"]
+
+    def save_snapshot(self) -> None:
+        with self._lock:
+            snapshot = {
+                "refreshed_at": self.refreshed_at,
+                "chains": dict(self._chains),
+                "tokens": [asdict(meta) for meta in self._by_address.values()]
+            }
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.snapshot_path)
@@ -0,0 +1,144 @@
+# quotes_metrics.py
+
+import bisect
+import os
+import threading
+from typing import Callable, Dict, List, Tuple
+
+from quotes_config import LATENCY_BUCKETS, METRICS_PATH
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_labels(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(labels)} {value:g}")
+        return lines
+
+
+class Gauge:
+    """Value computed when rendered (e.g. a cache hit rate)"""
+
+    def __init__(self, name: str, help: str, read: Callable[[], Dict[Labels, float]]):
+        self.name = name
+        self.help = help
+        self._read = read
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self._read().items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: List[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = sorted(buckets)
+        self._series: Dict[Labels, List[float]] = {}  # bucket counts..., +Inf count, sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {cumulative}")
+                cumulative += series[len(self.buckets)]
+                lines.append(f"{self.name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-1]:g}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+provider_latency = registry.register(Histogram("quotes_provider_latency_seconds", "Provider quote latency by provider and chain"))
+upstream_responses = registry.register(Counter("quotes_upstream_responses_total", "Upstream HTTP responses by provider and status code"))
+upstream_timeouts = registry.register(Counter("quotes_upstream_timeouts_total", "Upstream HTTP calls that timed out, by provider"))
+upstream_errors = registry.register(Counter("quotes_upstream_errors_total", "Upstream HTTP calls that failed without a response, by provider"))
+rate_limit_events = registry.register(Counter("quotes_rate_limit_events_total", "Throttled, retried and rate-limited calls by provider"))
+provider_outcomes = registry.register(Counter("quotes_provider_outcomes_total", "Provider quotes by provider, chain and outcome (ok/no_quote/error/timed_out/skipped/rate_limited)"))
+parse_failures = registry.register(Counter("quotes_parse_failures_total", "Provider responses that could not be parsed, by provider"))
+circuit_transitions = registry.register(Counter("quotes_circuit_transitions_total", "Circuit breaker state changes by provider and new state"))
+lookups = registry.register(Counter("quotes_lookups_total", "Cache and metadata lookups by cache and result (hit/miss/...)"))
+
+
+def _hit_rates() -> Dict[Labels, float]:
+    totals: Dict[str, float] = {}
+    hits: Dict[str, float] = {}
+    for labels, value in list(lookups._values.items()):
+        labels = dict(labels)
+        cache = labels["cache"]
+        totals[cache] = totals.get(cache, 0) + value
+        if labels["result"] in ("hit", "coalesced"):
+            hits[cache] = hits.get(cache, 0) + value
+    return {_labels({"cache": cache}): hits.get(cache, 0) / total for cache, total in totals.items() if total}
+
+
+registry.register(Gauge("quotes_lookup_hit_ratio", "Share of lookups answered without an upstream call, by cache", _hit_rates))
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+def write_metrics(path: str = METRICS_PATH) -> None:
+    """Dump the metrics to a file in the /metrics format (CLI runs, for the textfile collector)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        f.write(render_metrics())
@@ -0,0 +1,165 @@
+# quotes_prices.py
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Set
+
+import quotes_http
+from quotes_metrics import lookups
+from quotes_config import (
+    NETWORK_CONFIG, LIFI_TOKENS_URL, PRICE_REFRESH_INTERVAL, PRICE_MAX_STALENESS, PRICE_LOG_PATH, NATIVE_TOKEN_ADDRESS
+)
+
+
+class StalePrices(ValueError):
+    """No prices for the chain younger than the max staleness"""
+
+
+@dataclass
+class PriceSnapshot:
+    """USD prices of one chain's tokens (lowercase address -> price) from one bulk refresh"""
+    chain_id: int
+    version: int  # unix time of the refresh; identifies the prices a quote was computed with
+    fetched_at: float
+    prices: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def price(self, address: str) -> Optional[float]:
+        return self.prices.get(address.lower())
+
+    def __hash__(self) -> int:
+        # A version identifies the prices, so snapshots can be part of provider call keys (batch dedupe)
+        return hash((self.chain_id, self.version))
+
+
+class PriceFeed:
+    """In-memory USD prices, refreshed with one bulk LiFi call per chain.
+
+    Lookups never do I/O while the chain's prices are younger than
+    `refresh_interval`. Between `refresh_interval` and `max_staleness` they are
+    served as is while a background refresh runs; past `max_staleness` the
+    caller waits for a refresh, and StalePrices is raised if it fails.
+    Tracked tokens' prices are appended to `<log_path>/<chainId>.jsonl` at
+    every refresh, so quotes can be recomputed from their version later.
+    """
+
+    def __init__(self, refresh_interval: float = PRICE_REFRESH_INTERVAL, max_staleness: float = PRICE_MAX_STALENESS,
+                 log_path: Optional[str] = PRICE_LOG_PATH):
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.log_path = log_path
+        self._snapshots: Dict[int, PriceSnapshot] = {}
+        self._tracked: Dict[int, Set[str]] = {}
+        self._refreshing: Dict[int, threading.Event] = {}
+        self._failed_at: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        for network in NETWORK_CONFIG.values():
+            self.track(network["chain_id"], (value for key, value in network.items() if key != "chain_id"))
+            # Gas costs are priced in the native token
+            self.track(network["chain_id"], [NATIVE_TOKEN_ADDRESS])
+
+    def track(self, chain_id: int, addresses: Iterable[str]) -> None:
+        """Keep these tokens' prices in the price log"""
+        with self._lock:
+            self._tracked.setdefault(chain_id, set()).update(address.lower() for address in addresses)
+
+    def snapshot(self, chain_id: int) -> PriceSnapshot:
+        """Current prices of a chain, refreshing them according to the staleness policy"""
+        snapshot = self._snapshots.get(chain_id)
+        if snapshot is not None and snapshot.age < self.refresh_interval:
+            lookups.inc(cache="prices", result="hit")
+            return snapshot
+        # After a failed refresh, wait a refresh interval before the next attempt
+        retry = time.time() - self._failed_at.get(chain_id, 0) >= self.refresh_interval
+        if snapshot is not None and snapshot.age < self.max_staleness:
+            lookups.inc(cache="prices", result="stale")
+            if retry:
+                self._start_refresh(chain_id, wait=False)
+            return snapshot
+
+        lookups.inc(cache="prices", result="miss")
+        if retry:
+            self._start_refresh(chain_id, wait=True)
+        snapshot = self._snapshots.get(chain_id)
+        if snapshot is None or snapshot.age >= self.max_staleness:
+            raise StalePrices(f"No USD prices for chain {chain_id} younger than {self.max_staleness}s")
+        return snapshot
+
+    def price(self, chain_id: int, address: str) -> Optional[float]:
+        return self.snapshot(chain_id).price(address)
+
+    def _start_refresh(self, chain_id: int, wait: bool) -> None:
+        """Single-flight refresh of one chain; `wait` blocks until it is over"""
+        with self._lock:
+            done = self._refreshing.get(chain_id)
+            leader = done is None
+            if leader:
+                done = self._refreshing[chain_id] = threading.Event()
+        if leader:
+            if wait:
+                self._refresh(chain_id, done)
+            else:
+                threading.Thread(target=self._refresh, args=(chain_id, done), daemon=True).start()
+        elif wait:
+            done.wait()
+
+    def _refresh(self, chain_id: int, done: threading.Event) -> None:
+        try:
+            self.refresh(chain_id)
+        except Exception as e:
+            self._failed_at[chain_id] = time.time()
+            print(f"Price refresh error on chain {chain_id}: {str(e)}")
+        finally:
+            with self._lock:
+                del self._refreshing[chain_id]
+            done.set()
+
+    def refresh(self, chain_id: int) -> PriceSnapshot:
+        """Reload every token price of a chain in one call"""
+        response = quotes_http.get(LIFI_TOKENS_URL, headers={"accept": "application/json"}, params={"chains": chain_id})
+        response.raise_for_status()
+        fetched_at = time.time()
+        prices = {
+            item["address"].lower(): float(item["priceUSD"])
+            for item in response.json()["tokens"].get(str(chain_id), [])
+            if item.get("priceUSD")
+        }
+        snapshot = PriceSnapshot(chain_id, int(fetched_at), fetched_at, prices)
+        self._snapshots[chain_id] = snapshot
+        self._log(snapshot)
+        return snapshot
+
+    def _log(self, snapshot: PriceSnapshot) -> None:
+        if not self.log_path:
+            return
+        tracked = self._tracked.get(snapshot.chain_id, set())
+        entry = {
+            "version": snapshot.version,
+            "fetchedAt": snapshot.fetched_at,
+            "prices": {address: price for address, price in snapshot.prices.items() if address in tracked},
+        }
+        os.makedirs(self.log_path, exist_ok=True)
+        with open(os.path.join(self.log_path, f"{snapshot.chain_id}.jsonl"), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+def load_prices(chain_id: int, version: int, log_path: str = PRICE_LOG_PATH) -> Optional[PriceSnapshot]:
+    """Prices of a past version from the price log (to recompute stored quotes)"""
+    path = os.path.join(log_path, f"{chain_id}.jsonl")
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["version"] == version:
+                return PriceSnapshot(chain_id, version, entry["fetchedAt"], entry["prices"])
+    return None
+
+
+price_feed = PriceFeed()
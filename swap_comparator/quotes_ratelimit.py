@@ -0,0 +1,149 @@
+# quotes_ratelimit.py
+
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+
+from quotes_config import RATE_LIMITS, RETRY_ATTEMPTS, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX, DEADLINE_MAX_WAIT
+from quotes_metrics import rate_limit_events
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """A call can't start in time: its rate-limit wait would run past the caller's deadline (or DEADLINE_MAX_WAIT)"""
+
+    def __init__(self, provider: str):
+        super().__init__(f"{provider} rate limit wait exceeds the deadline")
+        self.provider = provider
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the time waited"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def reserve(self) -> float:
+        """Take one token without sleeping; returns how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # A negative balance is this caller's place in the queue
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def release(self) -> None:
+        """Give back a token reserved for a call that won't be made"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def penalize(self, delay: float) -> None:
+        """Push every caller back by `delay` seconds (e.g. after a Retry-After)"""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0) - delay * self.rate
+
+
+class RateLimiter:
+    """Per-provider token buckets plus throttle/retry counters"""
+
+    def __init__(self, limits: Dict[str, tuple] = RATE_LIMITS):
+        self.limits = limits
+        self.counters: Counter = Counter()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, provider: str) -> Optional[TokenBucket]:
+        if provider not in self.limits:
+            return None
+        with self._lock:
+            if provider not in self._buckets:
+                self._buckets[provider] = TokenBucket(*self.limits[provider])
+            return self._buckets[provider]
+
+    def _reserve(self, provider: str, deadline: Optional[float]) -> float:
+        """Reserve a token and return the wait before using it; DeadlineExceeded (token given back) if that is past `deadline`"""
+        bucket = self.bucket(provider)
+        wait = bucket.reserve() if bucket is not None else 0.0
+        if wait > 0 and too_late(wait, deadline):
+            bucket.release()
+            self.count(provider, "deadline_exceeded")
+            raise DeadlineExceeded(provider)
+        if wait > 0:
+            self.count(provider, "throttled")
+        return wait
+
+    def acquire(self, provider: str, deadline: Optional[float] = None) -> None:
+        """Wait for the provider's rate limit; with a `deadline` (time.monotonic()), fail fast instead of waiting too long (see too_late)"""
+        wait = self._reserve(provider, deadline)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, provider: str, deadline: Optional[float] = None) -> None:
+        """acquire() for event-loop callers: waits with asyncio.sleep"""
+        wait = self._reserve(provider, deadline)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def count(self, provider: str, event: str) -> None:
+        with self._lock:
+            self.counters[(provider, event)] += 1
+        rate_limit_events.inc(provider=provider, event=event)
+
+    def backoff(self, provider: str, attempt: int, retry_after: Optional[float], deadline: Optional[float] = None) -> Optional[float]:
+        """Delay before retry number `attempt`: Retry-After if given, else jittered exponential backoff.
+
+        None when the retry would wait too long for its `deadline` (see too_late): don't retry.
+        """
+        if retry_after is not None:
+            delay = min(retry_after, RETRY_BACKOFF_MAX)
+            bucket = self.bucket(provider)
+            if bucket is not None:
+                bucket.penalize(delay)
+        else:
+            delay = random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** attempt)))
+        if too_late(delay, deadline):
+            self.count(provider, "deadline_exceeded")
+            return None
+        self.count(provider, "retried")
+        return delay
+
+
+def too_late(wait: float, deadline: Optional[float]) -> bool:
+    """Whether waiting `wait` seconds leaves a call with a deadline (time.monotonic()) no time to be made"""
+    return deadline is not None and (wait > DEADLINE_MAX_WAIT or time.monotonic() + wait >= deadline)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either a number of seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,164 @@
+# quotes_rollups.py
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Set, Tuple
+
+import pandas as pd
+
+from quotes_config import STORE_PATH, ROLLUP_PATH
+from quotes_analytics import score_quotes
+
+ROLLUP_KEYS = ['platform', 'chainId', 'fromToken', 'toToken', 'amountIn']
+# pandas period of each rollup; weeks run Monday to Sunday
+FREQUENCIES = {'daily': 'D', 'weekly': 'W-SUN'}
+# Rows that were never requested from the provider don't count for availability
+NOT_REQUESTED = ('interpolated', 'pruned')
+
+
+def rollup(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Aggregate stored quote rows per platform x chain x pair x size x period.
+
+    - mean_output / median_output: amountOut of the answered quotes
+    - best_share: share of snapshots where the platform had the best output
+    - bps_gap_to_best: mean shortfall vs the best output of the snapshot, in bps
+    - availability: share of requested quotes that were answered
+    """
+    df = df[~df['status'].isin(NOT_REQUESTED)].copy()
+    df['period'] = pd.to_datetime(df['timestamp'], unit='s', utc=True).dt.tz_localize(None).dt.to_period(freq).dt.start_time
+    by = ROLLUP_KEYS + ['period']
+
+    requested = df.assign(answered=df['status'] == 'ok').groupby(by, observed=True).agg(
+        requested=('answered', 'size'),
+        availability=('answered', 'mean'),
+    )
+    scored = score_quotes(df)
+    scored['gap'] = -scored['bps_vs_best']
+    answered = scored.groupby(by, observed=True).agg(
+        quotes=('amountOut', 'size'),
+        mean_output=('amountOut', 'mean'),
+        median_output=('amountOut', 'median'),
+        best_share=('win', 'mean'),
+        bps_gap_to_best=('gap', 'mean'),
+    )
+    result = requested.join(answered, how='left').reset_index()
+    result['quotes'] = result['quotes'].fillna(0).astype(int)
+    result['period'] = result['period'].dt.strftime('%Y-%m-%d')
+    return result
+
+
+def _files(root: str) -> Dict[str, List[float]]:
+    """Stored Parquet files (relative path -> [size, mtime])"""
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith('.parquet'):
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                files[os.path.relpath(path, root)] = [stat.st_size, stat.st_mtime]
+    return files
+
+
+def _partition(relative_path: str) -> Tuple[str, int]:
+    """(date, chainId) of a stored file, from its date=/chainId= directories"""
+    parts = dict(part.split('=', 1) for part in relative_path.split(os.sep)[:-1])
+    return parts['date'], int(parts['chainId'])
+
+
+def _period_start(date: str, freq: str) -> str:
+    day = datetime.strptime(date, '%Y-%m-%d')
+    if freq == 'W-SUN':
+        day -= timedelta(days=day.weekday())
+    return day.strftime('%Y-%m-%d')
+
+
+def _period_end(start: str, freq: str) -> str:
+    days = 7 if freq == 'W-SUN' else 1
+    return (datetime.strptime(start, '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def _epoch(date: str) -> int:
+    return int(datetime.strptime(date, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+
+class RollupStore:
+    """Daily and weekly rollup tables, kept up to date incrementally.
+
+    A manifest next to the tables records every stored file already rolled up
+    (with its size and mtime). An update only looks at the files that are new,
+    changed or gone since then (new snapshots, backfilled or late hours,
+    compaction) and recomputes just the (period, chainId) buckets those files
+    fall in, from those periods' partitions. Late hours are found by their
+    files, whatever their time, so there is no time watermark. Rows the
+    scheduler backfilled are rolled up with the others.
+    """
+
+    def __init__(self, root: str = STORE_PATH, path: str = ROLLUP_PATH):
+        self.root = root
+        self.path = path
+        self.manifest_path = os.path.join(path, 'manifest.json')
+
+    def load(self, name: str = 'daily') -> pd.DataFrame:
+        path = os.path.join(self.path, f'{name}.parquet')
+        return pd.read_parquet(path) if os.path.isfile(path) else pd.DataFrame()
+
+    def _manifest(self) -> Dict:
+        if not os.path.isfile(self.manifest_path):
+            return {'files': {}}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _write(self, name: str, df: pd.DataFrame) -> None:
+        path = os.path.join(self.path, f'{name}.parquet')
+        tmp_path = path + '.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def update(self) -> Dict[str, int]:
+        """Recompute the buckets touched since the last update. Returns the number of buckets per table"""
+        from quotes_store import read_history
+
+        manifest = self._manifest()
+        files = _files(self.root) if os.path.isdir(self.root) else {}
+        changed = [path for path, stat in files.items() if manifest['files'].get(path) != stat]
+        removed = [path for path in manifest['files'] if path not in files]
+        if not changed and not removed:
+            return {name: 0 for name in FREQUENCIES}
+
+        # Days (per chain) whose rows may have changed
+        touched: Set[Tuple[str, int]] = {_partition(path) for path in changed + removed}
+
+        os.makedirs(self.path, exist_ok=True)
+        counts = {}
+        for name, freq in FREQUENCIES.items():
+            buckets = {(_period_start(date, freq), chain_id) for date, chain_id in touched}
+            fresh = []
+            for start, chain_id in sorted(buckets):
+                # Backfilled hours were quoted late but are real quotes of their hour: they count
+                table = read_history(self.root, chain_id=chain_id, start=_epoch(start), end=_epoch(_period_end(start, freq)),
+                                     backfilled=None)
+                if table.num_rows:
+                    df = table.to_pandas()
+                    for column in ('platform', 'fromToken', 'toToken', 'status'):
+                        df[column] = df[column].astype(str)
+                    fresh.append(rollup(df, freq))
+
+            current = self.load(name)
+            if not current.empty:
+                stale = pd.Series(list(zip(current['period'], current['chainId']))).isin(buckets).to_numpy()
+                current = current[~stale]
+            table = pd.concat([current] + fresh, ignore_index=True) if fresh or not current.empty else pd.DataFrame()
+            if not table.empty:
+                table = table.sort_values(['period', 'chainId'] + ROLLUP_KEYS, kind='stable').reset_index(drop=True)
+            self._write(name, table)
+            counts[name] = len(buckets)
+
+        with open(self.manifest_path + '.tmp', 'w') as f:
+            json.dump({'files': files}, f)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+        return counts
+
+
+def update_rollups(root: str = STORE_PATH, path: str = ROLLUP_PATH) -> Dict[str, int]:
+    return RollupStore(root, path).update()
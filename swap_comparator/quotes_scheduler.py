@@ -0,0 +1,157 @@
+# quotes_scheduler.py
+
+import asyncio
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from quotes_config import SCHEDULER_WINDOW, SCHEDULER_CHECKPOINT_PATH, SCHEDULER_BACKFILL_HOURS
+from quotes_sweep import WorkUnit, build_work_units, run_sweep, run_synchronized_sweep
+from quotes_ladder import run_adaptive_sweep
+
+HOUR = 3600
+
+
+def hour_start(timestamp: float) -> int:
+    return int(timestamp) // HOUR * HOUR
+
+
+def unit_key(chain_id, fromToken, toToken, amount, provider) -> str:
+    return f"{chain_id}|{fromToken}|{toToken}|{float(amount)}|{provider}"
+
+
+class Checkpoint:
+    """Finished work units of one hour, appended to `<dir>/<hour>.log` once their rows are stored.
+
+    A `<hour>.done` marker is written once every unit of the hour has a row.
+    """
+
+    def __init__(self, hour: int, directory: str = SCHEDULER_CHECKPOINT_PATH):
+        os.makedirs(directory, exist_ok=True)
+        self.hour = hour
+        self.log_path = os.path.join(directory, f"{hour}.log")
+        self.done_path = os.path.join(directory, f"{hour}.done")
+        self._file = None
+
+    def finished(self) -> Set[str]:
+        if not os.path.isfile(self.log_path):
+            return set()
+        with open(self.log_path) as f:
+            return {line.rstrip("\n") for line in f if line.endswith("\n")}
+
+    def record(self, row: Dict) -> None:
+        self.record_all([row])
+
+    def record_all(self, rows: List[Dict]) -> None:
+        if self._file is None:
+            self._file = open(self.log_path, "a")
+        self._file.writelines(unit_key(row["chainId"], row["fromToken"], row["toToken"], row["amountIn"], row["platform"]) + "\n" for row in rows)
+        self._file.flush()
+
+    def is_done(self) -> bool:
+        return os.path.isfile(self.done_path)
+
+    def mark_done(self) -> None:
+        self.close()
+        open(self.done_path, "w").close()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def missed_hours(current: int, directory: str = SCHEDULER_CHECKPOINT_PATH, max_hours: int = SCHEDULER_BACKFILL_HOURS) -> List[int]:
+    """Hours before `current` (at most `max_hours` back, and not before the first recorded hour) with no .done marker"""
+    if not os.path.isdir(directory):
+        return []
+    recorded = [int(name.split(".")[0]) for name in os.listdir(directory) if name.split(".")[0].isdigit()]
+    if not recorded:
+        return []
+    first = max(min(recorded), current - max_hours * HOUR)
+    return [hour for hour in range(first, current, HOUR) if not Checkpoint(hour, directory).is_done()]
+
+
+def run_hour(
+    hour: int,
+    units: List[WorkUnit],
+    sink_factory: Callable[[], Callable[[Dict], None]],
+    window: float = SCHEDULER_WINDOW,
+    directory: str = SCHEDULER_CHECKPOINT_PATH,
+    adaptive: bool = False,
+    synchronized: bool = False,
+    backfill: bool = False
+) -> int:
+    """Run the units of `hour` not yet checkpointed, spread over what is left of `window`.
+
+    A unit is checkpointed only once its row is stored: sinks that buffer
+    rows (those with an `on_flush` hook, like ParquetSink) checkpoint them as
+    they write them out, the others as soon as they return. A crash re-quotes
+    the buffered units instead of losing them. With `adaptive`, the remaining
+    units are sampled with quotes_ladder (a resumed hour re-plans each ladder
+    over its remaining sizes only); with `synchronized`, each unit's providers
+    are quoted as one burst. `backfill` flags the rows as quoted late for a
+    missed hour.
+    """
+    checkpoint = Checkpoint(hour, directory)
+    finished = checkpoint.finished()
+    remaining = [unit for unit in units if unit_key(unit.chain_id, unit.fromToken, unit.toToken, unit.amount, unit.provider) not in finished]
+    # Backfilled and resumed hours get whatever is left of the current hour's window
+    spread = max(0.0, min(window, hour_start(time.time()) + window - time.time()))
+
+    sink = sink_factory()
+    buffered = hasattr(sink, "on_flush")
+    if buffered:
+        sink.on_flush = checkpoint.record_all
+
+    def record(row: Dict) -> None:
+        row["backfilled"] = backfill
+        sink(row)
+        if not buffered:
+            checkpoint.record(row)
+
+    try:
+        runner = run_adaptive_sweep if adaptive else run_synchronized_sweep if synchronized else run_sweep
+        produced = asyncio.run(runner(remaining, record, timestamp=hour, spread_over=spread))
+    finally:
+        if hasattr(sink, "close"):
+            sink.close()
+        checkpoint.close()
+    checkpoint.mark_done()
+    return produced
+
+
+def run_forever(
+    sink_factory: Callable[[], Callable[[Dict], None]],
+    networks: Optional[Iterable[str]] = None,
+    providers: Optional[Iterable[str]] = None,
+    window: float = SCHEDULER_WINDOW,
+    directory: str = SCHEDULER_CHECKPOINT_PATH,
+    adaptive: bool = False,
+    synchronized: bool = False,
+    compact_root: Optional[str] = None
+) -> None:
+    """Snapshot the sweep matrix every hour, resuming and backfilling from the checkpoints.
+
+    With `compact_root` (the Parquet store), the past days' partitions are
+    compacted after every hour, so late and backfilled files get merged too.
+    """
+    units = build_work_units(networks, providers)
+    while True:
+        current = hour_start(time.time())
+        for hour in missed_hours(current, directory):
+            print(f"Backfilling hour {hour}")
+            run_hour(hour, units, sink_factory, window=0, directory=directory, adaptive=adaptive, synchronized=synchronized, backfill=True)
+
+        if not Checkpoint(current, directory).is_done():
+            produced = run_hour(current, units, sink_factory, window, directory, adaptive, synchronized)
+            print(f"Hour {current}: {produced} quotes")
+
+        if compact_root:
+            from quotes_store import compact
+            # Partitions already merged into one file are skipped, so this is cheap most hours
+            compacted = compact(compact_root)
+            if compacted:
+                print(f"Compacted {compacted} partitions")
+
+        time.sleep(max(0.0, current + HOUR - time.time()))
@@ -0,0 +1,284 @@
+# quotes_store.py
+
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+from quotes_config import STORE_PATH, STORE_ROW_GROUP_SIZE, HISTORY_DATASET_TTL, HISTORY_PAGE_SIZE
+
+# pyarrow is only needed by the columnar store; the rest of the package works without it
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pc = ds = pq = None
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("The columnar quote store needs pyarrow: pip install pyarrow")
+
+
+def store_schema() -> "pa.Schema":
+    """Column types of a stored quote row (chainId and date live in the partition path)"""
+    _require_pyarrow()
+    symbol = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("timestamp", pa.int64()),
+        ("platform", symbol),
+        ("fromToken", symbol),
+        ("toToken", symbol),
+        ("amountIn", pa.float64()),
+        ("amountOut", pa.float64()),
+        # Raw integer amounts can exceed int64 (10,000 WETH = 1e22 wei)
+        ("amountOutRaw", pa.decimal128(38, 0)),
+        ("minAmountOutRaw", pa.decimal128(38, 0)),
+        ("status", symbol),
+        ("quotedAt", pa.int64()),
+        # Adaptive ladder only (null otherwise, and in files written before these columns existed)
+        ("priceImpactBps", pa.float64()),
+        ("impactErrorBps", pa.float64()),
+        ("amountInUSD", pa.float64()),
+        ("amountOutUSD", pa.float64()),
+        ("priceVersion", pa.int64()),
+        ("gasUnits", pa.int64()),
+        ("gasPriceGwei", pa.float64()),
+        ("gasCostNative", pa.float64()),
+        ("gasCostUSD", pa.float64()),
+        ("requestSentAt", pa.float64()),
+        ("responseReceivedAt", pa.float64()),
+        ("skewMs", pa.float64()),
+        ("skewed", pa.bool_()),
+        # Quoted late for a missed hour by the scheduler (quotes_scheduler); left out of history reads by default
+        ("backfilled", pa.bool_()),
+    ])
+
+
+def partition_of(row: Dict) -> Tuple[str, int]:
+    date = datetime.fromtimestamp(row["timestamp"], tz=timezone.utc).strftime("%Y-%m-%d")
+    return date, int(row["chainId"])
+
+
+def partition_dir(root: str, date: str, chain_id: int) -> str:
+    return os.path.join(root, f"date={date}", f"chainId={chain_id}")
+
+
+def _to_table(rows: List[Dict], schema: "pa.Schema") -> "pa.Table":
+    columns = {}
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if pa.types.is_decimal(field.type):
+            values = [None if value is None else Decimal(int(value)) for value in values]
+        columns[field.name] = pa.array(values, type=field.type)
+    return pa.table(columns, schema=schema)
+
+
+class ParquetSink:
+    """Append-only sink writing rows into date/chainId partitions as they arrive.
+
+    Rows are buffered per partition and written out every `row_group_size`
+    rows (and by close()), each batch as a file of its own that is renamed into
+    place once complete, so memory stays bounded and a crash never leaves a
+    half-written file behind. `on_flush`, when set, is called with every batch
+    once it is readable from the store. Call close() to write out the rest.
+    """
+
+    def __init__(self, root: str = STORE_PATH, row_group_size: int = STORE_ROW_GROUP_SIZE,
+                 on_flush: Optional[Callable[[List[Dict]], None]] = None):
+        _require_pyarrow()
+        self.root = root
+        self.row_group_size = row_group_size
+        self.schema = store_schema()
+        self.on_flush = on_flush
+        self._buffers: Dict[Tuple[str, int], List[Dict]] = {}
+        self._run_id = uuid.uuid4().hex[:12]
+        self._batches = 0
+
+    def __call__(self, row: Dict) -> None:
+        partition = partition_of(row)
+        buffer = self._buffers.setdefault(partition, [])
+        buffer.append(row)
+        if len(buffer) >= self.row_group_size:
+            self._flush(partition)
+
+    def _flush(self, partition: Tuple[str, int]) -> None:
+        rows = self._buffers.pop(partition, None)
+        if not rows:
+            return
+        directory = partition_dir(self.root, *partition)
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{rows[0]['timestamp']}-{self._run_id}-{self._batches}.parquet"
+        self._batches += 1
+        # Dot-prefixed files are ignored by dataset reads until renamed
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        pq.write_table(_to_table(rows, self.schema), tmp_path)
+        os.replace(tmp_path, os.path.join(directory, name))
+        if self.on_flush is not None:
+            self.on_flush(rows)
+
+    def close(self) -> None:
+        for partition in list(self._buffers):
+            self._flush(partition)
+
+
+def dataset(root: str = STORE_PATH) -> "ds.Dataset":
+    _require_pyarrow()
+    partitioning = ds.partitioning(pa.schema([("date", pa.string()), ("chainId", pa.int64())]), flavor="hive")
+    return ds.dataset(root, format="parquet", schema=_dataset_schema(), partitioning=partitioning)
+
+
+def _dataset_schema() -> "pa.Schema":
+    return store_schema().append(pa.field("date", pa.string())).append(pa.field("chainId", pa.int64()))
+
+
+def history_filter(
+    chain_id: Optional[int] = None,
+    fromToken: Optional[str] = None,
+    toToken: Optional[str] = None,
+    platform: Optional[str] = None,
+    amountIn: Optional[float] = None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    backfilled: Optional[bool] = False
+) -> Optional["ds.Expression"]:
+    """Dataset filter for the given keys. Partition keys (date, chainId) prune whole directories.
+
+    Backfilled rows (quoted after their hour) are left out unless `backfilled`
+    is True (only them) or None (every row).
+    """
+    conditions = []
+    if backfilled is not None:
+        # Rows from before the column existed are null: not backfilled
+        flagged = ds.field("backfilled").is_valid() & (ds.field("backfilled") == True)  # noqa: E712
+        conditions.append(flagged if backfilled else ~flagged)
+    if chain_id is not None:
+        conditions.append(ds.field("chainId") == chain_id)
+    if start is not None:
+        conditions.append(ds.field("date") >= _date(start))
+        conditions.append(ds.field("timestamp") >= start)
+    if end is not None:
+        conditions.append(ds.field("date") <= _date(end))
+        conditions.append(ds.field("timestamp") < end)
+    for name, value in (("fromToken", fromToken), ("toToken", toToken), ("platform", platform), ("amountIn", amountIn)):
+        if value is not None:
+            conditions.append(ds.field(name) == value)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _date(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def read_history(root: str = STORE_PATH, columns: Optional[List[str]] = None, **keys) -> "pa.Table":
+    """Read stored rows matching `keys` (see history_filter)"""
+    if not os.path.isdir(root):
+        return _dataset_schema().empty_table()
+    return dataset(root).to_table(columns=columns, filter=history_filter(**keys))
+
+
+_datasets: Dict[str, Tuple[float, "ds.Dataset"]] = {}
+
+HISTORY_COLUMNS = ["timestamp", "platform", "fromToken", "toToken", "chainId", "amountIn", "amountOut", "status"]
+
+
+def cached_dataset(root: str = STORE_PATH, ttl: float = HISTORY_DATASET_TTL) -> "ds.Dataset":
+    """dataset(root), re-discovering the files at most every `ttl` seconds (listing them is the slow part)"""
+    entry = _datasets.get(root)
+    if entry is None or time.monotonic() - entry[0] > ttl:
+        entry = _datasets[root] = (time.monotonic(), dataset(root))
+    return entry[1]
+
+
+def query_history(
+    root: str = STORE_PATH,
+    limit: int = HISTORY_PAGE_SIZE,
+    offset: int = 0,
+    interval: Optional[int] = None,
+    **keys
+) -> Tuple["pa.Table", Optional[int]]:
+    """One page of stored rows matching `keys` (see history_filter), oldest first.
+
+    Only the matching partitions and the HISTORY_COLUMNS are read. With
+    `interval` (seconds), answered quotes are downsampled to one row per
+    platform x pair x size x interval with the mean/min/max output and the
+    number of quotes. Returns the page and the offset of the next one (None
+    on the last page).
+    """
+    if not os.path.isdir(root):
+        return pa.table({name: pa.array([], type=_dataset_schema().field(name).type) for name in HISTORY_COLUMNS}), None
+    try:
+        table = cached_dataset(root).to_table(columns=HISTORY_COLUMNS, filter=history_filter(**keys))
+    except FileNotFoundError:
+        # Files compacted away (by another process) since the listing: list them again
+        _datasets.pop(root, None)
+        table = cached_dataset(root).to_table(columns=HISTORY_COLUMNS, filter=history_filter(**keys))
+    # Dictionary columns can't be sorted or grouped on directly
+    for name in ("platform", "fromToken", "toToken", "status"):
+        table = table.set_column(table.schema.get_field_index(name), name, table[name].cast(pa.string()))
+
+    if interval:
+        table = table.filter(pc.equal(table["status"], "ok"))
+        bucket = pc.multiply(pc.divide(table["timestamp"], pa.scalar(interval, pa.int64())), pa.scalar(interval, pa.int64()))
+        table = table.set_column(0, "timestamp", bucket).group_by(
+            ["timestamp", "platform", "fromToken", "toToken", "chainId", "amountIn"]
+        ).aggregate([("amountOut", "mean"), ("amountOut", "min"), ("amountOut", "max"), ("amountOut", "count")])
+        table = table.rename_columns([
+            {"amountOut_mean": "amountOut", "amountOut_min": "amountOutMin",
+             "amountOut_max": "amountOutMax", "amountOut_count": "quotes"}.get(name, name)
+            for name in table.column_names
+        ])
+
+    order = [("timestamp", "ascending"), ("chainId", "ascending"), ("platform", "ascending"), ("amountIn", "ascending")]
+    table = table.take(pc.sort_indices(table, sort_keys=order))
+    page = table.slice(offset, limit)
+    return page, offset + limit if offset + limit < table.num_rows else None
+
+
+def compact(root: str = STORE_PATH, before_date: Optional[str] = None) -> int:
+    """Merge each partition's small files into one file sorted by pair, platform and time.
+
+    Only partitions strictly before `before_date` (default: today, UTC) are
+    touched, so files still being appended to are left alone. Returns the number
+    of partitions compacted.
+    """
+    _require_pyarrow()
+    before_date = before_date or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    compacted = 0
+    if not os.path.isdir(root):
+        return compacted
+
+    for date_dir in sorted(os.listdir(root)):
+        if not date_dir.startswith("date=") or date_dir[len("date="):] >= before_date:
+            continue
+        for chain_dir in sorted(os.listdir(os.path.join(root, date_dir))):
+            directory = os.path.join(root, date_dir, chain_dir)
+            files = sorted(name for name in os.listdir(directory) if name.endswith(".parquet"))
+            if len(files) < 2:
+                continue
+
+            # Read with the current schema: older files may lack newer columns
+            table = pa.concat_tables([pq.read_table(os.path.join(directory, name), schema=store_schema()) for name in files])
+            # Sorting keeps one pair's rows together, so row-group statistics can skip the others
+            sort_columns = ["fromToken", "toToken", "platform", "timestamp"]
+            keys = pa.table({name: table[name].cast(pa.string()) if name != "timestamp" else table[name] for name in sort_columns})
+            table = table.take(pc.sort_indices(keys, sort_keys=[(name, "ascending") for name in sort_columns]))
+
+            tmp_path = os.path.join(directory, f".compact-{uuid.uuid4().hex[:12]}.tmp")
+            pq.write_table(table, tmp_path, row_group_size=max(STORE_ROW_GROUP_SIZE, 1))
+            os.replace(tmp_path, os.path.join(directory, f"compacted-{uuid.uuid4().hex[:12]}.parquet"))
+            for name in files:
+                os.remove(os.path.join(directory, name))
+            compacted += 1
+    if compacted:
+        # The cached listing names the removed files
+        _datasets.pop(root, None)
+    return compacted
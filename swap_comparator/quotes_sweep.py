@@ -0,0 +1,368 @@
+# quotes_sweep.py
+
+import asyncio
+import csv
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional
+
+from quotes_config import (
+    NETWORK_CONFIG, TOKEN_DECIMALS, SWEEP_PAIRS, AMOUNT_LADDERS, TOKEN_CATEGORY,
+    SWEEP_CONCURRENCY, SWEEP_PROVIDER_CONCURRENCY, SNAPSHOT_MAX_SKEW
+)
+from quotes_utils import PROVIDERS, EXTRACTORS
+from quotes_breaker import breakers, CircuitOpen
+from quotes_prices import PriceSnapshot, price_feed, StalePrices
+from quotes_gas import GasPrice, gas_prices, gas_cost
+from quotes_metrics import provider_latency, provider_outcomes, parse_failures
+
+ROW_FIELDS = [
+    "timestamp",
+    "platform",
+    "fromToken",
+    "toToken",
+    "chainId",
+    "amountIn",
+    "amountOut",
+    "amountOutRaw",
+    "minAmountOutRaw",
+    "status",
+    "quotedAt",
+    "priceImpactBps",
+    "impactErrorBps",
+    "amountInUSD",
+    "amountOutUSD",
+    "priceVersion",
+    "gasUnits",
+    "gasPriceGwei",
+    "gasCostNative",
+    "gasCostUSD",
+    "requestSentAt",
+    "responseReceivedAt",
+    "skewMs",
+    "skewed",
+    "backfilled",
+]
+
+
+@dataclass(frozen=True)
+class WorkUnit:
+    """One provider quote for one (chain, pair, size) of the sweep matrix"""
+    network: str
+    chain_id: int
+    fromToken: str
+    toToken: str
+    amount: float
+    provider: str
+
+    @property
+    def raw_amount(self) -> str:
+        return str(int(Decimal(str(self.amount)) * (10 ** TOKEN_DECIMALS[self.fromToken])))
+
+    def address(self, symbol: str) -> str:
+        return NETWORK_CONFIG[self.network][symbol]
+
+
+def build_work_units(networks: Optional[Iterable[str]] = None, providers: Optional[Iterable[str]] = None) -> List[WorkUnit]:
+    """Expand every pair on every chain x the pair's amount ladder x every provider"""
+    networks = list(networks or SWEEP_PAIRS)
+    providers = list(providers or PROVIDERS)
+
+    units = []
+    for network in networks:
+        if network not in SWEEP_PAIRS:
+            print(f"Skipping unknown network: {network}")
+            continue
+        chain_id = NETWORK_CONFIG[network]['chain_id']
+        for fromToken, toToken in SWEEP_PAIRS[network]:
+            for amount in AMOUNT_LADDERS[TOKEN_CATEGORY[fromToken]]:
+                for provider in providers:
+                    units.append(WorkUnit(network, chain_id, fromToken, toToken, amount, provider))
+    return units
+
+
+def empty_row(unit: WorkUnit, timestamp: int) -> Dict:
+    """Output row of a unit before it is quoted"""
+    return {
+        "timestamp": timestamp,
+        "platform": unit.provider,
+        "fromToken": unit.fromToken,
+        "toToken": unit.toToken,
+        "chainId": unit.chain_id,
+        "amountIn": unit.amount,
+        "amountOut": None,
+        "amountOutRaw": None,
+        "minAmountOutRaw": None,
+        "status": "no_quote",
+        "quotedAt": int(time.time()),
+        # Only filled by the adaptive ladder (quotes_ladder)
+        "priceImpactBps": None,
+        "impactErrorBps": None,
+        # USD values from the quotes_prices version used (recomputable with load_prices)
+        "amountInUSD": None,
+        "amountOutUSD": None,
+        "priceVersion": None,
+        # Gas the provider estimates, priced at the chain's gas price of the snapshot
+        "gasUnits": None,
+        "gasPriceGwei": None,
+        "gasCostNative": None,
+        "gasCostUSD": None,
+        # Unix times around the provider call; skew of the unit's providers in synchronized snapshots only
+        "requestSentAt": None,
+        "responseReceivedAt": None,
+        "skewMs": None,
+        "skewed": None,
+        # Set by the scheduler when the unit is quoted late, for an hour it missed
+        "backfilled": False,
+    }
+
+
+def quote_unit(unit: WorkUnit, timestamp: int) -> Dict:
+    """Query one provider for one unit and turn the answer into an output row"""
+    row = empty_row(unit, timestamp)
+    if not breakers.available(unit.provider):
+        # Keep the row so the gap is visible in the store
+        row["status"] = "skipped"
+        provider_outcomes.inc(provider=unit.provider, chain=unit.chain_id, outcome="skipped")
+        return row
+
+    # One gas price per chain per snapshot, shared by all its quotes
+    gas_price = gas_prices.get(unit.chain_id, snapshot=timestamp)
+    # Odos routes for a gas price: give it the snapshot's one
+    options = {"gas_price_gwei": gas_price.gwei} if unit.provider == "odos" and gas_price is not None else {}
+
+    start = time.monotonic()
+    data = None
+    row["requestSentAt"] = time.time()
+    try:
+        data = PROVIDERS[unit.provider](unit.chain_id, unit.address(unit.fromToken), unit.address(unit.toToken), unit.raw_amount, **options)
+        row["responseReceivedAt"] = time.time()
+        provider_latency.observe(time.monotonic() - start, provider=unit.provider, chain=unit.chain_id)
+        # The full answer rides along for quotes_archive (sinks only keep ROW_FIELDS)
+        row["response"] = data
+        if data is not None:
+            extract_row(row, unit, data, gas_price, current_prices(unit.chain_id))
+    except CircuitOpen:
+        # The breaker opened (or its probe slot was taken) after the check above
+        row["responseReceivedAt"] = row["responseReceivedAt"] or time.time()
+        row["status"] = "skipped"
+    except Exception as e:
+        row["responseReceivedAt"] = row["responseReceivedAt"] or time.time()
+        print(f"{unit.provider} error on {unit.network} {unit.fromToken}-{unit.toToken} {unit.amount}: {str(e)}")
+        if data is not None:
+            parse_failures.inc(provider=unit.provider)
+        row["status"] = "error"
+    provider_outcomes.inc(provider=unit.provider, chain=unit.chain_id, outcome=row["status"])
+    return row
+
+
+def extract_row(row: Dict, unit: WorkUnit, data: Dict, gas_price: Optional[GasPrice], prices: Optional[PriceSnapshot]) -> Dict:
+    """Fill a row from a provider's answer, priced with `prices` and `gas_price` (quotes_archive replays it on archived answers)"""
+    record = EXTRACTORS[unit.provider](data)
+    row.update({
+        "amountOut": record.Amount / (10 ** TOKEN_DECIMALS[unit.toToken]),
+        "amountOutRaw": record.Amount,
+        "minAmountOutRaw": record.minAmount,
+        "status": "ok",
+    })
+    if prices is not None:
+        add_usd_values(row, unit, prices)
+    row.update(gas_cost(record.gasUnits, gas_price, prices))
+    return row
+
+
+def current_prices(chain_id: int) -> Optional[PriceSnapshot]:
+    """The chain's current price snapshot (None if prices are too stale)"""
+    try:
+        return price_feed.snapshot(chain_id)
+    except StalePrices as e:
+        print(str(e))
+        return None
+
+
+def add_usd_values(row: Dict, unit: WorkUnit, prices: PriceSnapshot) -> None:
+    """Price a quoted row in USD with a chain's price snapshot"""
+    price_in, price_out = prices.price(unit.address(unit.fromToken)), prices.price(unit.address(unit.toToken))
+    row.update({
+        "amountInUSD": unit.amount * price_in if price_in is not None else None,
+        "amountOutUSD": row["amountOut"] * price_out if price_out is not None else None,
+        "priceVersion": prices.version,
+    })
+
+
+async def run_sweep(
+    units: List[WorkUnit],
+    sink: Callable[[Dict], None],
+    timestamp: Optional[int] = None,
+    concurrency: int = SWEEP_CONCURRENCY,
+    provider_concurrency: Dict[str, int] = SWEEP_PROVIDER_CONCURRENCY,
+    spread_over: float = 0
+) -> int:
+    """Run the work queue with bounded concurrency per provider and globally.
+
+    Each provider has its own queue drained by `provider_concurrency[provider]`
+    workers, so a slow provider never holds back the others; a global semaphore
+    caps the total number of requests in flight. With `spread_over` (seconds)
+    the unit starts are paced evenly over that window instead of all at once.
+    Rows are handed to `sink` as soon as they arrive. Returns the number of
+    rows produced.
+    """
+    timestamp = timestamp if timestamp is not None else int(time.time()) // 3600 * 3600
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    in_flight = asyncio.Semaphore(concurrency)
+
+    queues: Dict[str, asyncio.Queue] = {}
+    for unit in units:
+        queues.setdefault(unit.provider, asyncio.Queue()).put_nowait(unit)
+
+    interval = spread_over / len(units) if units and spread_over > 0 else 0
+    next_start = loop.time()
+    produced = 0
+
+    async def pace():
+        nonlocal next_start
+        start = max(next_start, loop.time())
+        next_start = start + interval
+        await asyncio.sleep(start - loop.time())
+
+    async def worker(queue: asyncio.Queue):
+        nonlocal produced
+        while not queue.empty():
+            unit = queue.get_nowait()
+            if interval:
+                await pace()
+            async with in_flight:
+                row = await loop.run_in_executor(executor, quote_unit, unit, timestamp)
+            sink(row)
+            produced += 1
+
+    workers = [
+        worker(queue)
+        for provider, queue in queues.items()
+        for _ in range(provider_concurrency.get(provider, 1))
+    ]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        executor.shutdown(wait=False)
+    return produced
+
+
+def add_skew(rows: List[Dict], max_skew: float = SNAPSHOT_MAX_SKEW) -> List[Dict]:
+    """Set the skew of one unit on each of its providers' rows.
+
+    A quote reflects the market somewhere between its request and its
+    response; the skew is the spread of those midpoints across the providers
+    that were called. Rows further apart than `max_skew` seconds are flagged.
+    """
+    moments = [
+        (row["requestSentAt"] + row["responseReceivedAt"]) / 2
+        for row in rows if row["requestSentAt"] is not None and row["responseReceivedAt"] is not None
+    ]
+    if not moments:
+        return rows
+    skew = max(moments) - min(moments)
+    for row in rows:
+        row["skewMs"] = skew * 1000
+        row["skewed"] = skew > max_skew
+    return rows
+
+
+async def run_synchronized_sweep(
+    units: List[WorkUnit],
+    sink: Callable[[Dict], None],
+    timestamp: Optional[int] = None,
+    concurrency: int = SWEEP_CONCURRENCY,
+    spread_over: float = 0,
+    max_skew: float = SNAPSHOT_MAX_SKEW
+) -> int:
+    """Snapshot mode of run_sweep: the providers of each (chain, pair, size) are quoted as one burst.
+
+    Every provider request of a unit is sent at the same moment, so the quotes
+    compare the same market; each row records its request/response times and
+    the unit's skew (see add_skew). Bursts run `concurrency` requests at a time
+    and, with `spread_over`, are paced evenly over that window. Returns the
+    number of rows produced.
+    """
+    timestamp = timestamp if timestamp is not None else int(time.time()) // 3600 * 3600
+    loop = asyncio.get_running_loop()
+
+    bursts: Dict[tuple, List[WorkUnit]] = {}
+    for unit in units:
+        bursts.setdefault((unit.chain_id, unit.fromToken, unit.toToken, unit.amount), []).append(unit)
+    queue = list(bursts.values())
+    queue.reverse()
+    width = max((len(burst) for burst in queue), default=1)
+    # Enough threads for every request of the bursts in flight to leave together
+    executor = ThreadPoolExecutor(max_workers=max(concurrency, width))
+
+    interval = spread_over / len(queue) if queue and spread_over > 0 else 0
+    next_start = loop.time()
+    produced = 0
+
+    async def worker():
+        nonlocal next_start, produced
+        while queue:
+            burst = queue.pop()
+            if interval:
+                start = max(next_start, loop.time())
+                next_start = start + interval
+                await asyncio.sleep(start - loop.time())
+            rows = await asyncio.gather(*(loop.run_in_executor(executor, quote_unit, unit, timestamp) for unit in burst))
+            for row in add_skew(list(rows), max_skew):
+                sink(row)
+                produced += 1
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency // width))))
+    finally:
+        executor.shutdown(wait=False)
+    return produced
+
+
+def sweep(networks: Optional[Iterable[str]] = None, providers: Optional[Iterable[str]] = None, sink: Optional[Callable[[Dict], None]] = None,
+          adaptive: bool = False, synchronized: bool = False) -> int:
+    """Run one full snapshot of the sweep matrix.
+
+    With `adaptive`, the amount ladders are sampled with quotes_ladder; with
+    `synchronized`, each unit's providers are quoted as one burst.
+    """
+    if adaptive and synchronized:
+        raise ValueError("Adaptive and synchronized sweeps can't be combined")
+    units = build_work_units(networks, providers)
+    if adaptive:
+        from quotes_ladder import run_adaptive_sweep
+        return asyncio.run(run_adaptive_sweep(units, sink or print))
+    if synchronized:
+        return asyncio.run(run_synchronized_sweep(units, sink or print))
+    return asyncio.run(run_sweep(units, sink or print))
+
+
+class CsvSink:
+    """Append rows to a CSV file as they arrive"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_exists = os.path.isfile(path) and os.path.getsize(path) > 0
+        fieldnames = ROW_FIELDS
+        if file_exists:
+            # Keep appending in the file's own column order (it may predate newer columns)
+            with open(path, newline="") as f:
+                fieldnames = next(csv.reader(f))
+        self._file = open(path, "a")
+        self._writer = csv.DictWriter(self._file, delimiter=",", lineterminator="\n", fieldnames=fieldnames, extrasaction="ignore")
+        if not file_exists:
+            self._writer.writeheader()
+
+    def __call__(self, row: Dict) -> None:
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,139 @@
+# quotes_timing.py
+
+import contextvars
+import cProfile
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from quotes_config import PROFILE_PATH
+
+
+class Timings:
+    """Stage durations of one request, rendered as a Server-Timing header.
+
+    Spans may overlap (providers run concurrently) and the same name may
+    appear more than once (retried or repeated calls).
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.spans: List[Tuple[str, float, Optional[str]]] = []  # (name, seconds, description)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, description: Optional[str] = None) -> None:
+        with self._lock:
+            self.spans.append((name, seconds, description))
+
+    def header(self, total: bool = True) -> str:
+        """Server-Timing value: `name;dur=<ms>[;desc="..."]` per span, then the total so far"""
+        entries = []
+        for name, seconds, description in self.spans + ([("total", time.monotonic() - self.started, None)] if total else []):
+            entry = f"{name};dur={seconds * 1000:.1f}"
+            if description:
+                entry += f';desc="{description}"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+    def as_list(self) -> List[Dict]:
+        return [{"name": name, "ms": round(seconds * 1000, 1), "desc": description} for name, seconds, description in self.spans]
+
+
+class RequestProfile:
+    """cProfile of one request: its own thread plus the worker threads it hands work to"""
+
+    def __init__(self):
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """Start profiling the current thread"""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active in this thread
+            return None
+        return profile
+
+    def stop(self, profile: Optional[cProfile.Profile]) -> None:
+        if profile is None:
+            return
+        profile.disable()
+        with self._lock:
+            self._profiles.append(profile)
+
+    @contextmanager
+    def thread(self):
+        """Profile the current thread for the duration of the block"""
+        profile = self.start()
+        try:
+            yield
+        finally:
+            self.stop(profile)
+
+    def save(self, directory: str = PROFILE_PATH, name: str = "request") -> Optional[str]:
+        """Write the merged profile (pstats format: python -m pstats <file>); returns its path"""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{int(time.time())}-{name}-{uuid.uuid4().hex[:8]}.prof")
+        stats.dump_stats(path)
+        return path
+
+
+_timings: contextvars.ContextVar = contextvars.ContextVar("timings", default=None)
+_profile: contextvars.ContextVar = contextvars.ContextVar("profile", default=None)
+
+
+def begin(profile: bool = False) -> Tuple[Timings, Optional[RequestProfile]]:
+    """Start collecting the current request's spans (and profiling it); call end() when it is over"""
+    timings = Timings()
+    _timings.set(timings)
+    _profile.set(RequestProfile() if profile else None)
+    return timings, _profile.get()
+
+
+def end() -> None:
+    _timings.set(None)
+    _profile.set(None)
+
+
+def current() -> Optional[Timings]:
+    return _timings.get()
+
+
+@contextmanager
+def span(name: str, description: Optional[str] = None):
+    """Time the block as a span of the current request (nothing outside a request)"""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        timings.add(name, time.monotonic() - start, description)
+
+
+def submit(executor, fn, *args):
+    """executor.submit() carrying the request's timings and profile over to the worker thread"""
+    return executor.submit(contextvars.copy_context().run, _traced, fn, *args)
+
+
+def _traced(fn, *args):
+    profile = _profile.get()
+    if profile is None:
+        return fn(*args)
+    with profile.thread():
+        return fn(*args)
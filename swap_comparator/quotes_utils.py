@@ -8,196 +8,206 @@ Created on Sat Oct 26 08:43:11 2024
 
 # quote_utils.py
 
-import pandas as pd
-import requests
 import time
-from typing import Optional, Dict
+import quotes_http
+from quotes_breaker import CircuitOpen
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Tuple, TYPE_CHECKING
 from quotes_config import (
     INCH_API_KEY, ZERO_X_API_KEY, COWSWAP_URL, ODOS_URL,
     ZERO_X_URL, LIFI_URL, INCH_URL, DEFAULT_USER_ADDRESS,
     DEFAULT_TAKER_ADDRESS
 )
-
-def extract_quote_lifi(df: pd.DataFrame) -> Dict:
+from quotes_gas import gas_prices, gas_units
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+@dataclass(slots=True)
+class QuoteRecord:
+    """One provider quote; amounts are raw integers in the buy token's smallest unit"""
+    minAmount: Optional[int]
+    Amount: int
+    protocol: str = ''
+    sellToken: str = ''
+    buyToken: str = ''
+    sellAmount: float = 0.0
+    gasUnits: Optional[int] = None  # gas the provider estimates for the swap
+    requestSentAt: Optional[float] = None  # unix times around the provider call
+    responseReceivedAt: Optional[float] = None
+
+QUOTE_FIELDS = list(QuoteRecord.__dataclass_fields__)
+
+def extract_quote_lifi(data: Dict) -> QuoteRecord:
     """Extract quote data from LiFi response"""
-    return {
-        'minAmount': df['estimate.toAmountMin'].iloc[0],
-        'Amount': df['estimate.toAmount'].iloc[0]
-    }
+    estimate = data['estimate']
+    return QuoteRecord(minAmount=int(estimate['toAmountMin']), Amount=int(estimate['toAmount']), gasUnits=gas_units(estimate.get('gasCosts')))
 
-def extract_quote_zerox(df: pd.DataFrame) -> Dict:
+def extract_quote_zerox(data: Dict) -> QuoteRecord:
     """Extract quote data from 0x response"""
-    return {
-        'minAmount': df['minBuyAmount'].iloc[0],
-        'Amount': df['buyAmount'].iloc[0]
-    }
+    gas = gas_units((data.get('transaction') or {}).get('gas'))
+    return QuoteRecord(minAmount=int(data['minBuyAmount']), Amount=int(data['buyAmount']), gasUnits=gas)
 
-def extract_quote_oneinch(df: pd.DataFrame) -> Dict:
+def extract_quote_oneinch(data: Dict) -> QuoteRecord:
     """Extract quote data from 1inch response"""
-    return {
-        'minAmount': None,
-        'Amount': df['dstAmount'].iloc[0]
-    }
+    return QuoteRecord(minAmount=None, Amount=int(data['dstAmount']), gasUnits=gas_units(data.get('gas')))
 
-def extract_quote_odos(df: pd.DataFrame) -> Dict:
+def extract_quote_odos(data: Dict) -> QuoteRecord:
     """Extract quote data from Odos response"""
-    return {
-        'minAmount': None,
-        'Amount': float(df['outAmounts'].iloc[0][0])
+    return QuoteRecord(minAmount=None, Amount=int(data['outAmounts'][0]), gasUnits=gas_units(data.get('gasEstimate')))
+
+EXTRACTORS = {
+    'lifi': extract_quote_lifi,
+    'zero_x': extract_quote_zerox,
+    '1inch': extract_quote_oneinch,
+    'odos': extract_quote_odos
+}
+
+def extract_quote_records(quote: Dict[str, Optional[Dict]], sellToken: str, buyToken: str, sellAmount: str,
+                          times: Optional[Dict[str, Tuple[float, float]]] = None) -> List[QuoteRecord]:
+    """Extract one QuoteRecord per provider that answered (`times`: protocol -> (request sent, response received))"""
+    records = []
+    
+    for protocol, data in quote.items():
+        if data is not None and protocol in EXTRACTORS:
+            record = EXTRACTORS[protocol](data)
+            record.protocol = protocol
+            record.sellToken = sellToken
+            record.buyToken = buyToken
+            record.sellAmount = float(sellAmount)
+            if times and protocol in times:
+                record.requestSentAt, record.responseReceivedAt = times[protocol]
+            records.append(record)
+
+    return records
+
+def extract_quote_data(quote: Dict[str, Optional[Dict]], sellToken: str, buyToken: str, sellAmount: str,
+                       times: Optional[Dict[str, Tuple[float, float]]] = None) -> "pd.DataFrame":
+    """Combine quote data from all sources into a single DataFrame"""
+    import pandas as pd
+
+    records = extract_quote_records(quote, sellToken, buyToken, sellAmount, times)
+    # Flat rows (asdict deep-copies every field)
+    return pd.DataFrame([[getattr(record, name) for name in QUOTE_FIELDS] for record in records], columns=QUOTE_FIELDS)
+
+class UpstreamError(Exception):
+    """The provider did not answer (429/5xx): unlike a missing quote, this says nothing about the route"""
+
+def quote_answer(response) -> Optional[Dict]:
+    """JSON of a 200 answer, None when the provider has no quote for the trade (other 4xx); raises UpstreamError on 429/5xx"""
+    if response.status_code == 200:
+        return response.json()
+    if response.status_code == 429 or response.status_code >= 500:
+        raise UpstreamError(f"HTTP {response.status_code}")
+    return None
+
+def get_odos_quote(chain_id: int, sellToken: str, buyToken: str, amount: str, gas_price_gwei: Optional[float] = None) -> Optional[Dict]:
+    """Get quote from Odos (routed for `gas_price_gwei`, by default the chain's shared gas price)"""
+    if gas_price_gwei is None:
+        gas_price = gas_prices.get(chain_id)
+        gas_price_gwei = gas_price.gwei if gas_price is not None else None
+    odos_data = {
+        "chainId": chain_id,
+        "compact": True,
+        "inputTokens": [{"amount": amount, "tokenAddress": sellToken}],
+        "outputTokens": [{"proportion": 1, "tokenAddress": buyToken}],
+        "referralCode": 0,
+        "slippageLimitPercent": 0.3,
+        "sourceBlacklist": [],
+        "sourceWhitelist": [],
+        "userAddr": "0xb29601eB52a052042FB6c68C69a442BD0AE90082"
     }
+    if gas_price_gwei is not None:
+        # Without it Odos uses its own current estimate
+        odos_data["gasPrice"] = gas_price_gwei
 
-def extract_quote_data(quote: Dict[str, pd.DataFrame], sellToken: str, buyToken: str, sellAmount: str) -> pd.DataFrame:
-    """Combine quote data from all sources into a single DataFrame"""
-    extracted_data = []
-    
-    extractors = {
-        'lifi': extract_quote_lifi,
-        'zero_x': extract_quote_zerox,
-        '1inch': extract_quote_oneinch,
-        'odos': extract_quote_odos
+    response = quotes_http.post(ODOS_URL, headers={"Content-Type": "application/json"}, json=odos_data)
+    return quote_answer(response)
+
+def get_zerox_quote(chain_id: int, sellToken: str, buyToken: str, amount: str) -> Optional[Dict]:
+    """Get quote from 0x"""
+    params = {
+        "chainId": chain_id,
+        "sellToken": sellToken,
+        "buyToken": buyToken,
+        "sellAmount": float(amount),
+        'taker': DEFAULT_TAKER_ADDRESS
     }
     
-    for protocol, df in quote.items():
-        if df is not None and protocol in extractors:
-            extracted = extractors[protocol](df)
-            extracted.update({
-                'protocol': protocol,
-                'sellToken': sellToken,
-                'buyToken': buyToken,
-                'sellAmount': float(sellAmount)
-            })
-            extracted_data.append(extracted)
-
-    return pd.DataFrame(extracted_data)
-
-def get_odos_quote(chain_id: int, sellToken: str, buyToken: str, amount: str) -> Optional[pd.DataFrame]:
-    """Get quote from Odos"""
-    try:
-        odos_data = {
-            "chainId": chain_id,
-            "compact": True,
-            "gasPrice": 20,
-            "inputTokens": [{"amount": amount, "tokenAddress": sellToken}],
-            "outputTokens": [{"proportion": 1, "tokenAddress": buyToken}],
-            "referralCode": 0,
-            "slippageLimitPercent": 0.3,
-            "sourceBlacklist": [],
-            "sourceWhitelist": [],
-            "userAddr": "0xb29601eB52a052042FB6c68C69a442BD0AE90082"
-        }
-        
-        response = requests.post(ODOS_URL, headers={"Content-Type": "application/json"}, json=odos_data)
-        return pd.json_normalize(response.json()) if response.status_code == 200 else None
-    except Exception as e:
-        print(f"Odos error: {str(e)}")
-        return None
-
-def get_zerox_quote(chain_id: int, sellToken: str, buyToken: str, amount: str) -> Optional[pd.DataFrame]:
-    """Get quote from 0x"""
-    try:
-        params = {
-            "chainId": chain_id,
-            "sellToken": sellToken,
-            "buyToken": buyToken,
-            "sellAmount": float(amount),
-            'taker': DEFAULT_TAKER_ADDRESS
-        }
-        
-        response = requests.get(
-            ZERO_X_URL,
-            headers={"0x-api-key": ZERO_X_API_KEY, "0x-version": "v2"},
-            params=params
-        )
-        return pd.json_normalize(response.json()) if response.status_code == 200 else None
-    except Exception as e:
-        print(f"0x error: {str(e)}")
-        return None
-
-def get_lifi_quote(chain_id: int, sellToken: str, buyToken: str, amount: str) -> Optional[pd.DataFrame]:
+    response = quotes_http.get(
+        ZERO_X_URL,
+        headers={"0x-api-key": ZERO_X_API_KEY, "0x-version": "v2"},
+        params=params
+    )
+    return quote_answer(response)
+
+def get_lifi_quote(chain_id: int, sellToken: str, buyToken: str, amount: str) -> Optional[Dict]:
     """Get quote from Li.Fi"""
-    try:
-        params = {
-            "fromChain": chain_id,
-            "toChain": chain_id,
-            "fromToken": sellToken,
-            "toToken": buyToken,
-            "fromAddress": DEFAULT_USER_ADDRESS,
-            "fromAmount": amount
-        }
-        
-        response = requests.get(LIFI_URL, headers={"accept": "application/json"}, params=params)
-        return pd.json_normalize(response.json()) if response.status_code == 200 else None
-    except Exception as e:
-        print(f"Li.Fi error: {str(e)}")
-        return None
-
-def get_oneinch_quote(chain_id: int, sellToken: str, buyToken: str, amount: str) -> Optional[pd.DataFrame]:
+    params = {
+        "fromChain": chain_id,
+        "toChain": chain_id,
+        "fromToken": sellToken,
+        "toToken": buyToken,
+        "fromAddress": DEFAULT_USER_ADDRESS,
+        "fromAmount": amount
+    }
+    
+    response = quotes_http.get(LIFI_URL, headers={"accept": "application/json"}, params=params)
+    return quote_answer(response)
+
+def get_oneinch_quote(chain_id: int, sellToken: str, buyToken: str, amount: str) -> Optional[Dict]:
     """Get quote from 1inch"""
-    try:
-        params = {
-            "src": sellToken,
-            "dst": buyToken,
-            "amount": amount,
-            "fee": 0
-        }
-        
-        response = requests.get(
-            f"{INCH_URL}/{chain_id}/quote",
-            headers={
-                "Authorization": f"Bearer {INCH_API_KEY}",
-                "accept": "application/json",
-                "content-type": "application/json"
-            },
-            params=params
-        )
-        return pd.json_normalize(response.json()) if response.status_code == 200 else None
-    except Exception as e:
-        print(f"1inch error: {str(e)}")
-        return None
+    params = {
+        "src": sellToken,
+        "dst": buyToken,
+        "amount": amount,
+        "fee": 0,
+        "includeGas": "true"
+    }
+    
+    response = quotes_http.get(
+        f"{INCH_URL}/{chain_id}/quote",
+        headers={
+            "Authorization": f"Bearer {INCH_API_KEY}",
+            "accept": "application/json",
+            "content-type": "application/json"
+        },
+        params=params
+    )
+    return quote_answer(response)
+
+# Each returns the provider's answer, or None when it has no quote for the trade; failed calls raise
+PROVIDERS = {
+    'odos': get_odos_quote,
+    'zero_x': get_zerox_quote,
+    'lifi': get_lifi_quote,
+    '1inch': get_oneinch_quote
+}
 
 def get_unified_quotes(
     chain_id: int,
     sellToken: str,
     buyToken: str,
     amount: str
-) -> pd.DataFrame:
-    """Get quotes from all aggregators and combine them"""
-    quotes = {
-        'odos': get_odos_quote(chain_id, sellToken, buyToken, amount),
-        'zero_x': get_zerox_quote(chain_id, sellToken, buyToken, amount),
-        'lifi': get_lifi_quote(chain_id, sellToken, buyToken, amount),
-        '1inch': get_oneinch_quote(chain_id, sellToken, buyToken, amount)
-    }
-    
-    return extract_quote_data(quotes, sellToken, buyToken, amount)
-
-def get_unified_quotes_for_routes(amounts: list, networks: list) -> None:
-    """Get quotes for multiple amounts across multiple networks"""
-    from config import NETWORK_CONFIG
-    
-    for network in networks:
-        if network not in NETWORK_CONFIG:
-            print(f"Skipping unknown network: {network}")
-            continue
-
-        time.sleep(0.3)
-            
-        network_data = NETWORK_CONFIG[network]
-        chain_id = network_data['chain_id']
-        usdc_address = network_data['USDC']
-        weth_address = network_data['WETH']
-        
-        for amount in amounts:
-            # Adjust amount based on USDC decimals (6)
-            adjusted_amount = str(int(amount * (10 ** 6)))
-            
-            df = get_unified_quotes(
-                chain_id,
-                usdc_address,
-                weth_address,
-                adjusted_amount
-            )
-            
-            print(f"\nQuotes for {network} for amount ${amount}:")
-            print(df)
-            print("\n" + "="*50)
+) -> "pd.DataFrame":
+    """Get quotes from all aggregators at the same moment and combine them"""
+    def timed(get_quote):
+        sent = time.time()
+        try:
+            data = get_quote(chain_id, sellToken, buyToken, amount)
+        except CircuitOpen:
+            data = None
+        except Exception as e:
+            print(f"{get_quote.__name__} error: {str(e)}")
+            data = None
+        return data, (sent, time.time())
+
+    # All the requests leave together, so the quotes compare the same market
+    with ThreadPoolExecutor(max_workers=len(PROVIDERS)) as executor:
+        futures = {protocol: executor.submit(timed, get_quote) for protocol, get_quote in PROVIDERS.items()}
+        results = {protocol: future.result() for protocol, future in futures.items()}
+
+    quotes = {protocol: data for protocol, (data, _) in results.items()}
+    times = {protocol: call_times for protocol, (_, call_times) in results.items()}
+    return extract_quote_data(quotes, sellToken, buyToken, amount, times)
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import quote_agg_asgi
+from quotes_cache import QuoteCache, SharedCache
+
+
+def call_app(path, query=b""):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "path": path, "method": "GET", "query_string": query}
+    asyncio.run(quote_agg_asgi.app(scope, receive, send))
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+def test_get_quote_fans_out_on_the_loop_and_shares_the_result(monkeypatch, tmp_path):
+    calls = []
+
+    def fast():
+        calls.append("Fast")
+        return {"project": "Fast", "expectedAmount": 1.0}
+
+    monkeypatch.setattr(quote_agg_asgi, "provider_calls", lambda *args: ({"Fast": (fast, ()), "Empty": (dict, ())}, 1))
+    monkeypatch.setattr(quote_agg_asgi, "shared_cache", SharedCache(str(tmp_path / "shared.sqlite")))
+    monkeypatch.setattr(quote_agg_asgi, "quote_cache", QuoteCache(name="quote_local"))
+    query = b"origin_chain=Mainnet&destination_chain=Mainnet&origin_token=USDC&destination_token=WETH&amount=100"
+
+    status, body = call_app("/get_quote", query)
+    assert status == 200
+    assert body == {"status": "success", "quotedAmount": 100, "quotes": [{"project": "Fast", "expectedAmount": 1.0}, {"project": "Empty", "status": "no_quote"}]}
+
+    # Another worker: empty local cache, same SQLite file
+    monkeypatch.setattr(quote_agg_asgi, "quote_cache", QuoteCache(name="quote_local"))
+    assert call_app("/get_quote", query) == (200, body)
+    assert calls == ["Fast"]
+
+    assert call_app("/get_quote", b"origin_chain=Mainnet")[0] == 400
+
+
+def test_waiters_get_an_error_when_the_leading_quote_is_cancelled(monkeypatch, tmp_path):
+    async def slow_quote(*args):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(quote_agg_asgi, "quote", slow_quote)
+    monkeypatch.setattr(quote_agg_asgi, "shared_cache", SharedCache(str(tmp_path / "shared.sqlite")))
+    monkeypatch.setattr(quote_agg_asgi, "quote_cache", QuoteCache(name="quote_local"))
+    args = ("Mainnet", "Mainnet", "USDC", "WETH", 100)
+
+    async def main():
+        leader = asyncio.ensure_future(quote_agg_asgi.cached_quote(*args))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(quote_agg_asgi.cached_quote(*args))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await asyncio.wait_for(asyncio.gather(leader, follower, return_exceptions=True), 1)
+
+    leader, follower = asyncio.run(main())
+    assert isinstance(leader, asyncio.CancelledError)
+    assert isinstance(follower, RuntimeError)
+    assert quote_agg_asgi._in_flight == {}
+
+
+def test_shared_token_reads_known_tokens_from_memory(monkeypatch, tmp_path):
+    class Unreadable:
+        def get(self, key):
+            raise AssertionError("SQLite read for a token already in memory")
+
+    monkeypatch.setattr(quote_agg_asgi, "shared_cache", Unreadable())
+    usdc = quote_agg_asgi.shared_token(1, "usdc")
+    assert usdc is quote_agg_asgi.metadata_index.known(1, "USDC")
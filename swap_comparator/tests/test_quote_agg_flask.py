@@ -0,0 +1,265 @@
+import json
+import os
+import time
+
+import quote_agg_flask
+from quotes_metadata import TokenMeta
+
+
+def test_fan_out_marks_late_providers_as_timed_out(monkeypatch):
+    monkeypatch.setitem(quote_agg_flask.PROVIDER_TIMEOUTS, "Slow", 0.2)
+
+    def fast():
+        return {"project": "Fast", "expectedAmount": 1.0}
+
+    def slow():
+        time.sleep(1)
+        return {"project": "Slow", "expectedAmount": 2.0}
+
+    def empty():
+        return {}
+
+    start = time.monotonic()
+    quotes = quote_agg_flask.fan_out({"Fast": (fast, ()), "Slow": (slow, ()), "Empty": (empty, ())})
+
+    assert time.monotonic() - start < 0.9
+    assert quotes == [
+        {"project": "Fast", "expectedAmount": 1.0},
+        {"project": "Slow", "status": "timed_out"},
+        {"project": "Empty", "status": "no_quote"},
+    ]
+
+
+def test_fan_out_reports_provider_errors():
+    def broken():
+        raise KeyError("routes")
+
+    quotes = quote_agg_flask.fan_out({"Bungee": (broken, ())})
+
+    assert quotes[0]["project"] == "Bungee"
+    assert quotes[0]["status"] == "error"
+
+
+def test_get_quote_stream_sends_quotes_in_arrival_order(monkeypatch):
+    def slow():
+        time.sleep(0.2)
+        return {"project": "Slow", "expectedAmount": 2.0}
+
+    def fast():
+        return {"project": "Fast", "expectedAmount": 1.0}
+
+    monkeypatch.setattr(quote_agg_flask, "provider_calls", lambda *args: ({"Slow": (slow, ()), "Fast": (fast, ())}, 1))
+    quote_agg_flask.quote_cache.clear()
+
+    response = quote_agg_flask.app.test_client().get(
+        "/get_quote/stream?origin_chain=Mainnet&destination_chain=Mainnet&origin_token=USDC&destination_token=WETH&amount=100")
+    events = [chunk.split("\n")[0] for chunk in response.get_data(as_text=True).strip().split("\n\n")]
+
+    assert response.mimetype == "text/event-stream"
+    assert events == ["event: quote", "event: quote", "event: summary"]
+    assert '"Fast"' in response.get_data(as_text=True).split("\n\n")[0]
+
+
+def test_batch_quotes_deduplicates_items_and_provider_calls(monkeypatch):
+    sent = []
+
+    def provider(amount):
+        sent.append(amount)
+        return {"project": "P", "expectedAmount": amount}
+
+    def provider_calls(origin_chain, destination_chain, origin_token, destination_token, amount, resolve=None):
+        # Same upstream call for both directions of the pair
+        return {"P": (provider, (amount,))}, 1
+
+    monkeypatch.setattr(quote_agg_flask, "provider_calls", provider_calls)
+    monkeypatch.setattr(quote_agg_flask.metadata_index, "token", lambda chain_id, symbol: None)
+    monkeypatch.setattr(quote_agg_flask.metadata_index, "maybe_refresh", lambda: None)
+    quote_agg_flask.quote_cache.clear()
+
+    results = quote_agg_flask.batch_quotes([
+        {"origin_chain": "Mainnet", "destination_chain": "Mainnet", "origin_token": "USDC", "destination_token": "WETH", "amount": 100},
+        {"origin_chain": "mainnet", "destination_chain": "Mainnet", "origin_token": "usdc", "destination_token": "ETH", "amount": 100.01},
+        {"origin_chain": "Mainnet", "destination_chain": "Mainnet", "origin_token": "WETH", "destination_token": "USDC", "amount": 100},
+        {"origin_chain": "Mainnet", "amount": 100},
+    ])
+
+    assert sent == [100]
+    assert [result["status"] for result in results] == ["success", "success", "success", "error"]
+    assert results[0]["quotes"] == [{"project": "P", "expectedAmount": 100}]
+    assert results[1]["quotedAmount"] == 100
+
+
+def test_get_quote_reports_the_bucketed_amount_it_quoted(monkeypatch):
+    sent = []
+
+    def provider(amount):
+        sent.append(amount)
+        return {"project": "P", "expectedAmount": 2 * amount}
+
+    monkeypatch.setattr(quote_agg_flask, "provider_calls", lambda *args: ({"P": (provider, (args[4],))}, 1))
+    quote_agg_flask.quote_cache.clear()
+
+    response = quote_agg_flask.app.test_client().get(
+        "/get_quote?origin_chain=Mainnet&destination_chain=Mainnet&origin_token=USDC&destination_token=WETH&amount=1234.5")
+
+    body = response.get_json()
+    assert sent == [1230]
+    assert body["quotedAmount"] == 1230
+    assert body["quotes"] == [{"project": "P", "expectedAmount": 2460}]
+
+
+def test_get_quote_reports_stage_timings_and_saves_sampled_profiles(monkeypatch, tmp_path):
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            return {"outAmounts": ["1000"]}
+
+    def odos():
+        response = yield quote_agg_flask.quotes_http.Call("POST", "https://api.odos.xyz/sor/quote/v2")
+        return {"project": "Odos", "expectedAmount": float(response.json()["outAmounts"][0])}
+
+    monkeypatch.setattr(quote_agg_flask.quotes_http, "request", lambda method, url, **kwargs: FakeResponse())
+    monkeypatch.setattr(quote_agg_flask, "provider_calls", lambda *args: ({"Odos": (odos, ())}, 1))
+    monkeypatch.setattr(quote_agg_flask, "PROFILE_PATH", str(tmp_path))
+    quote_agg_flask.quote_cache.clear()
+
+    response = quote_agg_flask.app.test_client().get(
+        "/get_quote?origin_chain=Mainnet&destination_chain=Mainnet&origin_token=USDC&destination_token=WETH&amount=100&timing=1",
+        headers={"X-Profile": "1"})
+
+    names = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert {"odos-http", "odos-parse", "fanout", "total"} <= set(names)
+    assert [span["name"] for span in response.get_json()["timing"]] == names[:-1]
+    assert list(tmp_path.glob("*.prof")) and response.headers["X-Profile-Path"].startswith(str(tmp_path))
+
+
+def test_okx_error_body_is_one_failed_call_for_its_breaker(monkeypatch):
+    import quotes_http
+    from quotes_breaker import CircuitBreaker, OPEN
+
+    class Answer:
+        status_code = 200
+        headers = {}
+
+        def json(self):
+            return {"code": "50011", "msg": "Too Many Requests", "data": []}
+
+    breaker = CircuitBreaker("okx", min_calls=1, error_rate=0.5, cooldown=0.01)
+    breaker.allow()
+    breaker.record(False)
+    time.sleep(0.01)
+    monkeypatch.setattr(quotes_http.breakers, "breaker", lambda provider: breaker)
+    monkeypatch.setattr(quotes_http, "get_session", lambda url: type("Session", (), {"request": lambda self, *args, **kwargs: Answer()})())
+    records = []
+    record = breaker.record
+    monkeypatch.setattr(breaker, "record", lambda ok, latency=0.0: (records.append(ok), record(ok, latency)))
+
+    quote = quotes_http.run(quote_agg_flask.okx_quote(1, 42161, "0xa", "0xb", 10 ** 6, "1", "1", "p", "a", "s", "x"))
+
+    assert quote == {}
+    assert records == [False]
+    assert breaker.state == OPEN
+
+
+def test_chain_spellings_share_one_cache_key_and_the_same_chain_providers(monkeypatch):
+    class Prices:
+        version = 1
+
+        def price(self, address):
+            return 1.0
+
+    token = TokenMeta(chain_id=42161, symbol="WETH", address="0xweth", decimals=18)
+    monkeypatch.setattr(quote_agg_flask.metadata_index, "maybe_refresh", lambda: None)
+    monkeypatch.setattr(quote_agg_flask.price_feed, "snapshot", lambda chain_id: Prices())
+    monkeypatch.setattr(quote_agg_flask.price_feed, "track", lambda chain_id, addresses: None)
+    monkeypatch.setattr(quote_agg_flask.gas_prices, "get", lambda chain_id: None)
+
+    spellings = [("Arbitrum", "Arbitrum", "ETH", "usdc"), ("arbitrum ", "Arbitrum", "WETH", "USDC"), ("Arbitrum", "ARBITRUM", "weth", " USDC")]
+    assert len({quote_agg_flask.request_key(*spelling, 1000) for spelling in spellings}) == 1
+    for spelling in spellings:
+        calls, origin_chain = quote_agg_flask.provider_calls(*spelling, 1, resolve=lambda chain_id, symbol: token)
+        assert origin_chain == 42161
+        assert set(calls) == {"Jumper", "Relay", "Odos", "0x", "1inch"}
+
+
+def test_batch_quotes_runs_the_real_provider_calls(monkeypatch):
+    from quotes_prices import PriceSnapshot
+
+    with open(os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fixtures", "odos.json")) as f:
+        odos_answer = json.load(f)
+    sent = []
+
+    class Answer:
+        def __init__(self, status_code, payload=None):
+            self.status_code, self.payload, self.headers = status_code, payload, {}
+
+        def json(self):
+            return self.payload
+
+    def request(method, url, **kwargs):
+        if "odos" not in url:
+            return Answer(404)
+        sent.append(kwargs["json"]["inputTokens"][0]["amount"])
+        return Answer(200, odos_answer)
+
+    tokens = {"USDC": TokenMeta(1, "USDC", "0xusdc", 6), "WETH": TokenMeta(1, "WETH", "0xweth", 18)}
+    prices = PriceSnapshot(1, 7, time.time(), {"0xusdc": 1.0, "0xweth": 2000.0})
+    monkeypatch.setattr(quote_agg_flask.quotes_http, "request", request)
+    monkeypatch.setattr(quote_agg_flask.metadata_index, "token", lambda chain_id, symbol: tokens.get(symbol))
+    monkeypatch.setattr(quote_agg_flask.metadata_index, "maybe_refresh", lambda: None)
+    monkeypatch.setattr(quote_agg_flask.price_feed, "snapshot", lambda chain_id: prices)
+    monkeypatch.setattr(quote_agg_flask.price_feed, "track", lambda chain_id, addresses: None)
+    monkeypatch.setattr(quote_agg_flask.gas_prices, "get", lambda chain_id: None)
+    quote_agg_flask.quote_cache.clear()
+
+    response = quote_agg_flask.app.test_client().post("/get_quotes", json={"items": [
+        {"origin_chain": "Mainnet", "destination_chain": "Mainnet", "origin_token": "USDC", "destination_token": "WETH", "amount": 10},
+        {"origin_chain": "mainnet", "destination_chain": "Mainnet", "origin_token": "usdc", "destination_token": "ETH", "amount": 10},
+        {"origin_chain": "Mainnet", "destination_chain": "Mainnet", "origin_token": "USDC", "destination_token": "WETH", "amount": 20},
+    ]})
+
+    assert response.status_code == 200
+    results = [response.get_json()["results"][str(i)] for i in range(3)]
+    assert [result["status"] for result in results] == ["success"] * 3
+    assert sorted(sent) == ["10000000", "20000000"]
+    odos = next(quote for quote in results[0]["quotes"] if quote.get("project") == "Odos")
+    assert odos["expectedAmount"] > 0 and odos["priceVersion"] == 7
+
+
+def test_queued_calls_get_their_timeout_from_when_they_start(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setattr(quote_agg_flask, "executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setitem(quote_agg_flask.PROVIDER_TIMEOUTS, "First", 0.5)
+    monkeypatch.setitem(quote_agg_flask.PROVIDER_TIMEOUTS, "Second", 0.5)
+
+    def slowish(project):
+        time.sleep(0.3)
+        return {"project": project, "expectedAmount": 1.0}
+
+    # The second call waits 0.3 s for the only worker, then answers in 0.3 s: within its own 0.5 s
+    quotes = quote_agg_flask.fan_out({"First": (slowish, ("First",)), "Second": (slowish, ("Second",))}, deadline=2)
+
+    assert [quote.get("status") for quote in quotes] == [None, None]
+
+
+def test_bridge_parsers_keep_the_gas_cost_the_provider_gives():
+    from quotes_gas import GasPrice
+
+    fixtures = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fixtures")
+    with open(os.path.join(fixtures, "relay.json")) as f:
+        relay = json.load(f)
+    with open(os.path.join(fixtures, "bungee.json")) as f:
+        bungee = json.load(f)
+
+    assert quote_agg_flask.parse_relay_quote(relay)["gasCostUSD"] == 1.2
+    assert quote_agg_flask.parse_bungee_quote(bungee, 10 ** 9, "1", "3200")["gasCostUSD"] == 3.1
+
+    def bridge():
+        return quote_agg_flask.parse_relay_quote(relay)
+        yield
+
+    # Without gas units there is no cost of our own: the provider's stays
+    quote = quote_agg_flask.quotes_http.run(quote_agg_flask.stamp_quote((), GasPrice(1, 10 ** 10, 0.0), None, bridge))
+    assert quote["gasCostUSD"] == 1.2 and quote["gasPriceGwei"] == 10 and quote["gasUnits"] is None
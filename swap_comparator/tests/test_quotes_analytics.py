@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+import quotes_analytics
+
+DAY = 1700006400  # 2023-11-15 00:00 UTC
+
+
+def _rows(timestamp, amount_in, outputs, gas=None):
+    gas = gas or {}
+    return [
+        {"timestamp": timestamp, "platform": platform, "chainId": 1, "fromToken": "WETH", "toToken": "USDC", "amountIn": amount_in,
+         "amountOut": amount_out, "status": "ok" if amount_out else "no_quote",
+         "amountOutUSD": amount_out, "gasCostUSD": gas.get(platform)}
+        for platform, amount_out in outputs.items()
+    ]
+
+
+def test_quotes_are_scored_against_their_snapshot():
+    df = pd.DataFrame(_rows(DAY, 1.0, {"odos": 3000.0, "lifi": 2997.0, "1inch": 3000.0, "zero_x": None},
+                            gas={"odos": 6.0, "lifi": 1.0, "1inch": 5.0}))
+
+    scored = quotes_analytics.score_quotes(df).set_index("platform")
+
+    # The row without a quote is not scored
+    assert sorted(scored.index) == ["1inch", "lifi", "odos"]
+    assert scored["bps_vs_best"].to_dict() == pytest.approx({"odos": 0.0, "lifi": -10.0, "1inch": 0.0})
+    assert scored["rank"].to_dict() == {"odos": 1, "lifi": 3, "1inch": 1}
+    assert scored["win"].to_dict() == {"odos": True, "lifi": False, "1inch": True}
+    # Net of gas lifi wins: 2996 vs 2995 (1inch) and 2994 (odos)
+    assert scored["gas_adjusted_bps"].to_dict() == pytest.approx(
+        {"odos": (2994 / 2996 - 1) * 1e4, "lifi": 0.0, "1inch": (2995 / 2996 - 1) * 1e4})
+
+
+def test_competitiveness_per_size_bucket_and_window():
+    df = pd.DataFrame(
+        _rows(DAY, 1.0, {"odos": 3000.0, "lifi": 2997.0})
+        + _rows(DAY + 3600, 2.0, {"odos": 5990.0, "lifi": 6000.0})
+        + _rows(DAY + 7200, 1000.0, {"odos": 2.9e6, "lifi": 2.97e6})
+        + _rows(DAY + 86400, 1.0, {"odos": 3000.0, "lifi": None})
+    )
+
+    result = quotes_analytics.competitiveness(df).set_index(["platform", "size_bucket", "window"])
+
+    odos = result.loc[("odos", 1.0, pd.Timestamp("2023-11-15"))]
+    assert odos["quotes"] == 2 and odos["win_rate"] == 0.5 and odos["mean_rank"] == 1.5
+    assert odos["mean_bps_vs_best"] == pytest.approx((-10 / 6000 * 1e4) / 2)
+    # 1000 is its own bucket, not the one below
+    assert result.loc[("lifi", 1000.0, pd.Timestamp("2023-11-15")), "win_rate"] == 1.0
+    assert result.loc[("odos", 1.0, pd.Timestamp("2023-11-16")), "win_rate"] == 1.0
+
+    ranks = quotes_analytics.rank_distribution(df, by=["platform"]).set_index("platform")
+    assert ranks.loc["odos", 1] == 0.5 and ranks.loc["lifi", 2] == pytest.approx(1 / 3)
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("zstandard")
+pytest.importorskip("pyarrow")
+
+import quotes_archive
+import quotes_prices
+from quotes_config import NATIVE_TOKEN_ADDRESS
+from quotes_store import read_history
+from quotes_sweep import build_work_units, empty_row
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def test_archive_lookup_and_parallel_replay(tmp_path, monkeypatch):
+    units = [u for u in build_work_units(["Mainnet"], ["odos"]) if (u.fromToken, u.toToken) == ("WETH", "USDC")]
+    log_path = tmp_path / "prices"
+    tokens = [{"address": units[0].address("WETH"), "priceUSD": "3000"}, {"address": units[0].address("USDC"), "priceUSD": "1"},
+              {"address": NATIVE_TOKEN_ADDRESS, "priceUSD": "3000"}]
+    monkeypatch.setattr(quotes_prices.quotes_http, "get", lambda url, **kwargs: FakeResponse({"tokens": {"1": tokens}}))
+    version = quotes_prices.PriceFeed(log_path=str(log_path)).refresh(1).version
+
+    kept = []
+    sink = quotes_archive.ArchiveSink(kept.append, quotes_archive.ArchiveWriter(str(tmp_path / "archive")))
+    for unit in units:
+        row = empty_row(unit, 3600)
+        row.update({"status": "ok", "priceVersion": version, "gasPriceGwei": 10.0,
+                    "response": {"outAmounts": [str(int(unit.amount * 3000 * 10 ** 6))], "gasEstimate": 150000}})
+        sink(row)
+    sink.close()
+
+    assert all("response" not in row for row in kept)
+    row, response = quotes_archive.lookup(3600, "odos", 1, "WETH", "USDC", 1.0, root=str(tmp_path / "archive"))
+    assert row["amountIn"] == 1.0 and response["outAmounts"] == ["3000000000"]
+
+    rows = quotes_archive.replay(str(tmp_path / "archive"), str(tmp_path / "store"), processes=2, log_path=str(log_path))
+
+    table = read_history(str(tmp_path / "store")).to_pandas().sort_values("amountIn")
+    assert rows == len(table) == len(units)
+    assert table["amountOut"].tolist() == [unit.amount * 3000 for unit in units]
+    assert table["amountOutUSD"].tolist() == pytest.approx([unit.amount * 3000 for unit in units])
+    assert table["gasCostUSD"].tolist() == pytest.approx([150000 * 10e9 / 1e18 * 3000] * len(units))
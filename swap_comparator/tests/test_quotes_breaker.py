@@ -0,0 +1,32 @@
+import time
+
+from quotes_breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+
+
+def test_breaker_opens_on_error_rate_then_probes_and_closes():
+    breaker = CircuitBreaker("odos", window=60, min_calls=4, error_rate=0.5, slow_call=1, cooldown=0.1, probes=1)
+
+    for ok, latency in [(True, 0.1), (False, 0.1), (True, 0.1), (True, 2.0)]:
+        assert breaker.allow()
+        breaker.record(ok, latency)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert not breaker.available()
+
+    time.sleep(0.1)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # single probe in flight
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = CircuitBreaker("okx", min_calls=1, error_rate=0.5, cooldown=0.05)
+    breaker.allow()
+    breaker.record(False)
+    time.sleep(0.05)
+
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
@@ -0,0 +1,60 @@
+import sqlite3
+import threading
+import time
+
+from quotes_cache import QuoteCache, SharedCache, bucket_amount, quote_key
+
+
+def test_amount_bucketing_and_key_normalization():
+    assert bucket_amount(1234.5) == 1230
+    assert bucket_amount(0.012345) == 0.0123
+    assert quote_key(42161, 42161, "eth", "USDC ", 1000.2) == quote_key(42161, 42161, "WETH", "usdc", 1000)
+
+
+def test_ttl_and_lru_eviction():
+    cache = QuoteCache(ttl=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get_or_compute("a", lambda: -1) == 1
+    cache.set("c", 3)
+
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+    assert cache.counters["hit"] == 1
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = QuoteCache(ttl=60, max_size=10)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return ["quote"]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [["quote"]] * 5
+    assert cache.counters["coalesced"] == 4
+
+
+def test_shared_cache_gives_up_quickly_on_a_locked_file(tmp_path):
+    path = str(tmp_path / "shared.sqlite")
+    cache = SharedCache(path, busy_timeout=0.05)
+    cache.set("key", [1])
+    locker = sqlite3.connect(path, isolation_level=None)
+    locker.execute("BEGIN EXCLUSIVE")
+
+    # WAL readers don't wait on the writer; a blocked write is dropped after busy_timeout
+    start = time.monotonic()
+    assert cache.get("key") == [1]
+    cache.set("other", [2])
+    assert time.monotonic() - start < 1
+
+    locker.execute("ROLLBACK")
+    assert cache.get("other") is None
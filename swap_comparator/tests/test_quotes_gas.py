@@ -0,0 +1,43 @@
+import quotes_gas
+from quotes_gas import GasPrice, GasPrices, gas_cost, gas_units
+from quotes_prices import PriceSnapshot
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def test_one_gas_price_call_per_chain_per_snapshot(monkeypatch):
+    calls = []
+
+    def post(url, **kwargs):
+        calls.append(url)
+        return FakeResponse({"jsonrpc": "2.0", "id": 1, "result": hex(20 * 10 ** 9 + len(calls))})
+
+    monkeypatch.setattr(quotes_gas.quotes_http, "post", post)
+    gas = GasPrices(ttl=0, rpc_urls={1: "https://rpc.example"})
+
+    first = [gas.get(1, snapshot=3600) for _ in range(5)]
+    later = gas.get(1, snapshot=7200)
+
+    assert len(calls) == 2
+    assert all(price is first[0] for price in first) and later.wei == first[0].wei + 1
+    assert gas.get(10, snapshot=3600) is None
+
+
+def test_gas_cost_in_native_token_and_usd():
+    prices = PriceSnapshot(1, 1, 0.0, {quotes_gas.NATIVE_TOKEN_ADDRESS: 2000.0})
+
+    costs = gas_cost(gas_units([{"estimate": "100000"}, {"estimate": "50000"}]), GasPrice(1, 10 * 10 ** 9, 0.0), prices)
+
+    assert costs["gasUnits"] == 150000
+    assert costs["gasPriceGwei"] == 10.0
+    assert costs["gasCostNative"] == 150000 * 10e9 / 1e18
+    assert costs["gasCostUSD"] == costs["gasCostNative"] * 2000.0
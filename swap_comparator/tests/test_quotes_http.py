@@ -0,0 +1,15 @@
+import quotes_http
+
+
+def test_sessions_are_shared_per_host():
+    odos = quotes_http.get_session("https://api.odos.xyz/sor/quote/v2")
+
+    assert quotes_http.get_session("https://api.odos.xyz/sor/assemble") is odos
+    assert quotes_http.get_session("https://api.0x.org/swap/permit2/quote") is not odos
+
+
+def test_upstream_url_overrides_the_provider_host(monkeypatch):
+    monkeypatch.setitem(quotes_http.UPSTREAM_URLS, "odos", "http://127.0.0.1:8700/odos/")
+
+    assert quotes_http.upstream_url("https://api.odos.xyz/sor/quote/v2?x=1") == "http://127.0.0.1:8700/odos/sor/quote/v2?x=1"
+    assert quotes_http.upstream_url("https://api.0x.org/swap/permit2/quote") == "https://api.0x.org/swap/permit2/quote"
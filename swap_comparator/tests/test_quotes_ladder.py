@@ -0,0 +1,84 @@
+import asyncio
+
+import quotes_ladder
+import quotes_sweep
+import quotes_utils
+from quotes_utils import QuoteRecord
+
+
+def test_isotonic_pools_violators():
+    assert quotes_ladder.isotonic([0, 5, 3, 10]) == [0, 4, 4, 10]
+
+
+def test_adaptive_sweep_prunes_and_interpolates(monkeypatch):
+    def odos(chain_id, sellToken, buyToken, amount):
+        weth = int(amount) / 1e18
+        if weth > 500:
+            return None  # no route
+        # 3000 USDC per WETH, ~1 bps of impact per WETH
+        return {"amount": int(weth * 3000 * (1 - weth / 1e4) * 1e6)}
+
+    monkeypatch.setattr(quotes_sweep, "current_prices", lambda chain_id: None)
+    monkeypatch.setattr(quotes_sweep.gas_prices, "get", lambda chain_id, snapshot=None: None)
+    monkeypatch.setitem(quotes_sweep.PROVIDERS, "odos", odos)
+    monkeypatch.setitem(quotes_sweep.EXTRACTORS, "odos", lambda data: QuoteRecord(minAmount=None, Amount=data["amount"]))
+    units = [u for u in quotes_sweep.build_work_units(["Mainnet"], ["odos"]) if (u.fromToken, u.toToken) == ("WETH", "USDC")]
+    rows = []
+
+    produced = asyncio.run(quotes_ladder.run_adaptive_sweep(units, rows.append, timestamp=3600, tolerance=100, max_impact=50))
+
+    by_amount = {row["amountIn"]: row for row in rows}
+    assert produced == len(rows) == len(units)
+    assert [by_amount[a]["status"] for a in (0.01, 0.1, 1, 10, 100, 1000, 10000)] == \
+        ["ok", "interpolated", "ok", "interpolated", "ok", "pruned", "pruned"]
+    interpolated = by_amount[10]
+    assert abs(interpolated["priceImpactBps"] - 10) < interpolated["impactErrorBps"]
+
+
+def test_failed_calls_do_not_prune_the_ladder():
+    units = [u for u in quotes_sweep.build_work_units(["Mainnet"], ["odos"]) if (u.fromToken, u.toToken) == ("WETH", "USDC")]
+    ladder = quotes_ladder.Ladder(units, max_impact=50)
+
+    def row(amount, status, amountOut=None):
+        unit = next(unit for unit in units if unit.amount == amount)
+        return dict(quotes_sweep.empty_row(unit, 3600), status=status, amountOut=amountOut)
+
+    ladder.record(row(0.01, "ok", 30.0))
+    ladder.record(row(0.1, "error"))
+    ladder.record(row(1, "skipped"))
+    assert ladder.limit == len(units)
+    assert [unit.amount for unit in ladder.pending()] == [100]
+
+    ladder.record(row(1000, "no_quote"))
+    assert ladder.limit == 5
+
+
+def test_upstream_failures_are_errors_and_do_not_prune(monkeypatch):
+    class Answer:
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+        def json(self):
+            return {"amount": self.amount}
+
+    def odos(chain_id, sellToken, buyToken, amount):
+        weth = int(amount) / 1e18
+        # The smallest size hits a 500, the largest has no route (Odos answers 400)
+        answer = Answer(500 if weth < 0.05 else 400 if weth > 5000 else 200)
+        answer.amount = int(weth * 3000 * (1 - weth / 1e4) * 1e6)
+        return quotes_utils.quote_answer(answer)
+
+    monkeypatch.setattr(quotes_sweep, "current_prices", lambda chain_id: None)
+    monkeypatch.setattr(quotes_sweep.gas_prices, "get", lambda chain_id, snapshot=None: None)
+    monkeypatch.setitem(quotes_sweep.PROVIDERS, "odos", odos)
+    monkeypatch.setitem(quotes_sweep.EXTRACTORS, "odos", lambda data: QuoteRecord(minAmount=None, Amount=data["amount"]))
+    units = [u for u in quotes_sweep.build_work_units(["Mainnet"], ["odos"]) if (u.fromToken, u.toToken) == ("WETH", "USDC")]
+    rows = []
+
+    asyncio.run(quotes_ladder.run_adaptive_sweep(units, rows.append, timestamp=3600, tolerance=1000, max_impact=5000))
+
+    by_amount = {row["amountIn"]: row for row in rows}
+    assert [by_amount[a]["status"] for a in (0.01, 0.1, 1, 10, 100, 1000, 10000)] == \
+        ["error", "ok", "ok", "interpolated", "ok", "ok", "no_quote"]
+    # Impact is measured from the smallest size that was quoted, even when it answered last
+    assert by_amount[0.1]["priceImpactBps"] == 0 and by_amount[1]["priceImpactBps"] > 0
@@ -0,0 +1,29 @@
+from quotes_metadata import MetadataIndex, TokenMeta
+
+
+def test_static_tables_answer_without_network(tmp_path):
+    index = MetadataIndex(snapshot_path=str(tmp_path / "snapshot.json"))
+
+    assert index.chain_id("Arbitrum") == 42161
+    assert index.chain_id("Ethereum") == 1
+    assert index.chain_id("Unknown", 8453) == 8453
+    usdc = index.known(1, "usdc")
+    assert usdc.decimals == 6
+    assert index.known(1, usdc.address.upper()) is usdc
+    assert index.is_stale()
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    index = MetadataIndex(snapshot_path=path)
+    index.refreshed_at = 1700000000.0
+    index._add(TokenMeta(10, "OP", "0x4200000000000000000000000000000000000042", 18, "1.5"))
+    index.known(1, "WETH").priceUSD = "3000"
+    index.save_snapshot()
+
+    reloaded = MetadataIndex(snapshot_path=path, ttl=float("inf"))
+
+    assert reloaded.refreshed_at == 1700000000.0
+    assert not reloaded.is_stale()
+    assert reloaded.known(10, "OP").decimals == 18
+    assert reloaded.known(1, "WETH").priceUSD == "3000"
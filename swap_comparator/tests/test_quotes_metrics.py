@@ -0,0 +1,90 @@
+import time
+
+import requests
+
+import quote_agg_flask
+import quotes_http
+import quotes_metrics
+from quotes_breaker import Breakers
+from quotes_cache import QuoteCache
+
+
+def _series(text, name):
+    """{sample line without its value: value} of one metric"""
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+            if line.startswith(name) and not line.startswith("#")}
+
+
+def test_metrics_endpoint_reports_provider_latency_outcomes_and_parse_failures(monkeypatch):
+    monkeypatch.setitem(quote_agg_flask.PROVIDER_TIMEOUTS, "MetricsSlow", 0.2)
+
+    def fast():
+        return {"project": "MetricsFast", "expectedAmount": 1.0}
+
+    def slow():
+        time.sleep(0.5)
+
+    def unparsable():
+        raise KeyError("routes")
+
+    quote_agg_flask.fan_out({"MetricsFast": (fast, ()), "MetricsSlow": (slow, ()), "MetricsBroken": (unparsable, ())}, chain=1)
+
+    response = quote_agg_flask.app.test_client().get("/metrics")
+    assert response.status_code == 200 and response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+
+    latency = _series(text, "quotes_provider_latency_seconds")
+    assert latency['quotes_provider_latency_seconds_bucket{chain="1",provider="MetricsFast",le="0.05"}'] == 1
+    assert latency['quotes_provider_latency_seconds_bucket{chain="1",provider="MetricsFast",le="+Inf"}'] == 1
+    assert latency['quotes_provider_latency_seconds_count{chain="1",provider="MetricsFast"}'] == 1
+    outcomes = _series(text, "quotes_provider_outcomes_total")
+    assert outcomes['quotes_provider_outcomes_total{chain="1",outcome="ok",provider="MetricsFast"}'] == 1
+    assert outcomes['quotes_provider_outcomes_total{chain="1",outcome="timed_out",provider="MetricsSlow"}'] == 1
+    assert outcomes['quotes_provider_outcomes_total{chain="1",outcome="error",provider="MetricsBroken"}'] == 1
+    assert _series(text, "quotes_parse_failures_total")['quotes_parse_failures_total{provider="MetricsBroken"}'] == 1
+
+
+def test_upstream_status_and_timeout_counters(monkeypatch):
+    class Answer:
+        status_code = 404
+        headers = {}
+
+    class Session:
+        calls = 0
+
+        def request(self, method, url, **kwargs):
+            Session.calls += 1
+            if Session.calls == 1:
+                raise requests.exceptions.ReadTimeout("slow")
+            return Answer()
+
+    monkeypatch.setattr(quotes_http, "breakers", Breakers())
+    monkeypatch.setattr(quotes_http, "get_session", lambda url: Session())
+    monkeypatch.setattr(quotes_http.rate_limiter, "limits", {})
+    timeouts = quotes_metrics.upstream_timeouts.value(provider="relay")
+    not_found = quotes_metrics.upstream_responses.value(provider="relay", status=404)
+
+    try:
+        quotes_http.get("https://api.relay.link/quote")
+    except requests.exceptions.Timeout:
+        pass
+    quotes_http.get("https://api.relay.link/quote")
+
+    assert quotes_metrics.upstream_timeouts.value(provider="relay") == timeouts + 1
+    assert quotes_metrics.upstream_responses.value(provider="relay", status=404) == not_found + 1
+
+
+def test_cache_hit_ratio_and_cli_dump(tmp_path):
+    cache = QuoteCache(name="metrics_test")
+    cache.set("known", [])
+    for key in ("known", "known", "known", "unknown"):
+        cache.get(key)
+
+    text = quotes_metrics.render_metrics()
+    assert _series(text, "quotes_lookup_hit_ratio")['quotes_lookup_hit_ratio{cache="metrics_test"}'] == 0.75
+
+    path = tmp_path / "metrics" / "metrics.prom"
+    quotes_metrics.write_metrics(str(path))
+    dumped = path.read_text()
+    assert 'quotes_lookup_hit_ratio{cache="metrics_test"} 0.75' in dumped
+    assert "# TYPE quotes_provider_latency_seconds histogram" in dumped
@@ -0,0 +1,46 @@
+import pytest
+
+import quotes_prices
+from quotes_prices import PriceFeed, StalePrices, load_prices
+
+USDC = "0xA0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def test_one_bulk_call_per_chain_and_versioned_log(monkeypatch, tmp_path):
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(kwargs["params"])
+        return FakeResponse({"tokens": {"1": [{"address": USDC, "priceUSD": "0.9998"}, {"address": "0xdead", "priceUSD": None}]}})
+
+    monkeypatch.setattr(quotes_prices.quotes_http, "get", get)
+    feed = PriceFeed(log_path=str(tmp_path))
+
+    snapshot = feed.snapshot(1)
+    assert feed.price(1, USDC.upper()) == 0.9998
+    assert feed.price(1, "0xdead") is None
+    assert calls == [{"chains": 1}]
+    assert load_prices(1, snapshot.version, str(tmp_path)).price(USDC) == 0.9998
+
+
+def test_too_stale_prices_are_rejected(monkeypatch, tmp_path):
+    def get(url, **kwargs):
+        raise ConnectionError("li.quest down")
+
+    monkeypatch.setattr(quotes_prices.quotes_http, "get", get)
+    feed = PriceFeed(log_path=str(tmp_path))
+    feed._snapshots[1] = quotes_prices.PriceSnapshot(1, 1, 1.0, {USDC.lower(): 1.0})
+
+    with pytest.raises(StalePrices):
+        feed.snapshot(1)
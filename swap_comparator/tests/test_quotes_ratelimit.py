@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from quotes_ratelimit import DeadlineExceeded, RateLimiter, TokenBucket, parse_retry_after
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    bucket = TokenBucket(rate=50, burst=3)
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    start = time.monotonic()
+    assert bucket.acquire() > 0
+    assert time.monotonic() - start >= 0.015
+
+
+def test_backoff_honours_retry_after_and_counts_retries():
+    limiter = RateLimiter({"odos": (10, 10)})
+
+    assert limiter.backoff("odos", 0, retry_after=2.0) == 2.0
+    assert 0 <= limiter.backoff("odos", 3, retry_after=None) <= 4.0
+    assert limiter.counters[("odos", "retried")] == 2
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+
+
+def test_waits_past_the_deadline_fail_fast():
+    limiter = RateLimiter({"1inch": (1, 1)})
+    limiter.acquire("1inch")
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        limiter.acquire("1inch", deadline=time.monotonic() + 0.5)
+    assert time.monotonic() - start < 0.1
+    # The token was given back: the next caller waits one token, not two
+    assert limiter.bucket("1inch").reserve() <= 1.0
+    assert limiter.backoff("1inch", 0, retry_after=3.0, deadline=time.monotonic() + 1) is None
+    assert limiter.counters[("1inch", "deadline_exceeded")] == 2
+
+
+def test_request_returns_the_last_answer_when_a_retry_would_miss_the_deadline(monkeypatch):
+    import quotes_http
+
+    class Answer:
+        status_code = 429
+        headers = {"Retry-After": "5"}
+
+    calls = []
+    session = type("Session", (), {"request": lambda self, *args, **kwargs: calls.append(kwargs["timeout"]) or Answer()})()
+    monkeypatch.setattr(quotes_http, "get_session", lambda url: session)
+    monkeypatch.setattr(quotes_http, "rate_limiter", RateLimiter({}))
+
+    start = time.monotonic()
+    response = quotes_http.request("GET", "https://api.odos.xyz/sor/quote/v2", deadline=start + 1)
+
+    assert response.status_code == 429 and len(calls) == 1
+    assert calls[0] <= 1 and time.monotonic() - start < 0.1
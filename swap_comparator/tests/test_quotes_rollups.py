@@ -0,0 +1,40 @@
+import pytest
+
+import quotes_store
+from quotes_rollups import RollupStore
+
+DAY = 1700006400  # 2023-11-15 00:00 UTC
+
+
+def _write(root, timestamp, outputs, backfilled=False):
+    sink = quotes_store.ParquetSink(root)
+    for platform, amount_out in outputs.items():
+        sink({
+            "timestamp": timestamp, "platform": platform, "fromToken": "WETH", "toToken": "USDC", "chainId": 1,
+            "amountIn": 1.0, "amountOut": amount_out, "status": "ok" if amount_out else "no_quote", "backfilled": backfilled,
+        })
+    sink.close()
+
+
+def test_late_hours_only_recompute_their_buckets(tmp_path):
+    root, rollups = str(tmp_path / "quotes"), RollupStore(str(tmp_path / "quotes"), str(tmp_path / "rollups"))
+    _write(root, DAY, {"odos": 3000.0, "lifi": 2997.0})
+    _write(root, DAY + 86400, {"odos": 3000.0, "lifi": None})
+
+    assert rollups.update() == {"daily": 2, "weekly": 1}
+    assert rollups.update() == {"daily": 0, "weekly": 0}
+
+    daily = rollups.load("daily").set_index(["period", "platform"])
+    assert daily.loc[("2023-11-15", "lifi"), "bps_gap_to_best"] == pytest.approx(10.0)
+    assert daily.loc[("2023-11-16", "lifi"), "availability"] == 0.0
+
+    # Late (backfilled) hour of the first day: lifi wins it
+    _write(root, DAY + 3600, {"odos": 2990.0, "lifi": 3000.0}, backfilled=True)
+    assert rollups.update() == {"daily": 1, "weekly": 1}
+
+    daily = rollups.load("daily").set_index(["period", "platform"])
+    assert daily.loc[("2023-11-15", "lifi"), "best_share"] == 0.5
+    assert daily.loc[("2023-11-15", "lifi"), "median_output"] == 2998.5
+    assert daily.loc[("2023-11-16", "odos"), "quotes"] == 1
+    weekly = rollups.load("weekly").set_index(["period", "platform"])
+    assert weekly.loc[("2023-11-13", "odos"), "requested"] == 3
@@ -0,0 +1,118 @@
+import os
+
+import quotes_scheduler
+import quotes_store
+import quotes_sweep
+
+HOUR = 1700006400
+
+
+def _quote_unit(calls):
+    def quote_unit(unit, timestamp):
+        calls.append(unit)
+        row = quotes_sweep.empty_row(unit, timestamp)
+        row.update(amountOut=1.0, amountOutRaw=10 ** 6, status="ok")
+        return row
+    return quote_unit
+
+
+def _units():
+    return [u for u in quotes_sweep.build_work_units(["Arbitrum"], ["odos"]) if (u.fromToken, u.toToken) == ("WETH", "USDC")]
+
+
+def test_units_are_checkpointed_only_once_stored(tmp_path, monkeypatch):
+    root, checkpoints = str(tmp_path / "store"), str(tmp_path / "ckpt")
+    monkeypatch.setattr(quotes_sweep, "quote_unit", _quote_unit([]))
+    record_all = quotes_scheduler.Checkpoint.record_all
+    checked = []
+
+    def record_all_stored(self, rows):
+        # Every unit checkpointed must already be readable from the store
+        assert quotes_store.read_history(root).num_rows >= len(checked) + len(rows)
+        checked.extend(rows)
+        record_all(self, rows)
+
+    monkeypatch.setattr(quotes_scheduler.Checkpoint, "record_all", record_all_stored)
+    units = _units()
+
+    produced = quotes_scheduler.run_hour(HOUR, units, lambda: quotes_store.ParquetSink(root, row_group_size=3), window=0, directory=checkpoints)
+
+    assert produced == len(checked) == len(units)
+    assert quotes_scheduler.Checkpoint(HOUR, checkpoints).is_done()
+
+
+def test_crash_only_loses_the_unflushed_units(tmp_path, monkeypatch):
+    root, checkpoints = str(tmp_path / "store"), str(tmp_path / "ckpt")
+    monkeypatch.setattr(quotes_sweep, "quote_unit", _quote_unit([]))
+
+    class Crash(Exception):
+        pass
+
+    class CrashingSink(quotes_store.ParquetSink):
+        received = 0
+
+        def __call__(self, row):
+            super().__call__(row)
+            self.received += 1
+            if self.received == 5:
+                raise Crash
+
+        def close(self):
+            # The process died: the buffered rows are never written
+            pass
+
+    units = _units()
+    try:
+        quotes_scheduler.run_hour(HOUR, units, lambda: CrashingSink(root, row_group_size=3), window=0, directory=checkpoints)
+    except Crash:
+        pass
+
+    checkpoint = quotes_scheduler.Checkpoint(HOUR, checkpoints)
+    assert 0 < len(checkpoint.finished()) == quotes_store.read_history(root).num_rows < len(units)
+    assert not checkpoint.is_done()
+
+
+def test_resume_skips_checkpointed_units_and_backfill_is_flagged(tmp_path, monkeypatch):
+    root, checkpoints = str(tmp_path / "store"), str(tmp_path / "ckpt")
+    calls = []
+    monkeypatch.setattr(quotes_sweep, "quote_unit", _quote_unit(calls))
+    units = _units()
+    done = units[:2]
+    quotes_scheduler.Checkpoint(HOUR, checkpoints).record_all([quotes_sweep.empty_row(unit, HOUR) for unit in done])
+    quotes_scheduler.Checkpoint(HOUR + 3600, checkpoints).mark_done()
+
+    assert quotes_scheduler.missed_hours(HOUR + 4 * 3600, checkpoints) == [HOUR, HOUR + 2 * 3600, HOUR + 3 * 3600]
+
+    quotes_scheduler.run_hour(HOUR, units, lambda: quotes_store.ParquetSink(root), window=0, directory=checkpoints, backfill=True)
+
+    assert calls == units[2:]
+    assert quotes_store.read_history(root).num_rows == 0
+    backfilled = quotes_store.read_history(root, backfilled=True)
+    assert backfilled.num_rows == len(units) - 2 and all(backfilled.column("backfilled").to_pylist())
+
+
+def test_daemon_compacts_past_days(tmp_path, monkeypatch):
+    root, checkpoints = str(tmp_path / "store"), str(tmp_path / "ckpt")
+    monkeypatch.setattr(quotes_sweep, "quote_unit", _quote_unit([]))
+    for unit in _units()[:2]:
+        sink = quotes_store.ParquetSink(root)
+        sink(quotes_sweep.empty_row(unit, HOUR))
+        sink.close()
+
+    class Stop(Exception):
+        pass
+
+    def sleep(seconds):
+        raise Stop
+
+    monkeypatch.setattr(quotes_scheduler, "missed_hours", lambda current, directory: [])
+    monkeypatch.setattr(quotes_scheduler, "run_hour", lambda *args, **kwargs: 0)
+    monkeypatch.setattr(quotes_scheduler.time, "sleep", sleep)
+    try:
+        quotes_scheduler.run_forever(lambda: None, ["Arbitrum"], ["odos"], directory=checkpoints, compact_root=root)
+    except Stop:
+        pass
+
+    partition = next(directory for directory, _, names in os.walk(root) if names)
+    assert len(os.listdir(partition)) == 1
+    assert quotes_store.read_history(root).num_rows == 2
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import quotes_sweep
+from quotes_utils import QuoteRecord
+
+
+def test_build_work_units_expands_the_readme_matrix():
+    units = quotes_sweep.build_work_units(providers=["odos"])
+
+    assert len({(u.network, u.fromToken, u.toToken) for u in units}) == 12
+    weth_usdc = [u.amount for u in units if u.network == "Mainnet" and (u.fromToken, u.toToken) == ("WETH", "USDC")]
+    assert weth_usdc == [0.01, 0.1, 1, 10, 100, 1000, 10000]
+    assert units[0].raw_amount == "100000000"
+
+
+def test_run_sweep_streams_one_row_per_unit(monkeypatch):
+    monkeypatch.setattr(quotes_sweep, "current_prices", lambda chain_id: None)
+    monkeypatch.setattr(quotes_sweep.gas_prices, "get", lambda chain_id, snapshot=None: None)
+    monkeypatch.setitem(quotes_sweep.PROVIDERS, "odos", lambda chain_id, sellToken, buyToken, amount: {"amount": amount})
+    monkeypatch.setitem(quotes_sweep.EXTRACTORS, "odos", lambda data: QuoteRecord(minAmount=None, Amount=int(data["amount"])))
+    units = quotes_sweep.build_work_units(["Arbitrum"], ["odos"])
+    rows = []
+
+    produced = asyncio.run(quotes_sweep.run_sweep(units, rows.append, timestamp=3600))
+
+    assert produced == len(rows) == len(units)
+    assert all(row["status"] == "ok" and row["timestamp"] == 3600 for row in rows)
+
+
+def test_synchronized_sweep_sends_each_unit_as_one_burst(monkeypatch):
+    def slow(chain_id, sellToken, buyToken, amount):
+        time.sleep(0.2)
+        return {"amount": amount}
+
+    monkeypatch.setattr(quotes_sweep, "current_prices", lambda chain_id: None)
+    monkeypatch.setattr(quotes_sweep.gas_prices, "get", lambda chain_id, snapshot=None: None)
+    monkeypatch.setitem(quotes_sweep.PROVIDERS, "odos", lambda chain_id, sellToken, buyToken, amount: {"amount": amount})
+    monkeypatch.setitem(quotes_sweep.PROVIDERS, "lifi", slow)
+    for provider in ("odos", "lifi"):
+        monkeypatch.setitem(quotes_sweep.EXTRACTORS, provider, lambda data: QuoteRecord(minAmount=None, Amount=int(data["amount"])))
+    units = [u for u in quotes_sweep.build_work_units(["Arbitrum"], ["odos", "lifi"]) if u.amount == 100]
+    rows = []
+
+    asyncio.run(quotes_sweep.run_synchronized_sweep(units, rows.append, timestamp=3600, max_skew=0.05))
+
+    assert len(rows) == len(units)
+    for key in {(row["fromToken"], row["toToken"]) for row in rows}:
+        burst = [row for row in rows if (row["fromToken"], row["toToken"]) == key]
+        assert max(row["requestSentAt"] for row in burst) - min(row["requestSentAt"] for row in burst) < 0.05
+        assert all(row["skewMs"] > 50 and row["skewed"] for row in burst)
+
+
+def test_circuit_opening_mid_call_marks_the_row_skipped(monkeypatch):
+    from quotes_breaker import CircuitOpen
+
+    def opened(chain_id, sellToken, buyToken, amount):
+        raise CircuitOpen("odos")
+
+    monkeypatch.setattr(quotes_sweep.gas_prices, "get", lambda chain_id, snapshot=None: None)
+    monkeypatch.setitem(quotes_sweep.PROVIDERS, "odos", opened)
+    unit = quotes_sweep.build_work_units(["Arbitrum"], ["odos"])[0]
+
+    assert quotes_sweep.quote_unit(unit, 3600)["status"] == "skipped"